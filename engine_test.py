@@ -4,13 +4,56 @@ Unit testing for the Engine.py file.
 Tests should be written BEFORE writting the method code
 """
 
+import io
+import multiprocessing
+import os
+import tempfile
+import time
 import src
+import src.OpeningBook
+import src.Tablebase
+import src.SearchStats
+import src.Uci
+import src.Tournament
+import src.SearchWorker
 
 def main():
     a, b, c = test_convertToRankFile()
     printPassed(a, b, c)
     a, b, c = test_convertToChessNotation()
     printPassed(a, b, c)
+    a, b, c = test_perft()
+    printPassed(a, b, c)
+    a, b, c = test_moveEquality()
+    printPassed(a, b, c)
+    a, b, c = test_stagedMoves()
+    printPassed(a, b, c)
+    a, b, c = test_FEN()
+    printPassed(a, b, c)
+    a, b, c = test_openingBook()
+    printPassed(a, b, c)
+    a, b, c = test_tablebase()
+    printPassed(a, b, c)
+    a, b, c = test_searchStats()
+    printPassed(a, b, c)
+    a, b, c = test_uci()
+    printPassed(a, b, c)
+    a, b, c = test_tournament()
+    printPassed(a, b, c)
+    a, b, c = test_undoStack()
+    printPassed(a, b, c)
+    a, b, c = test_repetition()
+    printPassed(a, b, c)
+    a, b, c = test_selectiveSearch()
+    printPassed(a, b, c)
+    a, b, c = test_batchEvaluation()
+    printPassed(a, b, c)
+    a, b, c = test_parallelSearch()
+    printPassed(a, b, c)
+    a, b, c = test_searchWorker()
+    printPassed(a, b, c)
+    a, b, c = test_ponder()
+    printPassed(a, b, c)
 
 
 def printPassed(fname: str, numPassed: int, numTests: int):
@@ -85,6 +128,804 @@ def test_convertToChessNotation() -> tuple[str, int, int]:
             
     return fname, passed, numTests
 
+
+
+def test_perft() -> tuple[str, int, int]:
+    fname = "perft"
+    
+    # fen, depth, expected leaf nodes
+    test_inputs = {
+        0: ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 3],
+        1: ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2],
+        2: ["8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 3],
+        3: ["r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 2],
+        4: ["rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 2]
+    }
+    
+    expected_outputs = {
+        0: 8902,
+        1: 2039,
+        2: 2812,
+        3: 264,
+        4: 1486
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs) * 2
+    
+    
+    for testNum in test_inputs:
+        for backend in ('mailbox', 'bitboard'):
+            gamestate = src.GameState.fromFEN(test_inputs[testNum][0], backend)
+            actual_output = src.perft(gamestate, test_inputs[testNum][1])
+            
+            if (actual_output == expected_outputs[testNum]):
+                passed += 1
+                
+            else:
+                print("\""+fname+"\""+ ": Test "+str(testNum)+" ("+backend+") failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_output))
+            
+    return fname, passed, numTests
+
+
+
+def test_moveEquality() -> tuple[str, int, int]:
+    fname = "moveEquality"
+    gamestate = src.GameState.fromFEN("4k3/1P6/8/8/8/8/4P3/4K3 w - - 0 1")
+    
+    test_inputs = {
+        0: [src.Move((6, 4), (4, 4), gamestate.board), src.Move((6, 4), (4, 4), gamestate.board)],
+        1: [src.Move((6, 4), (4, 4), gamestate.board), src.Move((6, 4), (5, 4), gamestate.board)],
+        2: [src.Move((1, 1), (0, 1), gamestate.board), src.Move((1, 1), (0, 1), gamestate.board, promotionPiece='N')],
+        3: [src.Move((6, 4), (4, 4), gamestate.board), "e2e4"]
+    }
+    
+    expected_outputs = {
+        0: True,
+        1: False,
+        2: False,
+        3: True
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs) + 1
+    
+    
+    for testNum in test_inputs:
+        actual_output = test_inputs[testNum][0] == test_inputs[testNum][1]
+        
+        if (actual_output == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_output))
+    
+    # every legal move must hash differently
+    moves = gamestate.getValidMoves()
+    if len(set(moves)) == len(moves):
+        passed += 1
+    else:
+        print("\""+fname+"\""+ ": hash test failed, "+str(len(moves)-len(set(moves)))+" moves share a hash")
+            
+    return fname, passed, numTests
+
+
+
+def test_stagedMoves() -> tuple[str, int, int]:
+    fname = "stagedMoves"
+    
+    # fen, hash move id
+    test_inputs = {
+        0: ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", (6 << 3 | 4) << 6 | (2 << 3 | 0)],
+        1: ["r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 0xFFFF],
+        2: ["8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 0],
+        3: ["4k3/8/8/8/8/5n2/8/r3K3 w - - 0 1", 0xFFFF],
+        4: ["4k3/8/8/8/8/8/1p1p4/R3K3 b - - 0 1", 0]
+    }
+    
+    passed = 0
+    numTests = 2 * len(test_inputs)
+    
+    
+    for backend in ('bitboard', 'mailbox'):
+        for testNum in test_inputs:
+            gamestate = src.GameState.fromFEN(test_inputs[testNum][0], backend)
+            expected_output = sorted(str(move) for move in gamestate.getValidMoves())
+            actual_output = sorted(str(move) for move in src.ChessBot.stagedMoves(gamestate, test_inputs[testNum][1], 0))
+            
+            if (actual_output == expected_output):
+                passed += 1
+                
+            else:
+                print("\""+fname+"\""+ ": Test "+str(testNum)+" ("+backend+") failed. \n\tExpected: "+str(expected_output)+" \n\tActual: "+str(actual_output))
+            
+    return fname, passed, numTests
+
+
+
+def test_FEN() -> tuple[str, int, int]:
+    fname = "FEN"
+    
+    # fen, moves to play as (from, to)
+    test_inputs = {
+        0: ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [((6, 4), (4, 4))]],
+        1: ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((7, 7), (7, 6))]],
+        2: ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [((6, 0), (4, 0))]],
+        3: ["8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 12 40", []]
+    }
+    
+    expected_outputs = {
+        0: "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1",
+        1: "rnbqkb1r/pppppppp/5n2/8/8/5N2/PPPPPPPP/RNBQKBR1 b Qkq - 3 2",
+        2: "r3k2r/p1ppqpb1/bn2pnp1/3PN3/Pp2P3/2N2Q1p/1PPBBPPP/R3K2R b KQkq a3 0 1",
+        3: "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 12 40"
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs) + 1
+    
+    
+    for testNum in test_inputs:
+        for backend in ('mailbox', 'bitboard'):
+            gamestate = src.GameState.fromFEN(test_inputs[testNum][0], backend)
+            for fromSquare, toSquare in test_inputs[testNum][1]:
+                gamestate.move(src.Move(fromSquare, toSquare, gamestate.board))
+            actual_output = gamestate.toFEN()
+            
+            # the position set up from the new FEN must match the one reached by playing the moves
+            fromFEN = src.GameState.fromFEN(actual_output, backend)
+            if actual_output != expected_outputs[testNum] or fromFEN.zobristKey != gamestate.zobristKey:
+                print("\""+fname+"\""+ ": Test "+str(testNum)+" ("+backend+") failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+actual_output)
+                break
+        else:
+            passed += 1
+    
+    try:
+        src.GameState.fromFEN("rnbqkbnr/pppppppp/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        print("\""+fname+"\""+ ": a FEN with 7 ranks was accepted")
+    except ValueError:
+        passed += 1
+            
+    return fname, passed, numTests
+
+
+
+def test_openingBook() -> tuple[str, int, int]:
+    fname = "openingBook"
+    games = [
+        ["e4", "e5", "Nf3", "Nc6", "Bb5"],
+        ["e2e4", "e7e5", "g1f3", "g8f6"],
+        ["d4", "Nf6", "c4", "e6", "Nc3", "Bb4", "e3", "O-O"]
+    ]
+    
+    bookPath = os.path.join(tempfile.mkdtemp(), "book.bin")
+    src.OpeningBook.buildBook(games, bookPath)
+    book = src.OpeningBook.OpeningBook(bookPath)
+    
+    # moves played before the position, expected book moves as (move, weight)
+    test_inputs = {
+        0: [],
+        1: ["e2e4", "e7e5"],
+        2: ["d2d4", "g8f6", "c2c4", "e7e6", "b1c3", "f8b4", "e2e3"],
+        3: ["a2a3"]
+    }
+    
+    expected_outputs = {
+        0: [("e2e4", 2), ("d2d4", 1)],
+        1: [("g1f3", 2)],
+        2: [("e8g8", 1)],
+        3: []
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    
+    for testNum in test_inputs:
+        gamestate = src.GameState()
+        for text in test_inputs[testNum]:
+            gamestate.move(src.OpeningBook.parseMove(text, gamestate.getValidMoves()))
+        validMoves = {move.moveID: str(move) for move in gamestate.getValidMoves()}
+        actual_output = [(validMoves[moveID], weight) for moveID, weight in book.probe(gamestate.zobristKey)]
+        
+        if (actual_output == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_output))
+    
+    book.close()
+    os.remove(bookPath)
+    return fname, passed, numTests
+
+
+def test_tablebase() -> tuple[str, int, int]:
+    fname = "tablebase"
+    directory = tempfile.mkdtemp()
+    src.Tablebase.generateTable("KQvK", directory)
+    tablebases = src.Tablebase.Tablebases(directory)
+    
+    test_inputs = {
+        0: "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+        1: "7k/6Q1/6K1/8/8/8/8/8 b - - 0 1",
+        2: "7k/8/5K2/8/8/8/8/6Q1 w - - 0 1",
+        3: "7K/8/5k2/8/8/8/8/6q1 b - - 0 1",
+        4: "8/8/8/3k4/8/8/8/KQ6 b - - 0 1",
+        5: "7k/8/6K1/8/8/8/8/1Q6 w - - 0 1"
+    }
+    
+    # (result, plies to mate) from the side to move, the last one is the move the bot plays
+    expected_outputs = {
+        0: (0, 0),
+        1: (-1, 0),
+        2: (1, 1),
+        3: (1, 1),
+        4: (-1, 18),
+        5: "b1b8"
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    src.ChessBot.tablebases = tablebases
+    for testNum in test_inputs:
+        gamestate = src.GameState.fromFEN(test_inputs[testNum], 'bitboard')
+        if testNum == 5:
+            actual_output = str(src.ChessBot.getTablebaseMove(gamestate, gamestate.getValidMoves()))
+        else:
+            actual_output = tablebases.probe(gamestate)
+        
+        if (actual_output == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_output))
+    src.ChessBot.tablebases = None
+    
+    tablebases.close()
+    os.remove(os.path.join(directory, "KQvK.tb"))
+    return fname, passed, numTests
+
+def test_searchStats() -> tuple[str, int, int]:
+    fname = "searchStats"
+    gamestate = src.GameState.fromFEN("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 'bitboard')
+    stats = src.SearchStats.SearchStats()
+    bestMove = src.ChessBot.iterativeDeepening(gamestate, gamestate.getValidMoves(), 2, stats=stats)
+    
+    actual_outputs = {
+        0: stats.nodes == sum(iteration["nodes"] for iteration in stats.iterations) == src.ChessBot.nodes,
+        1: [iteration["depth"] for iteration in stats.iterations],
+        2: 0 < stats.quiescenceNodes < stats.nodes and 0 < stats.firstMoveCutoffs <= stats.betaCutoffs,
+        3: stats.tableProbes > 0 and stats.bestMove == bestMove,
+        4: src.ChessBot.stats
+    }
+    
+    expected_outputs = {
+        0: True,
+        1: [1, 2],
+        2: True,
+        3: True,
+        4: None
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+def test_uci() -> tuple[str, int, int]:
+    fname = "uci"
+    
+    test_inputs = {
+        0: "isready\n",
+        1: "position fen 7k/8/5K2/8/8/8/8/6Q1 w - - 0 1\ngo depth 2\n",
+        2: "position startpos moves e2e4 e7e5 g1f3\ngo nodes 200\n",
+        3: "position startpos moves e2e5\ngo depth 1\n",
+        4: "position startpos\ngo infinite\nstop\n",
+        5: "position startpos\ngo movetime abc depth 1\n",
+        6: "position fen k7/8/2K5/8/8/8/8/7R w - - 0 1\ngo depth 5\n"
+    }
+    
+    # the last line the engine sent
+    expected_outputs = {
+        0: "readyok",
+        1: "bestmove g1g7",
+        2: "bestmove",
+        3: "bestmove",
+        4: "bestmove",
+        5: "bestmove",
+        6: "bestmove"
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in test_inputs:
+        output = io.StringIO()
+        src.Uci.UciEngine(output=output).run(io.StringIO(test_inputs[testNum]))
+        lines = output.getvalue().splitlines()
+        actual_output = lines[-1] if testNum == 1 or testNum == 0 else lines[-1].split()[0]
+        if testNum == 3 and "info string illegal move e2e5" not in lines:
+            actual_output = lines
+        if testNum == 5 and "info string ignoring invalid movetime abc" not in lines:
+            actual_output = lines
+        # the mate is three plies away whichever iteration finds it
+        if testNum == 6 and " score mate 2 " not in lines[-2]:
+            actual_output = lines
+        
+        if (actual_output == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_output))
+    src.ChessBot.stopEvent = None
+    
+    return fname, passed, numTests
+
+def test_tournament() -> tuple[str, int, int]:
+    fname = "tournament"
+    
+    # position and move in coordinate notation for the SAN tests
+    test_inputs = {
+        0: (src.GameState.STARTING_FEN, "g1f3"),
+        1: ("r3k2r/8/8/8/8/8/8/RN2KN1R w KQkq - 0 1", "b1d2"),
+        2: ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1g1"),
+        3: ("7k/8/5K2/8/8/8/8/6Q1 w - - 0 1", "g1g7"),
+        4: ("8/1P5k/8/8/8/8/8/K7 w - - 0 1", "b7b8n")
+    }
+    
+    expected_outputs = {
+        0: "Nf3",
+        1: "Nbd2",
+        2: "O-O",
+        3: "Qg7#",
+        4: "b8=N",
+        5: True,
+        6: True,
+        7: (True, 3)
+    }
+    
+    actual_outputs = {}
+    for testNum in test_inputs:
+        fen, text = test_inputs[testNum]
+        gamestate = src.GameState.fromFEN(fen)
+        validMoves = gamestate.getValidMoves()
+        move = next(move for move in validMoves if str(move) == text)
+        actual_outputs[testNum] = src.Tournament.toSAN(gamestate, move, validMoves)
+    
+    # an even score sits between the hypotheses, a clear lead accepts the stronger one
+    actual_outputs[5] = src.Tournament.sprt(100, 100, 100, 0, 10) < 0 < src.Tournament.sprt(300, 100, 100, 0, 10)
+    elo, margin = src.Tournament.eloEstimate(150, 200, 120)
+    actual_outputs[6] = 20 < elo < 25 and 20 < margin < 30
+    
+    # a minimax player's depth must not stay behind for the players after it
+    bot = src.Tournament.ChessBot
+    gamestate = src.GameState()
+    validMoves = gamestate.getValidMoves()
+    move = src.Tournament.chooseMove(src.Tournament.parsePlayer("mm:search=minimax,depth=1"),
+                                     {'table': bot.transpositionTable, 'history': bot.historyTable, 'killers': bot.killerMoves},
+                                     gamestate, validMoves)
+    actual_outputs[7] = (move in validMoves, bot.searchDepth(None, None, None))
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+
+def test_undoStack() -> tuple[str, int, int]:
+    fname = "undoStack"
+    
+    # every move is made and undone, which must restore the FEN, key and board exactly
+    test_inputs = {
+        0: "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        1: "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+        2: "r3k2r/1P6/8/8/8/8/6p1/R3K2R b KQkq - 7 30"
+    }
+    
+    passed = 0
+    numTests = len(test_inputs) + 1
+    
+    for testNum in test_inputs:
+        for backend in ('mailbox', 'bitboard'):
+            gamestate = src.GameState.fromFEN(test_inputs[testNum], backend)
+            board = [row[:] for row in gamestate.board]
+            key = gamestate.zobristKey
+            failed = None
+            for move in gamestate.getValidMoves():
+                gamestate.move(move)
+                gamestate.undoMove()
+                if gamestate.toFEN() != test_inputs[testNum] or gamestate.zobristKey != key or gamestate.board != board:
+                    failed = move
+                    break
+            if failed is not None:
+                print("\""+fname+"\""+ ": Test "+str(testNum)+" ("+backend+") failed after undoing "+str(failed)+". \n\tActual: "+gamestate.toFEN())
+                break
+        else:
+            passed += 1
+    
+    # more moves than the stack starts with room for, then back to the start
+    gamestate = src.GameState()
+    shuffle = [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6))]
+    numMoves = 2 * src.GameState.UNDO_STACK_SIZE + 4
+    for i in range(numMoves):
+        fromSquare, toSquare = shuffle[i % 4]
+        gamestate.move(src.Move(fromSquare, toSquare, gamestate.board))
+    halfmoveClock = gamestate.halfmoveClock
+    for i in range(numMoves):
+        gamestate.undoMove()
+    if halfmoveClock == numMoves and gamestate.toFEN() == src.GameState.STARTING_FEN and gamestate.zobristKey == gamestate.computeZobristKey():
+        passed += 1
+    else:
+        print("\""+fname+"\""+ ": Test "+str(len(test_inputs))+" failed. \n\tExpected: "+src.GameState.STARTING_FEN+" \n\tActual: "+gamestate.toFEN())
+    
+    return fname, passed, numTests
+
+
+def test_repetition() -> tuple[str, int, int]:
+    fname = "repetition"
+    
+    def play(gamestate, moves):
+        for text in moves:
+            gamestate.move(next(move for move in gamestate.getValidMoves() if str(move) == text))
+        return gamestate
+    
+    shuffle = ["g1f3", "g8f6", "f3g1", "f6g8"]
+    twice = play(src.GameState(), shuffle)
+    thrice = play(src.GameState(), shuffle * 2)
+    pawnMove = play(src.GameState(), shuffle + ["e2e4"])
+    fifty = play(src.GameState.fromFEN("4k3/8/8/8/8/8/8/4K1N1 w - - 99 80"), ["g1f3"])
+    
+    # the mate on the hundredth half move is not a draw
+    mate = src.GameState.fromFEN("7k/8/5K2/8/8/8/8/6Q1 w - - 99 80", 'bitboard')
+    mateMove = src.ChessBot.iterativeDeepening(mate, mate.getValidMoves(), 2)
+    
+    # the knight move back at the root repeats the starting position
+    stats = src.SearchStats.SearchStats()
+    searched = play(src.GameState(backend='bitboard'), shuffle[:3])
+    src.ChessBot.iterativeDeepening(searched, searched.getValidMoves(), 3, stats=stats)
+    
+    # a queen up, but the position repeats
+    repeated = play(src.GameState.fromFEN("4k3/8/8/8/8/8/8/QN2K3 w - - 0 1"), ["b1c3", "e8d8", "c3b1", "d8e8"])
+    turnMult = 1
+    
+    # a null move restarts the repetition window but leaves the fifty move count alone
+    fifty.makeNullMove()
+    twice.makeNullMove()
+    nullMove = (fifty.halfmoveClock, fifty.isFiftyMoveDraw(), twice.repetitionPlies)
+    fifty.undoNullMove()
+    twice.undoNullMove()
+    
+    actual_outputs = {
+        0: (twice.isRepetition(), twice.isThreefoldRepetition()),
+        1: (thrice.repetitionCount(), thrice.isThreefoldRepetition()),
+        2: pawnMove.isRepetition(),
+        3: fifty.isFiftyMoveDraw(),
+        4: stats.drawCutoffs > 0,
+        5: src.ChessBot.getNegaMaxAlphaBeta(repeated, None, 2, turnMult, -100000, 100000, 1),
+        6: (str(mateMove), play(mate, ["g1g7"]).isFiftyMoveDraw()),
+        7: (nullMove, fifty.halfmoveClock, twice.repetitionPlies, twice.isRepetition())
+    }
+    
+    expected_outputs = {
+        0: (True, False),
+        1: (3, True),
+        2: False,
+        3: True,
+        4: True,
+        5: 0,
+        6: ("g1g7", False),
+        7: ((100, True, 0), 100, 4, True)
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+
+def test_selectiveSearch() -> tuple[str, int, int]:
+    fname = "selectiveSearch"
+    
+    # a null move keeps the board, hands the turn over and clears the en passant square
+    nullMoved = src.GameState.fromFEN("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", 'bitboard')
+    nullMoved.makeNullMove()
+    nullFEN = nullMoved.toFEN()
+    nullKey = nullMoved.zobristKey == src.GameState.fromFEN(nullFEN).zobristKey
+    nullMoved.undoNullMove()
+    
+    pawnEnding = "8/5k2/3p4/3P4/8/8/5K2/8 w - - 0 1"
+    
+    # the rook takes the loose queen, with and without the selective search
+    position = "3rk3/pp3ppp/8/8/3Q4/8/PP3PPP/4K3 b - - 0 1"
+    results = []
+    for selective in (True, False):
+        src.ChessBot.useNullMove = src.ChessBot.useLateMoveReductions = selective
+        src.ChessBot.useFutilityPruning = src.ChessBot.useRazoring = selective
+        stats = src.SearchStats.SearchStats()
+        gamestate = src.GameState.fromFEN("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4", 'bitboard')
+        src.ChessBot.iterativeDeepening(gamestate, gamestate.getValidMoves(), 5, stats=stats)
+        gamestate = src.GameState.fromFEN(position, 'bitboard')
+        bestMove = src.ChessBot.iterativeDeepening(gamestate, gamestate.getValidMoves(), 4)
+        results.append((stats, str(bestMove)))
+    src.ChessBot.useNullMove = src.ChessBot.useLateMoveReductions = True
+    src.ChessBot.useFutilityPruning = src.ChessBot.useRazoring = True
+    
+    pruned, plain = results[0][0], results[1][0]
+    
+    actual_outputs = {
+        0: (nullFEN, nullKey, nullMoved.toFEN()),
+        1: [src.GameState.fromFEN(pawnEnding, backend).hasNonPawnMaterial(True) for backend in ('mailbox', 'bitboard')],
+        2: pruned.nullMoveCutoffs > 0 and pruned.lateMoveReductions > 0 and pruned.futilityPrunes + pruned.razorCutoffs > 0,
+        3: (plain.nullMoveCutoffs, plain.lateMoveReductions, plain.futilityPrunes, plain.razorCutoffs),
+        4: pruned.nodes < plain.nodes,
+        5: [bestMove for stats, bestMove in results]
+    }
+    
+    expected_outputs = {
+        0: ("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 3", True,
+            "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"),
+        1: [False, False],
+        2: True,
+        3: (0, 0, 0, 0),
+        4: True,
+        5: ["d8d4", "d8d4"]
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+
+def test_batchEvaluation() -> tuple[str, int, int]:
+    fname = "batchEvaluation"
+    
+    # NumPy is only needed by BatchEvaluation
+    import src.BatchEvaluation
+    
+    fens = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+            "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R b KQ - 0 8"]
+    
+    # without mobility the batch must score every position exactly as GameState.evaluate does
+    matches = []
+    for backend in ('mailbox', 'bitboard'):
+        gamestates = [src.GameState.fromFEN(fen, backend) for fen in fens]
+        boards = [gamestate.board for gamestate in gamestates]
+        expected = [gamestate.evaluate() for gamestate in gamestates]
+        
+        # and the totals GameState keeps up to date move by move, including captures and castling
+        played = gamestates[1]
+        for move in played.getValidMoves():
+            played.move(move)
+            boards.append([row[:] for row in played.board])
+            expected.append(played.evaluate())
+            played.undoMove()
+        scores = src.BatchEvaluation.evaluateBatch(src.BatchEvaluation.stackPositions(boards), useMobility=False)
+        matches.append(scores.tolist() == expected)
+    
+    # the mobility term: a knight on a1 reaches 2 squares, a knight on b1 next to its rook and pawn 3
+    mobilityFens = ["4k3/8/8/8/8/8/8/N3K3 w - - 0 1", "n3k3/8/8/8/8/8/8/4K3 w - - 0 1", "4k3/8/8/8/8/8/P7/RN2K3 w - - 0 1"]
+    positions = src.BatchEvaluation.stackPositions([src.GameState.fromFEN(fen) for fen in mobilityFens])
+    mobility = src.BatchEvaluation.evaluateBatch(positions) - src.BatchEvaluation.evaluateBatch(positions, useMobility=False)
+    
+    actual_outputs = {
+        0: matches[0],
+        1: matches[1],
+        2: mobility.tolist()
+    }
+    
+    expected_outputs = {
+        0: True,
+        1: True,
+        2: [8, -8, 12]
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+
+def test_parallelSearch() -> tuple[str, int, int]:
+    fname = "parallelSearch"
+    
+    gamestate = src.GameState.fromFEN("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 'bitboard')
+    validMoves = gamestate.getValidMoves()
+    bestMove, depth, nodes = src.ChessBot.parallelSearch(gamestate, validMoves, 2, maxDepth=3)
+    
+    # a worker that exits without a result is left out instead of waited on
+    resultQueue = multiprocessing.Queue()
+    stopEvent = multiprocessing.Event()
+    workers = [multiprocessing.Process(target=os._exit, args=(1,)),
+               multiprocessing.Process(target=resultQueue.put, args=((1, 2, bestMove.moveID, 100),))]
+    for worker in workers:
+        worker.start()
+    results = src.ChessBot.collectResults(workers, resultQueue, stopEvent)
+    for worker in workers:
+        worker.join()
+    
+    actual_outputs = {
+        0: bestMove in validMoves,
+        1: depth,
+        2: nodes > 0,
+        3: gamestate.toFEN(),
+        4: (results, stopEvent.is_set())
+    }
+    
+    expected_outputs = {
+        0: True,
+        1: 3,
+        2: True,
+        3: "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        4: ([(1, 2, bestMove.moveID, 100)], True)
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+
+def test_searchWorker() -> tuple[str, int, int]:
+    fname = "searchWorker"
+    
+    worker = src.SearchWorker.SearchWorker('bitboard')
+    gamestate = src.GameState(backend='bitboard')
+    try:
+        # search, play the move in the game and the worker, then take it back in both
+        worker.startSearch(maxDepth=2)
+        while not worker.poll():
+            time.sleep(0.01)
+        validMoves = gamestate.getValidMoves()
+        bestMove = worker.getBestMove(validMoves)
+        gamestate.move(bestMove)
+        worker.pushMove(bestMove)
+        afterMove = worker.getFEN() == gamestate.toFEN()
+        gamestate.undoMove()
+        worker.undoMove()
+        afterUndo = worker.getFEN()
+    finally:
+        worker.close()
+    
+    actual_outputs = {
+        0: bestMove in validMoves,
+        1: afterMove,
+        2: afterUndo,
+        3: worker.process.exitcode
+    }
+    
+    expected_outputs = {
+        0: True,
+        1: True,
+        2: src.GameState.STARTING_FEN,
+        3: 0
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
+
+def test_ponder() -> tuple[str, int, int]:
+    fname = "ponder"
+    
+    def waitForMove(worker, validMoves):
+        deadline = time.perf_counter() + 30
+        while not worker.poll() and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        return worker.getBestMove(validMoves)
+    
+    def playBotMove(worker, gamestate):
+        worker.startSearch(maxDepth=3)
+        move = waitForMove(worker, gamestate.getValidMoves())
+        gamestate.move(move)
+        worker.pushMove(move)
+        return worker.startPonder(0.2)
+    
+    worker = src.SearchWorker.SearchWorker('bitboard')
+    gamestate = src.GameState(backend='bitboard')
+    try:
+        # a ponder hit: the ponder search goes on and its move is the bot's answer
+        hitStarted = playBotMove(worker, gamestate)
+        reply = next(move for move in gamestate.getValidMoves() if move.moveID == worker.ponderMove)
+        gamestate.move(reply)
+        worker.pushMove(reply)
+        stillSearching = worker.searching
+        validMoves = gamestate.getValidMoves()
+        hitMove = waitForMove(worker, validMoves)
+        gamestate.move(hitMove)
+        worker.pushMove(hitMove)
+        afterHit = worker.getFEN() == gamestate.toFEN()
+        
+        # a ponder miss: the ponder search is dropped and the worker takes back the reply it assumed
+        missStarted = playBotMove(worker, gamestate)
+        reply = next(move for move in gamestate.getValidMoves() if move.moveID != worker.ponderMove)
+        gamestate.move(reply)
+        worker.pushMove(reply)
+        dropped = not worker.searching and worker.ponderMove is None
+        afterMiss = worker.getFEN() == gamestate.toFEN()
+    finally:
+        worker.close()
+    
+    actual_outputs = {
+        0: (hitStarted, stillSearching, hitMove in validMoves),
+        1: afterHit,
+        2: (missStarted, dropped),
+        3: afterMiss
+    }
+    
+    expected_outputs = {
+        0: (True, True, True),
+        1: True,
+        2: (True, True),
+        3: True
+    }
+    
+    passed = 0
+    numTests = len(expected_outputs)
+    
+    for testNum in expected_outputs:
+        if (actual_outputs[testNum] == expected_outputs[testNum]):
+            passed += 1
+            
+        else:
+            print("\""+fname+"\""+ ": Test "+str(testNum)+" failed. \n\tExpected: "+str(expected_outputs[testNum])+" \n\tActual: "+str(actual_outputs[testNum]))
+    
+    return fname, passed, numTests
+
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
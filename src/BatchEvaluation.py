@@ -0,0 +1,164 @@
+'''
+Evaluates many positions in one call with NumPy, for scoring large position sets offline, ex. to tune
+or check the evaluation against a file of positions.
+
+It is not used by the search. Copying a board for every leaf and evaluating a few dozen of them at a time
+costs more than the incremental GameState.evaluate, and a depth 4 search of Kiwipete took 1.7x as long.
+
+Positions are stacked into an int8 array of shape (N, 8, 8) in the same layout as the board array,
+0 is an empty square, 1 to 6 are the white pawn, knight, bishop, rook, queen and king, and -1 to -6
+are the black pieces. Scores are in centipawns from white's point of view.
+
+Without the mobility term a position scores exactly the same as GameState.evaluate, the mobility term
+adds Evaluation.MOBILITY_WEIGHT for every square a knight, bishop, rook or queen attacks that is not taken
+by its own side.
+
+NumPy is only needed by this module, the rest of the engine runs without it.
+'''
+
+import numpy as np
+import Evaluation
+
+
+PIECE_TYPES = ('P', 'N', 'B', 'R', 'Q', 'K')
+
+PIECE_CODES = {'--': 0}
+for code, pieceType in enumerate(PIECE_TYPES, 1):
+    PIECE_CODES['w' + pieceType] = code
+    PIECE_CODES['b' + pieceType] = -code
+
+KNIGHT_STEPS = ((-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1))
+BISHOP_STEPS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_STEPS = ((0, -1), (0, 1), (1, 0), (-1, 0))
+MOBILITY_STEPS = {'N': (KNIGHT_STEPS, False), 'B': (BISHOP_STEPS, True),
+                  'R': (ROOK_STEPS, True), 'Q': (BISHOP_STEPS + ROOK_STEPS, True)}
+
+
+def _codeTables() -> tuple:
+    # indexed by piece code + 6, black pieces count negative
+    material = np.zeros(13, dtype=np.int32)
+    phase = np.zeros(13, dtype=np.int32)
+    mgSquare = np.zeros((13, 64), dtype=np.int32)
+    egSquare = np.zeros((13, 64), dtype=np.int32)
+    
+    for piece, code in PIECE_CODES.items():
+        if code == 0:
+            continue
+        sign = 1 if code > 0 else -1
+        material[code + 6] = sign * Evaluation.PIECE_VALUE[piece[1]]
+        phase[code + 6] = Evaluation.PHASE_WEIGHT[piece[1]]
+        mgSquare[code + 6] = [sign * value for value in Evaluation.MG_TABLES[piece]]
+        egSquare[code + 6] = [sign * value for value in Evaluation.EG_TABLES[piece]]
+        
+    return material, phase, mgSquare, egSquare
+
+
+MATERIAL_TABLE, PHASE_TABLE, MG_SQUARE_TABLE, EG_SQUARE_TABLE = _codeTables()
+SQUARES = np.arange(64)
+
+
+'''
+Converts a board array to an (8, 8) int8 array of piece codes.
+'''
+def boardToArray(board: list[list[str]]) -> np.ndarray:
+    return np.array([[PIECE_CODES[piece] for piece in row] for row in board], dtype=np.int8)
+
+
+'''
+Stacks the boards of GameStates, or board arrays, into an (N, 8, 8) int8 array.
+'''
+def stackPositions(positions: list) -> np.ndarray:
+    codes = [[PIECE_CODES[piece] for row in getattr(position, 'board', position) for piece in row] for position in positions]
+    return np.array(codes, dtype=np.int8).reshape(len(codes), 8, 8)
+
+
+'''
+Packs a stack of (8, 8) masks into one uint64 bitboard per position, square = row*8 + col as in Bitboard.py.
+'''
+def packMasks(masks: np.ndarray) -> np.ndarray:
+    packed = np.packbits(masks.reshape(len(masks), 64), axis=1, bitorder='little')
+    return packed.view('<u8').reshape(len(masks))
+
+
+def popCount(bitboards: np.ndarray) -> np.ndarray:
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitboards).astype(np.int32)
+    return np.unpackbits(bitboards.view(np.uint8).reshape(len(bitboards), 8), axis=1).sum(axis=1, dtype=np.int32)
+
+
+# after a shift of colStep columns the squares that wrapped around to the other side of the board are masked off
+NO_WRAP_MASKS = {}
+for colStep in range(-2, 3):
+    NO_WRAP_MASKS[colStep] = np.uint64(sum(1 << (row * 8 + col) for row in range(8) for col in range(8)
+                                           if 0 <= col - colStep < 8))
+
+
+'''
+Moves every bit of the bitboards by (rowStep, colStep), squares moved off the board are dropped.
+'''
+def shift(bitboards: np.ndarray, rowStep: int, colStep: int) -> np.ndarray:
+    offset = rowStep * 8 + colStep
+    if offset > 0:
+        shifted = bitboards << np.uint64(offset)
+    else:
+        shifted = bitboards >> np.uint64(-offset)
+    return shifted & NO_WRAP_MASKS[colStep]
+
+
+'''
+Counts for each position the squares the pieces attack that are not in own, all arguments are bitboards.
+Sliding pieces stop at the first occupied square, which is counted if it is not their own.
+'''
+def countAttacks(pieces: np.ndarray, own: np.ndarray, occupied: np.ndarray, steps: tuple, sliding: bool) -> np.ndarray:
+    counts = np.zeros(len(pieces), dtype=np.int32)
+    free = ~own
+    empty = ~occupied
+    
+    for rowStep, colStep in steps:
+        attackers = pieces
+        for distance in range(7 if sliding else 1):
+            attackers = shift(attackers, rowStep, colStep)
+            counts += popCount(attackers & free)
+            attackers = attackers & empty
+            if not attackers.any():
+                break
+            
+    return counts
+
+
+'''
+The mobility term of each position, from white's point of view.
+'''
+def mobility(positions: np.ndarray) -> np.ndarray:
+    occupied = packMasks(positions != 0)
+    scores = np.zeros(len(positions), dtype=np.int32)
+    
+    for sign, own in ((1, packMasks(positions > 0)), (-1, packMasks(positions < 0))):
+        for pieceType, (steps, sliding) in MOBILITY_STEPS.items():
+            pieces = packMasks(positions == sign * PIECE_CODES['w' + pieceType])
+            if pieces.any():
+                scores += sign * Evaluation.MOBILITY_WEIGHT[pieceType] * countAttacks(pieces, own, occupied, steps, sliding)
+                
+    return scores
+
+
+'''
+Evaluates an (N, 8, 8) int8 array of positions, returns an (N,) int32 array of scores.
+Material and piece-square values are looked up for all squares at once and blended by the game phase
+in the same way as Evaluation.taper.
+'''
+def evaluateBatch(positions: np.ndarray, useMobility: bool = True) -> np.ndarray:
+    positions = np.asarray(positions, dtype=np.int8)
+    codes = positions.reshape(len(positions), 64).astype(np.intp) + 6
+    
+    material = MATERIAL_TABLE[codes].sum(axis=1)
+    mgScore = material + MG_SQUARE_TABLE[codes, SQUARES].sum(axis=1)
+    egScore = material + EG_SQUARE_TABLE[codes, SQUARES].sum(axis=1)
+    phase = np.minimum(PHASE_TABLE[codes].sum(axis=1), Evaluation.MAX_PHASE)
+    
+    scores = (mgScore * phase + egScore * (Evaluation.MAX_PHASE - phase)) // Evaluation.MAX_PHASE
+    
+    if useMobility:
+        scores += mobility(positions)
+        
+    return scores.astype(np.int32)
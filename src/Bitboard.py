@@ -0,0 +1,174 @@
+'''
+Precomputed bitboard tables and attack functions used by the bitboard backed GameState.
+
+Squares are indexed the same way as the board array, square = row*8 + col,
+so a8 is bit 0 and h1 is bit 63. A bitboard is a python int where bit n is set
+if square n is part of the set.
+
+Slider attacks are looked up instead of walked: for every square, the occupancy of the squares that can
+block a rook or bishop there (its mask) indexes a table of the attacks, the same idea as magic or PEXT
+bitboards with a dict doing the hashing. The tables are built once on import from the rays.
+'''
+
+FULL_BOARD = 0xFFFFFFFFFFFFFFFF
+
+# rows as seen from the board array, ROW_MASKS[0] is the 8th rank
+ROW_MASKS = [0xFF << (8 * row) for row in range(8)]
+COL_MASKS = [0x0101010101010101 << col for col in range(8)]
+
+# ray directions as (row step, col step)
+NORTH, SOUTH, EAST, WEST = 0, 1, 2, 3
+NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST = 4, 5, 6, 7
+
+DIRECTION_STEPS = (
+    (-1, 0), (1, 0), (0, 1), (0, -1),
+    (-1, 1), (-1, -1), (1, 1), (1, -1)
+)
+
+ROOK_DIRECTIONS = (NORTH, SOUTH, EAST, WEST)
+BISHOP_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+
+# rays that move towards higher square indexes find their first blocker with the lowest set bit,
+# rays that move towards lower indexes find it with the highest set bit
+POSITIVE_DIRECTIONS = (SOUTH, EAST, SOUTH_EAST, SOUTH_WEST)
+NEGATIVE_DIRECTIONS = (NORTH, WEST, NORTH_EAST, NORTH_WEST)
+IS_POSITIVE_DIRECTION = [direction in POSITIVE_DIRECTIONS for direction in range(8)]
+
+
+def squareIndex(row: int, col: int) -> int:
+    return row * 8 + col
+
+
+def squareBit(row: int, col: int) -> int:
+    return 1 << (row * 8 + col)
+
+
+'''
+Returns the index of the least significant set bit.
+'''
+def lowestBit(bitboard: int) -> int:
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+'''
+Returns the index of the most significant set bit.
+'''
+def highestBit(bitboard: int) -> int:
+    return bitboard.bit_length() - 1
+
+
+'''
+Yields the index of every set bit, lowest first.
+'''
+def iterateBits(bitboard: int):
+    while bitboard:
+        lsb = bitboard & -bitboard
+        yield lsb.bit_length() - 1
+        bitboard ^= lsb
+
+
+def popCount(bitboard: int) -> int:
+    return bin(bitboard).count("1")
+
+
+def _stepAttacks(steps: tuple) -> list[int]:
+    table = []
+    for row in range(8):
+        for col in range(8):
+            attacks = 0
+            for rowStep, colStep in steps:
+                toRow = row + rowStep
+                toCol = col + colStep
+                if 0 <= toRow < 8 and 0 <= toCol < 8:
+                    attacks |= squareBit(toRow, toCol)
+            table.append(attacks)
+    return table
+
+
+def _rays() -> list[list[int]]:
+    rays = []
+    for rowStep, colStep in DIRECTION_STEPS:
+        directionRays = []
+        for row in range(8):
+            for col in range(8):
+                ray = 0
+                toRow = row + rowStep
+                toCol = col + colStep
+                while 0 <= toRow < 8 and 0 <= toCol < 8:
+                    ray |= squareBit(toRow, toCol)
+                    toRow += rowStep
+                    toCol += colStep
+                directionRays.append(ray)
+        rays.append(directionRays)
+    return rays
+
+
+KNIGHT_ATTACKS = _stepAttacks(((-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1)))
+KING_ATTACKS = _stepAttacks(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+
+# PAWN_ATTACKS[0] are the squares attacked by a white pawn, PAWN_ATTACKS[1] by a black pawn
+PAWN_ATTACKS = [_stepAttacks(((-1, -1), (-1, 1))), _stepAttacks(((1, -1), (1, 1)))]
+
+RAYS = _rays()
+
+
+'''
+Gets the squares attacked along one ray, stopping at (and including) the first blocker.
+'''
+def rayAttacks(square: int, direction: int, occupancy: int) -> int:
+    ray = RAYS[direction][square]
+    blockers = ray & occupancy
+    if blockers:
+        if IS_POSITIVE_DIRECTION[direction]:
+            first = (blockers & -blockers).bit_length() - 1
+        else:
+            first = blockers.bit_length() - 1
+        ray ^= RAYS[direction][first]
+    return ray
+
+
+'''
+Builds the blocker masks and attack tables of a slider moving in the given directions.
+A ray's last square is left out of the mask, a piece there can not block anything behind it.
+Every subset of a mask is visited with the carry-rippler trick, sub = (sub - mask) & mask.
+'''
+def _sliderTables(directions: tuple) -> tuple[list[int], list[dict]]:
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = 0
+        for direction in directions:
+            ray = RAYS[direction][square]
+            if ray:
+                edge = highestBit(ray) if IS_POSITIVE_DIRECTION[direction] else lowestBit(ray)
+                mask |= ray & ~(1 << edge)
+        
+        table = {}
+        blockers = 0
+        while True:
+            attacks = 0
+            for direction in directions:
+                attacks |= rayAttacks(square, direction, blockers)
+            table[blockers] = attacks
+            blockers = (blockers - mask) & mask
+            if blockers == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+ROOK_MASKS, ROOK_TABLES = _sliderTables(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _sliderTables(BISHOP_DIRECTIONS)
+
+
+def rookAttacks(square: int, occupancy: int) -> int:
+    return ROOK_TABLES[square][occupancy & ROOK_MASKS[square]]
+
+
+def bishopAttacks(square: int, occupancy: int) -> int:
+    return BISHOP_TABLES[square][occupancy & BISHOP_MASKS[square]]
+
+
+def queenAttacks(square: int, occupancy: int) -> int:
+    return ROOK_TABLES[square][occupancy & ROOK_MASKS[square]] | BISHOP_TABLES[square][occupancy & BISHOP_MASKS[square]]
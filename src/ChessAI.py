@@ -3,15 +3,74 @@ Handles the logic for the computer chess 'bot'.
 
 '''
 
-from queue import Queue
+from queue import Queue, Empty
+import multiprocessing
 import random
+import time
 from Engine import *
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE, encodeMove
+from SearchStats import SearchStats
 
 
-CHECKMATE_VALUE = 100
+# score of being checkmated at the root, a mate ply plies from the root scores CHECKMATE_VALUE - ply
+# so shorter mates score higher, scores past TABLEBASE_WIN_VALUE are mates
+CHECKMATE_VALUE = 100000
 STALEMATE_VALUE = 0
+
+# score of a repeated position or one after 50 moves without a capture or pawn move
+DRAW_VALUE = 0
+
+# score of a tablebase win, less the plies to mate so shorter mates score higher
+TABLEBASE_WIN_VALUE = CHECKMATE_VALUE // 2
 MAX_DEPTH = 3
 
+# deepest iteration tried when the search is limited by time or nodes instead of depth
+MAX_ITERATIVE_DEPTH = 64
+
+# how many nodes are searched between checks of the clock
+NODES_PER_TIME_CHECK = 1024
+
+# deepest ply that has killer move slots
+MAX_PLY = 128
+
+# move ordering scores, higher is searched first
+HASH_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+PROMOTION_SCORE = 90000
+FIRST_KILLER_SCORE = 80000
+SECOND_KILLER_SCORE = 79000
+
+# the history table is halved once a score passes this, so quiet moves stay below the killers
+HISTORY_LIMIT = 50000
+
+# selective search, see getNegaMaxAlphaBeta
+# the null move is searched NULL_MOVE_REDUCTION plies shallower than a move would be, one more from NULL_MOVE_DEEP_DEPTH on
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 6
+
+# quiet moves from the LMR_MIN_MOVES'th on are searched 1 ply shallower, from the LMR_DEEP_MOVES'th on 2 plies
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_DEEP_MOVES = 6
+
+# centipawns the static score may fall short of alpha by before futility pruning or razoring, by depth left
+FUTILITY_MARGINS = (0, 200, 500)
+RAZOR_MARGINS = (0, 300, 600)
+
+# scores past this are mates or tablebase wins, the selective search stays out of windows that reach them.
+# They count plies from the root and are stored in the transposition table counting from the node instead.
+WIN_SCORE_BOUND = TABLEBASE_WIN_VALUE // 2
+
+# memory budget of the transposition table, kept between the bot's moves
+TT_SIZE_MB = 16
+
+# search processes started by parallelSearch when no count is given
+SMP_WORKERS = max(1, multiprocessing.cpu_count())
+
+# seconds parallelSearch waits for a result before checking that its workers are still running
+WORKER_POLL_SECONDS = 0.5
+
 
 MATERIAL_VALUE = {
     'K' : 0,
@@ -22,8 +81,52 @@ MATERIAL_VALUE = {
     'P' : 1
 }
 
+# piece values for static exchange evaluation, the king is worth more than everything
+# so a capture with the king only pays off if nothing can recapture
+EXCHANGE_VALUE = dict(MATERIAL_VALUE, K=100)
+
+
+'''
+Raised inside the search when the time or node budget runs out.
+'''
+class SearchAborted(Exception):
+    pass
+
 
 class ChessBot:
+    transpositionTable = TranspositionTable(TT_SIZE_MB)
+    
+    # budget of the running search, set by iterativeDeepening
+    nodes = 0
+    nodeLimit = None
+    deadline = None
+    
+    # anything with an is_set method, the search stops once it is set (see parallelSearch and SearchWorker)
+    stopEvent = None
+    
+    # selective search, each can be switched off on its own, see getNegaMaxAlphaBeta
+    useNullMove = True
+    useLateMoveReductions = True
+    useFutilityPruning = True
+    useRazoring = True
+    
+    # move ordering state, see orderMoves
+    useMoveOrdering = True
+    killerMoves = [[NO_MOVE, NO_MOVE] for ply in range(MAX_PLY)]
+    historyTable = [[0] * 4096, [0] * 4096]
+    
+    # nodes searched by each completed iteration of the last search, and the depth of the last one
+    iterationNodes = []
+    completedDepth = 0
+    
+    # SearchStats of the running search, only set while iterativeDeepening was given one
+    stats = None
+    
+    # OpeningBook the bot plays from before searching, None to always search
+    openingBook = None
+    
+    # Tablebase.Tablebases probed at the root and in the search once few enough pieces are left, None to not use them
+    tablebases = None
     
     '''
     Get the sum of the piece material value,
@@ -45,6 +148,15 @@ class ChessBot:
         return score
         
         
+    '''
+    The static evaluation in centipawns from white's point of view, material and piece-square values
+    blended by game phase. GameState keeps the totals up to date on every move, so nothing is recounted here.
+    '''
+    @staticmethod
+    def evaluate(gameState: GameState) -> int:
+        return gameState.evaluate()
+        
+        
     '''
     A greedy algorithm for the chess bot that determines its move based on how much value it takes away
     from the opponent.
@@ -55,7 +167,7 @@ class ChessBot:
     '''
     @staticmethod
     def greedyChoice(gameState: GameState, valid_moves: list[Move]) -> Move:
-        max = -1000
+        max = -CHECKMATE_VALUE
         bestMove = valid_moves[0]
         currentScore = None
         
@@ -69,7 +181,7 @@ class ChessBot:
                 currentScore = STALEMATE_VALUE
             else:
                 mult = -1 if gameState.whiteToMove else 1
-                currentScore = mult * ChessBot.scoreMaterial(gameState.board)
+                currentScore = mult * ChessBot.evaluate(gameState)
                 
             if currentScore > max:
                 max = currentScore
@@ -79,19 +191,23 @@ class ChessBot:
             
         return bestMove
             
+    '''
+    Finds the best move with a plain minimax search to depth plies.
+    '''
     @staticmethod
-    def findMoveMiniMax(gameState: GameState, valid_moves: list[Move]):
+    def findMoveMiniMax(gameState: GameState, valid_moves: list[Move], depth: int = MAX_DEPTH):
         global nextMove
         nextMove = valid_moves[0]
-        ChessBot.miniMax(gameState, valid_moves, MAX_DEPTH, gameState.whiteToMove)
+        ChessBot.miniMax(gameState, valid_moves, depth, gameState.whiteToMove)
         return nextMove
 
 
     '''
     Recursive implementation for the minimize-maximize chess algorithm 
+    ply is the distance from the root, the best move at the root is written to nextMove.
     '''
     @staticmethod
-    def miniMax(gameState: GameState, valid_moves: list[Move], depth: int, whiteToMove: bool) -> int:
+    def miniMax(gameState: GameState, valid_moves: list[Move], depth: int, whiteToMove: bool, ply: int = 0) -> int:
         global nextMove
         if depth == 0:
             return ChessBot.scoreMaterial(gameState.board)
@@ -105,11 +221,11 @@ class ChessBot:
                 
                 new_valid_moves = gameState.getValidMoves()
                 
-                score = ChessBot.miniMax(gameState, new_valid_moves, depth-1, not whiteToMove)
+                score = ChessBot.miniMax(gameState, new_valid_moves, depth-1, not whiteToMove, ply+1)
             
                 if score > maxScore:
                     maxScore = score
-                    if depth == MAX_DEPTH:
+                    if ply == 0:
                         nextMove = move
     
                 gameState.undoMove()
@@ -125,11 +241,11 @@ class ChessBot:
                 
                 new_valid_moves = gameState.getValidMoves()
                 
-                score = ChessBot.miniMax(gameState, new_valid_moves, depth-1, not whiteToMove)
+                score = ChessBot.miniMax(gameState, new_valid_moves, depth-1, not whiteToMove, ply+1)
             
                 if score < minScore:
                     minScore = score
-                    if depth == MAX_DEPTH:
+                    if ply == 0:
                         nextMove = move
     
                 gameState.undoMove()
@@ -137,25 +253,137 @@ class ChessBot:
             return minScore
     
     
+    '''
+    Negamax with alpha-beta pruning.
+    The transposition table is probed before the moves are generated. A stored result that is at least as deep
+    as this search can cut the node off or narrow the window, and the stored best move is searched first.
+    valid_moves can be None, in which case they are generated after the table probe.
+    ply is the distance from the root, the best move at the root is written to nextMove.
+    Raises SearchAborted once the node or time budget of the search is used up.
+    
+    The moves after the first are searched with a null window, and only searched again with the full window
+    if they beat alpha. When not in check, and below the root away from mate scores, the search is selective:
+        - razoring: one or two plies from the leaves with the static score far below alpha, a quiescence search
+          that stays below alpha ends the node
+        - null move pruning: the side to move passes, and if a shallower search still fails high so would the node.
+          Not after another null move, or for a side without pieces other than pawns, where zugzwang is likely.
+        - futility pruning: one or two plies from the leaves with the static score far below alpha, quiet moves
+          that do not give check are skipped
+        - late move reductions: quiet moves late in the order that do not give check, and are not the hash move
+          or a killer, are searched shallower and searched again at full depth if they beat alpha
+    '''
     @staticmethod
-    def getNegaMaxAlphaBeta(gameState: GameState, valid_moves: list[Move], depth: int, turnMult: int, alpha: int, beta: int):
+    def getNegaMaxAlphaBeta(gameState: GameState, valid_moves: list[Move], depth: int, turnMult: int, alpha: int, beta: int, ply: int = 0):
         global nextMove
+        ChessBot.visitNode()
+        
+        # a draw by repetition or the fifty move rule ends the line here, its subtree is not searched
+        if ply > 0 and (gameState.isRepetition() or gameState.isFiftyMoveDraw()):
+            if ChessBot.stats is not None:
+                ChessBot.stats.drawCutoffs += 1
+            return DRAW_VALUE
+        
+        key = gameState.zobristKey
+        table = ChessBot.transpositionTable
+        originalAlpha = alpha
+        hashMove = NO_MOVE
+        
+        entry = table.probe(key)
+        if entry is not None:
+            entryDepth, entryScore, entryFlag, hashMove = entry
+            entryScore = ChessBot.scoreFromTable(entryScore, ply)
+            if entryDepth >= depth and ply > 0:
+                if entryFlag == EXACT:
+                    return entryScore
+                if entryFlag == LOWER_BOUND and entryScore > alpha:
+                    alpha = entryScore
+                elif entryFlag == UPPER_BOUND and entryScore < beta:
+                    beta = entryScore
+                if alpha >= beta:
+                    return entryScore
+        
+        if ply > 0 and ChessBot.tablebases is not None:
+            tablebaseScore = ChessBot.probeTablebases(gameState, ply)
+            if tablebaseScore is not None:
+                if ChessBot.stats is not None:
+                    ChessBot.stats.tablebaseHits += 1
+                return tablebaseScore
+        
         if depth == 0:
-            return turnMult * ChessBot.scoreMaterial(gameState.board)
+            return ChessBot.quiescence(gameState, turnMult, alpha, beta, ply)
+        
+        inCheck = False
+        if ChessBot.useNullMove or ChessBot.useLateMoveReductions or ChessBot.useFutilityPruning or ChessBot.useRazoring:
+            inCheck = gameState.isInCheck()
+        pruning = ply > 0 and not inCheck and alpha > -WIN_SCORE_BOUND and beta < WIN_SCORE_BOUND
+        staticScore = turnMult * ChessBot.evaluate(gameState) if pruning else 0
+        
+        if pruning and ChessBot.useRazoring and depth < len(RAZOR_MARGINS) and staticScore + RAZOR_MARGINS[depth] <= alpha:
+            score = ChessBot.quiescence(gameState, turnMult, alpha, alpha + 1, ply)
+            if score <= alpha:
+                if ChessBot.stats is not None:
+                    ChessBot.stats.razorCutoffs += 1
+                return score
+        
+        if (pruning and ChessBot.useNullMove and depth >= NULL_MOVE_MIN_DEPTH and staticScore >= beta
+                and gameState.moveLog[-1] is not None and gameState.hasNonPawnMaterial(gameState.whiteToMove)):
+            reduction = NULL_MOVE_REDUCTION + (depth >= NULL_MOVE_DEEP_DEPTH)
+            gameState.makeNullMove()
+            score = -ChessBot.getNegaMaxAlphaBeta(gameState, None, max(0, depth - 1 - reduction), -turnMult, -beta, -beta + 1, ply + 1)
+            gameState.undoNullMove()
+            if score >= beta:
+                if ChessBot.stats is not None:
+                    ChessBot.stats.nullMoveCutoffs += 1
+                # a mate found after passing is not proven for the real moves
+                return beta if score >= WIN_SCORE_BOUND else score
+        
+        futile = (pruning and ChessBot.useFutilityPruning and depth < len(FUTILITY_MARGINS)
+                  and staticScore + FUTILITY_MARGINS[depth] <= alpha)
+        lateMoveReductions = ChessBot.useLateMoveReductions and depth >= LMR_MIN_DEPTH and not inCheck
+        killers = ChessBot.killerMoves[ply] if ply < MAX_PLY else (NO_MOVE, NO_MOVE)
+        
+        if valid_moves is None and ChessBot.useMoveOrdering:
+            valid_moves = ChessBot.stagedMoves(gameState, hashMove, ply)
+        else:
+            if valid_moves is None:
+                valid_moves = gameState.getValidMoves()
+            if ChessBot.useMoveOrdering:
+                valid_moves = ChessBot.orderMoves(valid_moves, hashMove, ply, gameState.whiteToMove)
 
         maxScore = -CHECKMATE_VALUE
+        bestMove = None
             
-        for move in valid_moves:
+        for moveNumber, move in enumerate(valid_moves):
+            quiet = move.pieceCaptured == '--' and not move.pawnPromotionMove and not move.enpassantMove
             gameState.move(move)
             
-            nextMoves = gameState.getValidMoves()
+            reduction = 0
+            if quiet and bestMove is not None and (futile or (lateMoveReductions and moveNumber >= LMR_MIN_MOVES
+                    and move.moveID != hashMove and move.moveID not in killers)) and not gameState.isInCheck():
+                if futile:
+                    gameState.undoMove()
+                    if ChessBot.stats is not None:
+                        ChessBot.stats.futilityPrunes += 1
+                    continue
+                reduction = 1 if moveNumber < LMR_DEEP_MOVES else 2
             
-            # make a recursive call but flip and negate alpha and beta parameters
-            score = -ChessBot.getNegaMaxAlphaBeta(gameState, nextMoves, depth - 1, -turnMult, -beta, -alpha)
+            if bestMove is None:
+                # make a recursive call but flip and negate alpha and beta parameters
+                score = -ChessBot.getNegaMaxAlphaBeta(gameState, None, depth - 1, -turnMult, -beta, -alpha, ply + 1)
+            else:
+                # the moves after the first are expected to fail low, which a null window search shows for less
+                score = -ChessBot.getNegaMaxAlphaBeta(gameState, None, depth - 1 - reduction, -turnMult, -alpha - 1, -alpha, ply + 1)
+                if reduction and ChessBot.stats is not None:
+                    ChessBot.stats.lateMoveReductions += 1
+                if score > alpha and (reduction or score < beta):
+                    if reduction and ChessBot.stats is not None:
+                        ChessBot.stats.lateMoveResearches += 1
+                    score = -ChessBot.getNegaMaxAlphaBeta(gameState, None, depth - 1, -turnMult, -beta, -alpha, ply + 1)
 
-            if score > maxScore:
+            if score > maxScore or bestMove is None:
                 maxScore = score
-                if depth == MAX_DEPTH:
+                bestMove = move
+                if ply == 0:
                     nextMove = move
             
             gameState.undoMove()        
@@ -163,24 +391,599 @@ class ChessBot:
                 alpha = maxScore
                 
             if alpha >= beta:
+                if move.pieceCaptured == '--' and not move.pawnPromotionMove:
+                    ChessBot.storeQuietCutoff(move, depth, ply, gameState.whiteToMove)
+                if ChessBot.stats is not None:
+                    ChessBot.stats.betaCutoffs += 1
+                    if moveNumber == 0:
+                        ChessBot.stats.firstMoveCutoffs += 1
                 break
+        
+        # no legal moves, nothing was searched so inCheck is still the one found for this position
+        if bestMove is None:
+            return -(CHECKMATE_VALUE - ply) if gameState.inCheck else STALEMATE_VALUE
             
-            
+        if maxScore <= originalAlpha:
+            flag = UPPER_BOUND
+        elif maxScore >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        table.store(key, depth, ChessBot.scoreToTable(maxScore, ply), flag, encodeMove(bestMove))
+        
+        return maxScore
+    
+    '''
+    Converts a score counting mate and tablebase win distances from the root to one counting them from the node
+    ply plies into the search, for the transposition table, which can find the node again at another ply.
+    '''
+    @staticmethod
+    def scoreToTable(score: int, ply: int) -> int:
+        if score >= WIN_SCORE_BOUND:
+            return score + ply
+        if score <= -WIN_SCORE_BOUND:
+            return score - ply
+        return score
+    
+    '''
+    Converts a score from the transposition table back to one counting distances from the root, see scoreToTable.
+    '''
+    @staticmethod
+    def scoreFromTable(score: int, ply: int) -> int:
+        if score >= WIN_SCORE_BOUND:
+            return score - ply
+        if score <= -WIN_SCORE_BOUND:
+            return score + ply
+        return score
+    
+    '''
+    Counts a searched node and raises SearchAborted once the node or time budget is used up,
+    or another worker of a parallel search finished.
+    '''
+    @staticmethod
+    def visitNode() -> None:
+        ChessBot.nodes += 1
+        if ChessBot.nodeLimit is not None and ChessBot.nodes >= ChessBot.nodeLimit:
+            raise SearchAborted()
+        if ChessBot.nodes % NODES_PER_TIME_CHECK == 0:
+            if ChessBot.deadline is not None and time.perf_counter() >= ChessBot.deadline:
+                raise SearchAborted()
+            if ChessBot.stopEvent is not None and ChessBot.stopEvent.is_set():
+                raise SearchAborted()
+    
+    '''
+    Searches only captures and promotions past the horizon, so a leaf is never scored in the middle of an exchange.
+    The side to move can always stand pat on the static score instead of capturing, so the quiet moves are never
+    generated and a stalemate is only scored as one when it is reached in the main search.
+    Captures that lose material according to the static exchange evaluation are skipped.
+    When in check every evasion is searched, since standing pat is not an option.
+    ply is the distance from the root, which a checkmate is scored by.
+    '''
+    @staticmethod
+    def quiescence(gameState: GameState, turnMult: int, alpha: int, beta: int, ply: int = 0) -> int:
+        ChessBot.visitNode()
+        if ChessBot.stats is not None:
+            ChessBot.stats.quiescenceNodes += 1
+        
+        if gameState.isInCheck():
+            moves = gameState.getValidMoves()
+            if len(moves) == 0:
+                return -(CHECKMATE_VALUE - ply)
+            maxScore = -CHECKMATE_VALUE
+        else:
+            maxScore = turnMult * ChessBot.evaluate(gameState)
+            if maxScore >= beta:
+                return maxScore
+            if maxScore > alpha:
+                alpha = maxScore
+                
+            moves = []
+            for move in gameState.getLegalNoisyMoves(gameState.getLegalityInfo()):
+                if (move.pawnPromotionMove and move.promotionPiece == 'Q') or (move.pieceCaptured != '--' and ChessBot.staticExchange(gameState, move) >= 0):
+                    moves.append(move)
+                    
+        moves = ChessBot.orderMoves(moves, NO_MOVE, MAX_PLY, gameState.whiteToMove)
         
+        for move in moves:
+            gameState.move(move)
+            score = -ChessBot.quiescence(gameState, -turnMult, -beta, -alpha, ply + 1)
+            gameState.undoMove()
+            
+            if score > maxScore:
+                maxScore = score
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    break
+                
         return maxScore
+    
+    '''
+    Static exchange evaluation: the material the side to move wins or loses on the target square of a capture
+    if both sides keep recapturing there with their least valuable attacker, and either side may stop when
+    continuing would lose material.
+    The board is only read, captured pieces are tracked in a set so sliders behind them (x-rays) join in.
+    '''
+    @staticmethod
+    def staticExchange(gameState: GameState, move: Move) -> int:
+        board = gameState.board
+        row, col = move.toRow, move.toCol
+        removed = {(move.fromRow, move.fromCol)}
+        if move.enpassantMove:
+            removed.add((move.fromRow, move.toCol))
+        
+        gains = [EXCHANGE_VALUE[move.pieceCaptured[1]]]
+        pieceType = move.promotionPiece if move.pawnPromotionMove else move.pieceMoved[1]
+        if move.pawnPromotionMove:
+            gains[0] += EXCHANGE_VALUE[pieceType] - EXCHANGE_VALUE['P']
+        color = 'b' if move.pieceMoved[0] == 'w' else 'w'
+        
+        while True:
+            attacker = ChessBot.leastValuableAttacker(board, row, col, color, removed)
+            if attacker is None:
+                break
+            # the gain if this side recaptures the piece standing on the square
+            gains.append(EXCHANGE_VALUE[pieceType] - gains[-1])
+            pieceType, square = attacker
+            removed.add(square)
+            color = 'b' if color == 'w' else 'w'
+            
+        # each side picks the better of recapturing or stopping, from the end of the sequence back
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+    
+    '''
+    Finds the least valuable piece of the given color attacking the square, ignoring the removed squares.
+    Returns (piece type, (row, col)) or None.
+    '''
+    @staticmethod
+    def leastValuableAttacker(board, row: int, col: int, color: str, removed: set):
+        pawnRow = row + 1 if color == 'w' else row - 1
+        if 0 <= pawnRow < 8:
+            for pawnCol in (col - 1, col + 1):
+                if 0 <= pawnCol < 8 and board[pawnRow][pawnCol] == color + 'P' and (pawnRow, pawnCol) not in removed:
+                    return 'P', (pawnRow, pawnCol)
+                
+        for r, c in GameState.KNIGHT_DIRECTIONS:
+            toRow = row + r
+            toCol = col + c
+            if 0 <= toRow < 8 and 0 <= toCol < 8 and board[toRow][toCol] == color + 'N' and (toRow, toCol) not in removed:
+                return 'N', (toRow, toCol)
+        
+        # the first piece seen along each ray, with removed pieces treated as empty squares
+        sliders = {}
+        for directions, types in ((GameState.BISHOP_DIRECTIONS, 'BQ'), (GameState.ROOK_DIRECTIONS, 'RQ')):
+            for r, c in directions:
+                toRow = row + r
+                toCol = col + c
+                while 0 <= toRow < 8 and 0 <= toCol < 8:
+                    piece = board[toRow][toCol]
+                    if piece != '--' and (toRow, toCol) not in removed:
+                        if piece[0] == color and piece[1] in types and piece[1] not in sliders:
+                            sliders[piece[1]] = (toRow, toCol)
+                        break
+                    toRow += r
+                    toCol += c
+                    
+        for pieceType in ('B', 'R', 'Q'):
+            if pieceType in sliders:
+                return pieceType, sliders[pieceType]
+            
+        for r, c in GameState.KING_DIRECTIONS:
+            toRow = row + r
+            toCol = col + c
+            if 0 <= toRow < 8 and 0 <= toCol < 8 and board[toRow][toCol] == color + 'K' and (toRow, toCol) not in removed:
+                return 'K', (toRow, toCol)
+            
+        return None
+    
+    '''
+    Sorts the moves so the ones most likely to cause a cutoff are searched first:
+        - the best move stored in the transposition table
+        - captures, most valuable victim first, then least valuable attacker first (MVV-LVA)
+        - promotions
+        - the two killer moves of this ply, quiet moves that caused a cutoff in a sibling node
+        - the other quiet moves by their history score
+    Returns a new list, the given list is not changed.
+    '''
+    @staticmethod
+    def orderMoves(valid_moves: list[Move], hashMove: int, ply: int, whiteToMove: bool) -> list[Move]:
+        killers = ChessBot.killerMoves[ply] if ply < MAX_PLY else (NO_MOVE, NO_MOVE)
+        history = ChessBot.historyTable[0 if whiteToMove else 1]
+        scores = []
+        
+        for move in valid_moves:
+            code = move.moveID
+            if code == hashMove:
+                score = HASH_MOVE_SCORE
+            elif move.pieceCaptured != '--':
+                score = CAPTURE_SCORE + 10 * MATERIAL_VALUE[move.pieceCaptured[1]] - MATERIAL_VALUE[move.pieceMoved[1]]
+            elif move.pawnPromotionMove:
+                score = PROMOTION_SCORE + MATERIAL_VALUE[move.promotionPiece]
+            elif code == killers[0]:
+                score = FIRST_KILLER_SCORE
+            elif code == killers[1]:
+                score = SECOND_KILLER_SCORE
+            else:
+                score = history[code]
+            scores.append(score)
             
+        order = sorted(range(len(valid_moves)), key=scores.__getitem__, reverse=True)
+        return [valid_moves[i] for i in order]
+    
+    '''
+    Yields the legal moves in stages, each stage is only generated once the search asks for its first move,
+    so a cutoff on an early move skips the work of the later stages:
+        - the hash move, checked against the position since its id may come from a different position
+        - captures and promotions, ordered by MVV-LVA
+        - the killer moves of this ply, if they are legal quiet moves here
+        - the other quiet moves and castling, ordered by their history score
+    Sets gameState.inCheck before the first move is yielded.
+    '''
+    @staticmethod
+    def stagedMoves(gameState: GameState, hashMove: int, ply: int):
+        legalityInfo = gameState.getLegalityInfo()
+        kingPos, numCheckers = legalityInfo[0], legalityInfo[1]
+        whiteToMove = gameState.whiteToMove
+        
+        # in double check only the king can move, too few moves to be worth staging
+        if numCheckers > 1:
+            moves = []
+            gameState.addLegalMoves(moves, gameState.getKingMoves(kingPos[0], kingPos[1]), legalityInfo)
+            yield from ChessBot.orderMoves(moves, hashMove, ply, whiteToMove)
+            return
+        
+        searched = set()
+        
+        if hashMove != NO_MOVE:
+            move = gameState.getPseudoMove(hashMove)
+            if move is not None:
+                moves = []
+                gameState.addLegalMoves(moves, [move], legalityInfo)
+                if moves:
+                    searched.add(hashMove)
+                    yield move
+                    
+        noisyMoves = gameState.getLegalNoisyMoves(legalityInfo)
+        for move in ChessBot.orderMoves(noisyMoves, NO_MOVE, ply, whiteToMove):
+            if move.moveID not in searched:
+                yield move
+                
+        killers = tuple(ChessBot.killerMoves[ply]) if ply < MAX_PLY else ()
+        for code in killers:
+            if code == NO_MOVE or code in searched:
+                continue
+            move = gameState.getPseudoMove(code)
+            if move is None or move.pieceCaptured != '--' or move.pawnPromotionMove:
+                continue
+            moves = []
+            gameState.addLegalMoves(moves, [move], legalityInfo)
+            if moves:
+                searched.add(code)
+                yield move
+                
+        quietMoves = []
+        if numCheckers == 0:
+            quietMoves.extend(gameState.getCastleMoves(kingPos[0], kingPos[1], legalityInfo[4]))
+        quietMoves.extend(gameState.getLegalQuietMoves(legalityInfo))
+        for move in ChessBot.orderMoves(quietMoves, NO_MOVE, ply, whiteToMove):
+            if move.moveID not in searched:
+                yield move
+    
+    '''
+    Remembers a quiet move that caused a beta cutoff as a killer of its ply and rewards it in the history table.
+    '''
+    @staticmethod
+    def storeQuietCutoff(move: Move, depth: int, ply: int, whiteToMove: bool) -> None:
+        code = move.moveID
+        
+        if ply < MAX_PLY:
+            killers = ChessBot.killerMoves[ply]
+            if killers[0] != code:
+                killers[1] = killers[0]
+                killers[0] = code
+                
+        history = ChessBot.historyTable[0 if whiteToMove else 1]
+        history[code] += depth * depth
+        if history[code] > HISTORY_LIMIT:
+            ChessBot.ageHistory()
+    
+    '''
+    Halves every history score so older cutoffs count for less than recent ones.
+    '''
     @staticmethod
-    def getNegaMaxMove(gameState: GameState, valid_moves: list[Move], ret_queue: Queue):
+    def ageHistory() -> None:
+        for history in ChessBot.historyTable:
+            for i in range(len(history)):
+                history[i] >>= 1
+                
+    '''
+    The effective branching factor of the last search, the growth in nodes between its last two completed iterations.
+    '''
+    @staticmethod
+    def effectiveBranchingFactor() -> float:
+        nodes = ChessBot.iterationNodes
+        if len(nodes) < 2 or nodes[-2] == 0:
+            return 0.0
+        return nodes[-1] / nodes[-2]
+            
+    '''
+    Searches depth 1, 2, 3... until maxDepth, the deadline or the node limit is reached.
+    Each iteration leaves its best moves in the transposition table, where the next iteration
+    finds them and searches them first.
+    startDepth lets the helpers of a parallel search skip the first iterations.
+    stats, if given, is filled with the telemetry of the search.
+    Returns the best move of the last completed iteration.
+    '''
+    @staticmethod
+    def iterativeDeepening(gameState: GameState, valid_moves: list[Move], maxDepth: int, timeLimit: float = None, nodeLimit: int = None, startDepth: int = 1, stats: SearchStats = None) -> Move:
         global nextMove
-        nextMove = valid_moves[0]
+        bestMove = valid_moves[0]
+        turnMult = 1 if gameState.whiteToMove else -1
+        moveLogLength = len(gameState.moveLog)
         
-        ChessBot.getNegaMaxAlphaBeta(gameState, valid_moves, MAX_DEPTH, 1 if gameState.whiteToMove else -1, -CHECKMATE_VALUE, CHECKMATE_VALUE)
+        ChessBot.nodes = 0
+        ChessBot.nodeLimit = nodeLimit
+        ChessBot.deadline = time.perf_counter() + timeLimit if timeLimit is not None else None
+        ChessBot.transpositionTable.newSearch()
+        # cleared in place, the tournament swaps each player's own killer table into ChessBot
+        for killers in ChessBot.killerMoves:
+            killers[0] = killers[1] = NO_MOVE
+        ChessBot.ageHistory()
+        ChessBot.iterationNodes = []
+        ChessBot.completedDepth = 0
+        
+        ChessBot.stats = stats
+        table = ChessBot.transpositionTable
+        searchStart = time.perf_counter()
+        probesStart = table.probes
+        hitsStart = table.hits
+        
+        try:
+            for depth in range(min(startDepth, maxDepth), maxDepth + 1):
+                nextMove = bestMove
+                iterationStart = ChessBot.nodes
+                iterationTime = time.perf_counter()
+                score = ChessBot.getNegaMaxAlphaBeta(gameState, valid_moves, depth, turnMult, -CHECKMATE_VALUE, CHECKMATE_VALUE)
+                bestMove = nextMove
+                ChessBot.iterationNodes.append(ChessBot.nodes - iterationStart)
+                ChessBot.completedDepth = depth
+                if stats is not None:
+                    stats.addIteration(depth, score, bestMove, ChessBot.nodes - iterationStart, time.perf_counter() - iterationTime)
+                
+                # a mate within the iteration's depth can not be beaten by a shorter one deeper down
+                if abs(score) > TABLEBASE_WIN_VALUE and CHECKMATE_VALUE - abs(score) <= depth:
+                    break
+        except SearchAborted:
+            # unwind the moves the interrupted iteration left on the board
+            while len(gameState.moveLog) > moveLogLength:
+                if gameState.moveLog[-1] is None:
+                    gameState.undoNullMove()
+                else:
+                    gameState.undoMove()
+        finally:
+            ChessBot.nodeLimit = None
+            ChessBot.deadline = None
+            ChessBot.stats = None
         
-        # instead of returing, put the nextMove in the valid queue
-        ret_queue.put(nextMove)
+        if stats is not None:
+            stats.finish(bestMove, ChessBot.nodes, time.perf_counter() - searchStart, table.probes - probesStart, table.hits - hitsStart)
+            
+        return bestMove
+            
+    '''
+    The depth to search to, with timeLimit or nodeLimit the search deepens until the budget runs out,
+    otherwise it searches to maxDepth, which defaults to defaultDepth.
+    '''
+    @staticmethod
+    def searchDepth(maxDepth: int, timeLimit: float, nodeLimit: int, defaultDepth: int = MAX_DEPTH) -> int:
+        if maxDepth is not None:
+            return maxDepth
+        return defaultDepth if timeLimit is None and nodeLimit is None else MAX_ITERATIVE_DEPTH
+    
+    '''
+    Gets a move for the position from the opening book, or None if there is no book or the position is not in it.
+    '''
+    @staticmethod
+    def getBookMove(gameState: GameState, valid_moves: list[Move]) -> Move:
+        if ChessBot.openingBook is None:
+            return None
+        return ChessBot.openingBook.getMove(gameState, valid_moves)
+    
+    '''
+    Gets the reply the search expects to bestMove, the best move the transposition table holds for the
+    position after it, or None if there is none.
+    '''
+    @staticmethod
+    def getPonderMove(gameState: GameState, bestMove: Move) -> Move:
+        gameState.move(bestMove)
+        ponderMove = None
+        entry = ChessBot.transpositionTable.probe(gameState.zobristKey)
+        if entry is not None and entry[3] != NO_MOVE:
+            ponderMove = next((move for move in gameState.getValidMoves() if move.moveID == entry[3]), None)
+        gameState.undoMove()
+        return ponderMove
+    
+    '''
+    Scores the position from the side to move's point of view with the tablebases, or None if they do not cover it.
+    Like mates, wins are scored by their distance from the root, ply plies before the position.
+    '''
+    @staticmethod
+    def probeTablebases(gameState: GameState, ply: int = 0) -> int:
+        result = ChessBot.tablebases.probe(gameState)
+        if result is None:
+            return None
+        outcome, plies = result
+        return outcome * (TABLEBASE_WIN_VALUE - ply - plies)
+    
+    '''
+    Gets the move that keeps the best tablebase result, the quickest win, or the slowest loss,
+    or None if there are no tablebases or they do not cover the position.
+    '''
+    @staticmethod
+    def getTablebaseMove(gameState: GameState, valid_moves: list[Move]) -> Move:
+        if ChessBot.tablebases is None or not valid_moves:
+            return None
+        if ChessBot.probeTablebases(gameState) is None:
+            return None
+        
+        bestMove = None
+        bestScore = None
+        for move in valid_moves:
+            gameState.move(move)
+            if gameState.getValidMoves():
+                score = ChessBot.probeTablebases(gameState)
+                score = -score if score is not None else None
+            else:
+                score = TABLEBASE_WIN_VALUE if gameState.inCheck else STALEMATE_VALUE
+            gameState.undoMove()
+            
+            # a move the tables do not cover, ex. one that gives up castling rights, is left to the search
+            if score is None:
+                return None
+            if bestScore is None or score > bestScore:
+                bestMove = move
+                bestScore = score
+        
+        return bestMove
+    
+    '''
+    Finds the bot's move and puts it in ret_queue, from the opening book or the tablebases if they cover the position.
+    With timeLimit (seconds) or nodeLimit the search deepens until the budget runs out,
+    otherwise it searches to maxDepth, which defaults to MAX_DEPTH.
+    '''
+    @staticmethod
+    def getNegaMaxMove(gameState: GameState, valid_moves: list[Move], ret_queue: Queue, timeLimit: float = None, nodeLimit: int = None, maxDepth: int = None):
+        bookMove = ChessBot.getBookMove(gameState, valid_moves)
+        if bookMove is not None:
+            print(f"book move: {bookMove}")
+        else:
+            bookMove = ChessBot.getTablebaseMove(gameState, valid_moves)
+            if bookMove is not None:
+                print(f"tablebase move: {bookMove}")
+        if bookMove is not None:
+            ret_queue.put(bookMove)
+            return
+        
+        maxDepth = ChessBot.searchDepth(maxDepth, timeLimit, nodeLimit)
+        
+        stats = SearchStats()
+        bestMove = ChessBot.iterativeDeepening(gameState, valid_moves, maxDepth, timeLimit, nodeLimit, stats=stats)
+        
+        print(f"search: {stats}")
+        print(f"transposition table: {ChessBot.transpositionTable.fillLevel():.1%} full, effective branching factor: {ChessBot.effectiveBranchingFactor():.2f}")
+        
+        # instead of returing, put the best move in the valid queue
+        ret_queue.put(bestMove)
+        
+    '''
+    Lazy SMP: searches the same root position in numWorkers processes that share one transposition table,
+    so each worker mostly picks up where the others left off. To keep them from searching the same tree
+    in the same order, every other helper starts one iteration deeper and the helpers shuffle the root moves,
+    which changes the order of the moves the ordering heuristics score the same.
+    The limits apply to each worker, once one worker finishes the others are stopped.
+    Returns (best move, depth, total nodes), where the best move is the one from the deepest completed
+    iteration of any worker. Raises RuntimeError if every worker exits without a result.
+    '''
+    @staticmethod
+    def parallelSearch(gameState: GameState, valid_moves: list[Move], numWorkers: int = None, timeLimit: float = None, nodeLimit: int = None, maxDepth: int = None) -> tuple[Move, int, int]:
+        if numWorkers is None:
+            numWorkers = SMP_WORKERS
+        maxDepth = ChessBot.searchDepth(maxDepth, timeLimit, nodeLimit)
+            
+        table = TranspositionTable(TT_SIZE_MB, shared=True)
+        resultQueue = multiprocessing.Queue()
+        stopEvent = multiprocessing.Event()
+        workers = []
+        
+        try:
+            for workerId in range(numWorkers):
+                worker = multiprocessing.Process(target=ChessBot.parallelSearchWorker,
+                                                 args=(workerId, gameState, valid_moves, table.sharedName(), resultQueue, stopEvent, timeLimit, nodeLimit, maxDepth))
+                worker.start()
+                workers.append(worker)
+            
+            results = ChessBot.collectResults(workers, resultQueue, stopEvent)
+        finally:
+            for worker in workers:
+                worker.join()
+            table.close(unlink=True)
+        
+        if not results:
+            raise RuntimeError("parallel search workers exited without a result")
+        
+        # deepest completed iteration first, ties go to the worker with the lowest id
+        results.sort(key=lambda result: (-result[1], result[0]))
+        bestID = results[0][2]
+        bestMove = next(move for move in valid_moves if move.moveID == bestID)
+        return bestMove, results[0][1], sum(result[3] for result in results)
+    
+    '''
+    Waits for a result from each worker of parallelSearch and stops the others once the first one is in.
+    A worker that exits without a result, killed or out of memory, is left out instead of waited on forever.
+    '''
+    @staticmethod
+    def collectResults(workers: list, resultQueue, stopEvent) -> list[tuple[int, int, int, int]]:
+        results = []
+        pending = dict(enumerate(workers))
+        while pending:
+            try:
+                result = resultQueue.get(timeout=WORKER_POLL_SECONDS)
+            except Empty:
+                lost = [workerId for workerId, worker in pending.items() if worker.exitcode is not None]
+                if not lost:
+                    continue
+                try:
+                    # a worker can put its result and exit between the timeout and the check
+                    result = resultQueue.get(timeout=WORKER_POLL_SECONDS)
+                except Empty:
+                    for workerId in lost:
+                        del pending[workerId]
+                    stopEvent.set()
+                    continue
+            
+            pending.pop(result[0], None)
+            results.append(result)
+            stopEvent.set()
+        return results
+    
+    '''
+    Runs one worker of parallelSearch and puts (worker id, completed depth, best move id, nodes) in resultQueue.
+    '''
+    @staticmethod
+    def parallelSearchWorker(workerId: int, gameState: GameState, valid_moves: list[Move], tableName: str, resultQueue, stopEvent, timeLimit: float, nodeLimit: int, maxDepth: int) -> None:
+        ChessBot.transpositionTable = TranspositionTable(TT_SIZE_MB, sharedName=tableName)
+        ChessBot.stopEvent = stopEvent
+        startDepth = 1
+        
+        if workerId > 0:
+            valid_moves = list(valid_moves)
+            random.Random(workerId).shuffle(valid_moves)
+            startDepth = 1 + workerId % 2
+            
+        try:
+            bestMove = ChessBot.iterativeDeepening(gameState, valid_moves, maxDepth, timeLimit, nodeLimit, startDepth)
+            resultQueue.put((workerId, ChessBot.completedDepth, bestMove.moveID, ChessBot.nodes))
+        except Exception:
+            # still report, parallelSearch waits for a result from every worker
+            resultQueue.put((workerId, -1, valid_moves[0].moveID, ChessBot.nodes))
+            raise
+        finally:
+            ChessBot.transpositionTable.close()
+    
+    '''
+    Finds the bot's move with parallelSearch and puts it in ret_queue, see getNegaMaxMove.
+    '''
+    @staticmethod
+    def getParallelMove(gameState: GameState, valid_moves: list[Move], ret_queue: Queue, numWorkers: int = None, timeLimit: float = None, nodeLimit: int = None, maxDepth: int = None):
+        start = time.perf_counter()
+        bestMove, depth, nodes = ChessBot.parallelSearch(gameState, valid_moves, numWorkers, timeLimit, nodeLimit, maxDepth)
+        elapsed = time.perf_counter() - start
         
-        #return nextMove
+        print(f"parallel search: depth {depth}, {nodes} nodes, {int(nodes / elapsed) if elapsed > 0 else 0} nodes/s")
         
+        ret_queue.put(bestMove)
     
     @staticmethod
     def getRandomMove(validMoves: list[Move]) -> Move:
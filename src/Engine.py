@@ -1,3 +1,9 @@
+from array import array
+import Bitboard
+import Evaluation
+import Zobrist
+
+
 '''
 Stores the information of a move, as well as a reference to the board gamestate.
 '''
@@ -8,7 +14,14 @@ class Move():
     CONV_COLS_TO_FILES = {7: "h", 6:"g", 5:"f", 4:"e", 3:"d", 2:"c", 1:"b", 0:"a"}
     
     
-    def __init__(self, fromSquare: tuple[int, int], toSquare: tuple[int, int], board: list[list[str]], enpassantMove = False, castling = False):
+    PROMOTION_PIECES = ('Q', 'R', 'B', 'N')
+    PROMOTION_CODES = {'Q': 1, 'R': 2, 'B': 3, 'N': 4}
+    
+    # moves are created for every node of a search, slots keep them small and quick to allocate
+    __slots__ = ('fromRow', 'fromCol', 'toRow', 'toCol', 'pieceMoved', 'pieceCaptured',
+                 'pawnPromotionMove', 'promotionPiece', 'enpassantMove', 'castling', 'moveID')
+    
+    def __init__(self, fromSquare: tuple[int, int], toSquare: tuple[int, int], board: list[list[str]], enpassantMove = False, castling = False, promotionPiece = 'Q'):
         self.fromRow = fromSquare[0]
         self.fromCol = fromSquare[1]
         self.toRow = toSquare[0]
@@ -21,6 +34,9 @@ class Move():
             self.pawnPromotionMove = True
         else:
             self.pawnPromotionMove = False
+            
+        # piece type a promoting pawn turns into, the user interface always promotes to a queen
+        self.promotionPiece = promotionPiece
         
         if enpassantMove:
             self.pieceCaptured = 'wP' if self.pieceMoved == 'bP' else 'bP'
@@ -29,14 +45,50 @@ class Move():
         
         self.castling = castling
         
-        
-        
+        # 15 bit move id, the to square in bits 0-5, the from square in bits 6-11
+        # and the promotion piece in bits 12-14 (0 for moves that do not promote)
+        self.moveID = ((self.fromRow * 8 + self.fromCol) << 6) | (self.toRow * 8 + self.toCol)
+        if self.pawnPromotionMove:
+            self.moveID |= self.PROMOTION_CODES[promotionPiece] << 12
+
+    '''
+    Creates a move between two square indexes (row*8 + col) from pieces that are already known,
+    without reading a board. promotionPiece is None for moves that do not promote.
+    Used by the bitboard move generator, which makes most of the moves in a search.
+    '''
+    @staticmethod
+    def fromSquares(fromSquare: int, toSquare: int, pieceMoved: str, pieceCaptured: str, promotionPiece: str = None,
+                    enpassantMove: bool = False, castling: bool = False):
+        move = Move.__new__(Move)
+        move.fromRow = fromSquare >> 3
+        move.fromCol = fromSquare & 7
+        move.toRow = toSquare >> 3
+        move.toCol = toSquare & 7
+        move.pieceMoved = pieceMoved
+        move.pieceCaptured = pieceCaptured
+        move.enpassantMove = enpassantMove
+        move.castling = castling
+        if promotionPiece is None:
+            move.pawnPromotionMove = False
+            move.promotionPiece = 'Q'
+            move.moveID = (fromSquare << 6) | toSquare
+        else:
+            move.pawnPromotionMove = True
+            move.promotionPiece = promotionPiece
+            move.moveID = (fromSquare << 6) | toSquare | (Move.PROMOTION_CODES[promotionPiece] << 12)
+        return move
+
+
     '''
     Converts the move to a psuedo-chess notation format
         - ex. (6, 4), (4, 4) -> e2e4
+        - promotions end with the promotion piece, ex. (1, 4), (0, 4) -> e7e8q
     '''
     def convertToChessNotation(self) -> str:
-        return self.convertToRankFile(self.fromRow, self.fromCol) + self.convertToRankFile(self.toRow, self.toCol)
+        notation = self.convertToRankFile(self.fromRow, self.fromCol) + self.convertToRankFile(self.toRow, self.toCol)
+        if self.pawnPromotionMove:
+            notation += self.promotionPiece.lower()
+        return notation
     
         
     def convertToRankFile(self, row, col) -> str:
@@ -51,11 +103,15 @@ class Move():
     
     '''
     Used to compare moves
+        - moves compare by their move id, anything else is compared by its chess notation
     '''
     def __eq__(self, other) -> bool:
-        if str(self) == str(other):
-            return True
-        return False
+        if isinstance(other, Move):
+            return self.moveID == other.moveID
+        return str(self) == str(other)
+    
+    def __hash__(self) -> int:
+        return self.moveID
         
         
 class CastleRights():
@@ -72,6 +128,16 @@ class CastleRights():
         deepcopy = CastleRights(self.wKingSide, self.bKingSide, self.wQueenSide, self.bQueenSide)
         return deepcopy
     
+    '''
+    Packs the rights into a 4 bit int, wKingSide=1, wQueenSide=2, bKingSide=4, bQueenSide=8.
+    '''
+    def packed(self) -> int:
+        return self.wKingSide | (self.wQueenSide << 1) | (self.bKingSide << 2) | (self.bQueenSide << 3)
+    
+    @staticmethod
+    def fromPacked(rights: int):
+        return CastleRights(bool(rights & 1), bool(rights & 4), bool(rights & 2), bool(rights & 8))
+    
     
     def __str__(self):
         return str(self.wKingSide)+", "+str(self.wQueenSide)+", "+str(self.bKingSide)+", "+str(self.bQueenSide)+"\n"
@@ -81,10 +147,59 @@ class CastleRights():
 Stores the information about the current state of a chess game.
 Determines the valid moves for the current gamestate.
 
-TODO: Use numpy for faster processing, especially when implementing AI engine
+The board is stored as an 8x8 array of piece strings. Passing backend='bitboard'
+constructs a BitboardGameState instead, which makes and generates moves on bitboards
+and only builds the board array when something reads it, ex. the user interface.
 """
 class GameState():
-    def __init__(self):
+    KNIGHT_DIRECTIONS = ((-2,1),(-1,2),(1,2),(2,1),(2,-1),(1,-2),(-1,-2),(-2,-1))
+    KING_DIRECTIONS = ((-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1))
+    BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+    ROOK_DIRECTIONS = ((0, -1), (0, 1), (1, 0), (-1, 0))
+    
+    # bits of castlingRights, the same layout as CastleRights.packed and Zobrist.CASTLING_KEYS
+    WHITE_KING_SIDE = 1
+    WHITE_QUEEN_SIDE = 2
+    BLACK_KING_SIDE = 4
+    BLACK_QUEEN_SIDE = 8
+    
+    # castlingRights is and-ed with the mask of the from and to square of every move,
+    # moving a king or rook off its starting square or capturing on a rook's square clears those rights
+    CASTLING_MASKS = [15] * 64
+    CASTLING_MASKS[0] = 15 & ~BLACK_QUEEN_SIDE
+    CASTLING_MASKS[4] = 15 & ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
+    CASTLING_MASKS[7] = 15 & ~BLACK_KING_SIDE
+    CASTLING_MASKS[56] = 15 & ~WHITE_QUEEN_SIDE
+    CASTLING_MASKS[60] = 15 & ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)
+    CASTLING_MASKS[63] = 15 & ~WHITE_KING_SIDE
+    
+    # shared (row, col) tuple of every square, so moves can set locations without building tuples
+    LOCATIONS = [(square // 8, square % 8) for square in range(64)]
+    
+    # pieces stored in the undo stack as 4 bit codes, 0 is an empty square
+    UNDO_PIECES = ('--', 'wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+    UNDO_PIECE_CODES = {piece: code for code, piece in enumerate(UNDO_PIECES)}
+    
+    # moves the undo stack has room for before it grows, two entries per move
+    UNDO_STACK_SIZE = 512
+    
+    def __new__(cls, backend: str = 'mailbox', fen: str = None):
+        if cls is GameState and backend == 'bitboard':
+            cls = BitboardGameState
+        elif backend not in ('mailbox', 'bitboard'):
+            raise ValueError("Unknown GameState backend: " + str(backend))
+        return super().__new__(cls)
+    
+    STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    
+    FEN_PIECES = {'P': 'wP', 'N': 'wN', 'B': 'wB', 'R': 'wR', 'Q': 'wQ', 'K': 'wK',
+                  'p': 'bP', 'n': 'bN', 'b': 'bB', 'r': 'bR', 'q': 'bQ', 'k': 'bK'}
+    PIECES_FEN = {piece: char for char, piece in FEN_PIECES.items()}
+    
+    '''
+    Builds the starting position, or the position of a FEN string if one is given (see fromFEN).
+    '''
+    def __init__(self, backend: str = 'mailbox', fen: str = None):
         self.board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
@@ -96,6 +211,8 @@ class GameState():
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
         ]
         
+        self.backend = backend
+        
         self.whiteToMove = True
         self.moveLog = []
         
@@ -111,10 +228,136 @@ class GameState():
         
         self.enpassantLocation = ()
         
-        # castling rights, start the game with all rights
-        # logs the castling rights in case a move is undone
-        self.castleRightsLog = [CastleRights(True,True,True,True)]
-        self.currentCastlingRights = self.castleRightsLog[0]
+        # castling rights packed into 4 bits, see WHITE_KING_SIDE, start the game with all rights
+        self.castlingRights = 15
+        
+        # half moves since the last capture or pawn move for the fifty move rule, and the number of the current full move
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        
+        # plies since the last capture, pawn move or null move, the window repetitionCount searches for the position
+        self.repetitionPlies = 0
+        
+        # what a move can not be undone from, two entries for each move in the moveLog: the castling rights,
+        # en passant square, captured piece, repetition window and halfmove clock packed into one int (see packUndoState),
+        # and the Zobrist key before the move. move and undoMove only write and read plain ints.
+        self.undoStack = array('Q', bytes(16 * self.UNDO_STACK_SIZE))
+        
+        if fen is not None:
+            self.parseFEN(fen)
+        
+        # Zobrist key of the position, kept up to date by move and undoMove.
+        # With debugZobrist set every update is checked against computeZobristKey.
+        self.debugZobrist = False
+        self.zobristKey = self.computeZobristKey()
+        
+        # running evaluation totals, index 0 is white and 1 is black, kept up to date by move and undoMove.
+        # material is in centipawns, the piece-square totals include no material.
+        # With debugEvaluation set every update is checked against a full recount of the board.
+        self.debugEvaluation = False
+        self.initEvaluation()
+        
+    '''
+    Creates a GameState from a FEN string, ex. "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1".
+    The king locations, castling rights, Zobrist key and evaluation are set up straight from the fields
+    without replaying any moves, the move log starts out empty.
+    The move counters are optional and default to 0 and 1.
+    '''
+    @staticmethod
+    def fromFEN(fen: str, backend: str = 'mailbox'):
+        return GameState(backend=backend, fen=fen)
+    
+    '''
+    Sets the board, side to move, castling rights, en passant square and move counters from a FEN string.
+    Only used by __init__, which sets up the Zobrist key and evaluation after it.
+    Raises ValueError if the FEN string is not valid.
+    '''
+    def parseFEN(self, fen: str) -> None:
+        fields = fen.split()
+        if len(fields) < 4 or len(fields) > 6:
+            raise ValueError("FEN needs 4 to 6 fields: " + fen)
+        placement, side, castling, enpassant = fields[:4]
+        
+        board = []
+        whiteKing = blackKing = None
+        for row, rank in enumerate(placement.split('/')):
+            boardRow = []
+            for char in rank:
+                if char in '12345678':
+                    boardRow.extend(['--'] * int(char))
+                    continue
+                piece = self.FEN_PIECES.get(char)
+                if piece is None:
+                    raise ValueError("Unknown piece '" + char + "' in FEN: " + fen)
+                if piece == 'wK':
+                    whiteKing = (row, len(boardRow))
+                elif piece == 'bK':
+                    blackKing = (row, len(boardRow))
+                boardRow.append(piece)
+            if len(boardRow) != 8:
+                raise ValueError("FEN rank " + rank + " does not have 8 squares: " + fen)
+            board.append(boardRow)
+        if len(board) != 8:
+            raise ValueError("FEN does not have 8 ranks: " + fen)
+        if whiteKing is None or blackKing is None:
+            raise ValueError("FEN needs a king for each side: " + fen)
+        
+        if side not in ('w', 'b'):
+            raise ValueError("FEN side to move must be w or b: " + fen)
+        
+        if castling != '-' and (not castling or any(char not in 'KQkq' for char in castling)):
+            raise ValueError("Unknown castling rights in FEN: " + fen)
+        
+        if enpassant == '-':
+            enpassantLocation = ()
+        elif len(enpassant) == 2 and enpassant[0] in Move.CONV_FILES_TO_COLS and enpassant[1] in ('3', '6'):
+            enpassantLocation = (Move.CONV_RANK_TO_ROWS[enpassant[1]], Move.CONV_FILES_TO_COLS[enpassant[0]])
+        else:
+            raise ValueError("Unknown en passant square in FEN: " + fen)
+        
+        self.board = board
+        self.whiteKingLocation = whiteKing
+        self.blackKingLocation = blackKing
+        self.whiteToMove = side == 'w'
+        self.castlingRights = (('K' in castling) * self.WHITE_KING_SIDE | ('Q' in castling) * self.WHITE_QUEEN_SIDE
+                               | ('k' in castling) * self.BLACK_KING_SIDE | ('q' in castling) * self.BLACK_QUEEN_SIDE)
+        self.enpassantLocation = enpassantLocation
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        # the moves before the FEN are not known, so there is nothing to repeat yet
+        self.repetitionPlies = 0
+        self.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+    
+    '''
+    Gets the FEN string of the current position.
+    '''
+    def toFEN(self) -> str:
+        ranks = []
+        for boardRow in self.board:
+            rank = ''
+            empty = 0
+            for piece in boardRow:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += self.PIECES_FEN[piece]
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        
+        rights = self.castlingRights
+        castling = (('K' if rights & self.WHITE_KING_SIDE else '') + ('Q' if rights & self.WHITE_QUEEN_SIDE else '')
+                    + ('k' if rights & self.BLACK_KING_SIDE else '') + ('q' if rights & self.BLACK_QUEEN_SIDE else ''))
+        
+        if self.enpassantLocation:
+            enpassant = Move.CONV_COLS_TO_FILES[self.enpassantLocation[1]] + Move.CONV_ROWS_TO_RANK[self.enpassantLocation[0]]
+        else:
+            enpassant = '-'
+            
+        return ' '.join(('/'.join(ranks), 'w' if self.whiteToMove else 'b', castling or '-', enpassant,
+                         str(self.halfmoveClock), str(self.fullmoveNumber)))
         
         
         
@@ -123,33 +366,52 @@ class GameState():
     Makes a move and flips the turn
     '''        
     def move(self, move: Move) -> None:
+        previousRights = self.castlingRights
+        previousEnpassant = self.enpassantLocation
+        
+        if move.enpassantMove:
+            # the captured pawn is not on the to square
+            move.pieceCaptured = self.board[move.fromRow][move.toCol]
+        
+        index = 2 * len(self.moveLog)
+        if index == len(self.undoStack):
+            self.undoStack.extend(self.undoStack)
+        self.undoStack[index] = self.packUndoState(move.pieceCaptured)
+        self.undoStack[index + 1] = self.zobristKey
+        
         self.board[move.fromRow][move.fromCol] = "--"
         self.board[move.toRow][move.toCol] = move.pieceMoved
         
         self.moveLog.append(move)
         
+        if move.pieceMoved[1] == 'P' or move.pieceCaptured != '--':
+            self.halfmoveClock = 0
+            self.repetitionPlies = 0
+        else:
+            self.halfmoveClock += 1
+            self.repetitionPlies += 1
+        if not self.whiteToMove:
+            self.fullmoveNumber += 1
+        
         
         if move.pieceMoved == 'bK':
-            self.blackKingLocation = (move.toRow, move.toCol)
+            self.blackKingLocation = self.LOCATIONS[move.toRow * 8 + move.toCol]
             
         if move.pieceMoved == 'wK':
-            self.whiteKingLocation = (move.toRow, move.toCol)
+            self.whiteKingLocation = self.LOCATIONS[move.toRow * 8 + move.toCol]
             
         if move.pawnPromotionMove:
-            # auto promote to a queen for now
             pawncolor = move.pieceMoved[0]
-            self.board[move.toRow][move.toCol] = pawncolor + "Q"
-            print(self.board[move.toRow][move.toCol])
+            self.board[move.toRow][move.toCol] = pawncolor + move.promotionPiece
             
         if move.enpassantMove:
             # have to remove the pawn
-            move.pieceCaptured = self.board[move.fromRow][move.toCol]
             self.board[move.fromRow][move.toCol] = '--'
              
             
         # updating the viable enpassant square location
         if move.pieceMoved[1] == 'P' and abs(move.fromRow - move.toRow) == 2:
-            self.enpassantLocation = ((move.fromRow + move.toRow) // 2, move.toCol)
+            self.enpassantLocation = self.LOCATIONS[(move.fromRow + move.toRow) // 2 * 8 + move.toCol]
             
         else:
             self.enpassantLocation = ()
@@ -169,14 +431,21 @@ class GameState():
                 self.board[move.fromRow][move.fromCol-4] = '--'
                 
 
-        # update the castling rights 
-        self.castleRightsLog.append(self.currentCastlingRights.deep_copy())
         self.updateCastlingRights(move)
         
+        self.zobristKey ^= self.zobristMoveKey(move) ^ self.zobristStateKey(previousRights, previousEnpassant) \
+            ^ self.zobristStateKey(self.castlingRights, self.enpassantLocation)
+        
+        self.updateEvaluation(move, 1)
         
         # change turn
         self.whiteToMove = not self.whiteToMove
         
+        if self.debugZobrist:
+            self.checkZobristKey()
+        if self.debugEvaluation:
+            self.checkEvaluation()
+        
         
     '''
     Undoes the most recent move
@@ -187,28 +456,31 @@ class GameState():
             return
         
         move: Move = self.moveLog.pop()
+        index = 2 * len(self.moveLog)
+        state = self.undoStack[index]
+        pieceCaptured = self.UNDO_PIECES[(state >> 11) & 15]
+        
         self.board[move.fromRow][move.fromCol] = move.pieceMoved
-        self.board[move.toRow][move.toCol] = move.pieceCaptured
+        self.board[move.toRow][move.toCol] = pieceCaptured
          
         if move.pieceMoved == 'bK':
-            self.blackKingLocation = (move.fromRow, move.fromCol)
+            self.blackKingLocation = self.LOCATIONS[move.fromRow * 8 + move.fromCol]
             
         if move.pieceMoved == 'wK':
-            self.whiteKingLocation = (move.fromRow, move.fromCol)
+            self.whiteKingLocation = self.LOCATIONS[move.fromRow * 8 + move.fromCol]
             
         if move.enpassantMove:
             # put the captured piece back
             self.board[move.toRow][move.toCol] = '--'
-            self.board[move.fromRow][move.toCol] = move.pieceCaptured
+            self.board[move.fromRow][move.toCol] = pieceCaptured
 
-            self.enpassantLocation = (move.toRow, move.toCol)
-            
-        # two move pawn advance    
-        if move.pieceMoved[1] == 'P' and abs(move.fromRow - move.toRow) == 2:
-            self.enpassantLocation = ()
-            
-        self.castleRightsLog.pop()    
-        self.currentCastlingRights = self.castleRightsLog[len(self.castleRightsLog)-1].deep_copy()
+        self.castlingRights = state & 15
+        enpassantSquare = (state >> 4) & 127
+        self.enpassantLocation = self.LOCATIONS[enpassantSquare - 1] if enpassantSquare else ()
+        self.repetitionPlies = (state >> 15) & 0xFFFFF
+        self.halfmoveClock = state >> 35
+        if self.whiteToMove:
+            self.fullmoveNumber -= 1
     
         if move.castling:
             if move.toCol - move.fromCol == 2:
@@ -224,34 +496,207 @@ class GameState():
                 self.board[move.fromRow][move.fromCol-4] = self.board[move.fromRow][move.fromCol-1]
                 self.board[move.fromRow][move.fromCol-1] = '--'
                 
+        self.zobristKey = self.undoStack[index + 1]
+        
+        self.updateEvaluation(move, -1)
+                
         self.whiteToMove = not self.whiteToMove
-
+        
+        if self.debugZobrist:
+            self.checkZobristKey()
+        if self.debugEvaluation:
+            self.checkEvaluation()
     
     '''
-    Updates the castling rights for white or black given a move.
+    Passes the turn without moving, for null move pruning in the search. Undo it with undoNullMove.
+    The moveLog gets None for it, and the repetition window restarts so no repetition is found across it.
+    The halfmove clock is left alone, passing is not a move for the fifty move rule.
     '''
-    def updateCastlingRights(self, move: Move) -> None:
+    def makeNullMove(self) -> None:
+        index = 2 * len(self.moveLog)
+        if index == len(self.undoStack):
+            self.undoStack.extend(self.undoStack)
+        self.undoStack[index] = self.packUndoState('--')
+        self.undoStack[index + 1] = self.zobristKey
+        
+        self.moveLog.append(None)
+        self.zobristKey ^= Zobrist.SIDE_KEY ^ self.zobristStateKey(self.castlingRights, self.enpassantLocation) \
+            ^ self.zobristStateKey(self.castlingRights, ())
+        self.enpassantLocation = ()
+        self.repetitionPlies = 0
+        self.whiteToMove = not self.whiteToMove
+        
+    def undoNullMove(self) -> None:
+        self.moveLog.pop()
+        index = 2 * len(self.moveLog)
+        state = self.undoStack[index]
+        
+        enpassantSquare = (state >> 4) & 127
+        self.enpassantLocation = self.LOCATIONS[enpassantSquare - 1] if enpassantSquare else ()
+        self.repetitionPlies = (state >> 15) & 0xFFFFF
+        self.halfmoveClock = state >> 35
+        self.zobristKey = self.undoStack[index + 1]
+        self.whiteToMove = not self.whiteToMove
     
-        if move.pieceMoved == 'wK':
-            self.currentCastlingRights.wKingSide = False
-            self.currentCastlingRights.wQueenSide = False            
+    '''
+    Sets the evaluation totals by counting every piece on the board.
+    '''
+    def initEvaluation(self) -> None:
+        self.material = [0, 0]
+        self.pieceSquareMg = [0, 0]
+        self.pieceSquareEg = [0, 0]
+        self.phase = 0
+        
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != '--':
+                    self.addPieceScore(piece, row * 8 + col, 1)
+                    
+    '''
+    Adds (sign=1) or removes (sign=-1) one piece on a square from the evaluation totals.
+    '''
+    def addPieceScore(self, piece: str, square: int, sign: int) -> None:
+        side = 0 if piece[0] == 'w' else 1
+        self.material[side] += sign * Evaluation.PIECE_VALUE[piece[1]]
+        self.pieceSquareMg[side] += sign * Evaluation.MG_TABLES[piece][square]
+        self.pieceSquareEg[side] += sign * Evaluation.EG_TABLES[piece][square]
+        self.phase += sign * Evaluation.PHASE_WEIGHT[piece[1]]
+        
+    '''
+    Applies the evaluation changes of a move, sign=1 when the move is made and sign=-1 when it is undone.
+    '''
+    def updateEvaluation(self, move: Move, sign: int) -> None:
+        fromSquare = move.fromRow * 8 + move.fromCol
+        toSquare = move.toRow * 8 + move.toCol
+        
+        self.addPieceScore(move.pieceMoved, fromSquare, -sign)
+        
+        if move.pawnPromotionMove:
+            self.addPieceScore(move.pieceMoved[0] + move.promotionPiece, toSquare, sign)
+        else:
+            self.addPieceScore(move.pieceMoved, toSquare, sign)
             
-        elif move.pieceMoved == 'wR':
-            if move.fromRow == 7 and move.fromCol == 7:
-                self.currentCastlingRights.wKingSide = False
+        if move.enpassantMove:
+            self.addPieceScore(move.pieceCaptured, move.fromRow * 8 + move.toCol, -sign)
+        elif move.pieceCaptured != '--':
+            self.addPieceScore(move.pieceCaptured, toSquare, -sign)
+            
+        if move.castling:
+            rook = move.pieceMoved[0] + 'R'
+            if move.toCol - move.fromCol == 2:
+                self.addPieceScore(rook, fromSquare + 3, -sign)
+                self.addPieceScore(rook, fromSquare + 1, sign)
             else:
-                self.currentCastlingRights.wQueenSide = False
+                self.addPieceScore(rook, fromSquare - 4, -sign)
+                self.addPieceScore(rook, fromSquare - 1, sign)
+                
+    '''
+    The static evaluation from white's point of view in centipawns, read from the running totals.
+    '''
+    def evaluate(self) -> int:
+        mgScore = self.material[0] - self.material[1] + self.pieceSquareMg[0] - self.pieceSquareMg[1]
+        egScore = self.material[0] - self.material[1] + self.pieceSquareEg[0] - self.pieceSquareEg[1]
+        return Evaluation.taper(mgScore, egScore, self.phase)
+    
+    '''
+    Raises an error if the running evaluation totals have drifted from a full recount.
+    '''
+    def checkEvaluation(self) -> None:
+        totals = (self.material[:], self.pieceSquareMg[:], self.pieceSquareEg[:], self.phase)
+        self.initEvaluation()
+        if totals != (self.material, self.pieceSquareMg, self.pieceSquareEg, self.phase):
+            raise RuntimeError("Evaluation totals mismatch after " + str(len(self.moveLog)) + " moves: "
+                               + str(totals) + " != " + str((self.material, self.pieceSquareMg, self.pieceSquareEg, self.phase)))
     
-        elif move.pieceMoved == 'bK':
-            self.currentCastlingRights.bKingSide = False
-            self.currentCastlingRights.bQueenSide = False 
+    '''
+    Gets the XOR of the piece keys a move adds and removes, plus the side to move key.
+    Making and unmaking a move both XOR the same value into the position key.
+    '''
+    def zobristMoveKey(self, move: Move) -> int:
+        fromSquare = move.fromRow * 8 + move.fromCol
+        toSquare = move.toRow * 8 + move.toCol
+        pieceKeys = Zobrist.PIECE_KEYS
+        
+        key = Zobrist.SIDE_KEY ^ pieceKeys[move.pieceMoved][fromSquare]
+        
+        if move.pawnPromotionMove:
+            key ^= pieceKeys[move.pieceMoved[0] + move.promotionPiece][toSquare]
+        else:
+            key ^= pieceKeys[move.pieceMoved][toSquare]
             
-        elif move.pieceMoved == 'bR':
-            if move.fromRow == 0 and move.fromCol == 7:
-                self.currentCastlingRights.bKingSide = False
+        if move.enpassantMove:
+            key ^= pieceKeys[move.pieceCaptured][move.fromRow * 8 + move.toCol]
+        elif move.pieceCaptured != '--':
+            key ^= pieceKeys[move.pieceCaptured][toSquare]
+            
+        if move.castling:
+            rookKeys = pieceKeys[move.pieceMoved[0] + 'R']
+            if move.toCol - move.fromCol == 2:
+                key ^= rookKeys[fromSquare + 3] ^ rookKeys[fromSquare + 1]
             else:
-                self.currentCastlingRights.bQueenSide = False
+                key ^= rookKeys[fromSquare - 4] ^ rookKeys[fromSquare - 1]
+                
+        return key
     
+    '''
+    Gets the key for the castling rights and en passant square.
+    '''
+    @staticmethod
+    def zobristStateKey(castlingRights: int, enpassantLocation: tuple) -> int:
+        key = Zobrist.CASTLING_KEYS[castlingRights]
+        if enpassantLocation:
+            key ^= Zobrist.ENPASSANT_KEYS[enpassantLocation[1]]
+        return key
+    
+    '''
+    Computes the Zobrist key of the position from scratch.
+    '''
+    def computeZobristKey(self) -> int:
+        key = self.zobristStateKey(self.castlingRights, self.enpassantLocation)
+        if not self.whiteToMove:
+            key ^= Zobrist.SIDE_KEY
+            
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != '--':
+                    key ^= Zobrist.PIECE_KEYS[piece][row * 8 + col]
+        return key
+    
+    '''
+    Raises an error if the incrementally updated key has drifted from a full recomputation.
+    '''
+    def checkZobristKey(self) -> None:
+        expected = self.computeZobristKey()
+        if self.zobristKey != expected:
+            raise RuntimeError("Zobrist key mismatch after " + str(len(self.moveLog)) + " moves: "
+                               + hex(self.zobristKey) + " != " + hex(expected))
+
+    
+    '''
+    Updates the castling rights for white or black given a move.
+    '''
+    def updateCastlingRights(self, move: Move) -> None:
+        self.castlingRights &= self.CASTLING_MASKS[move.fromRow * 8 + move.fromCol] & self.CASTLING_MASKS[move.toRow * 8 + move.toCol]
+    
+    '''
+    Packs the state a move can not be undone from into one int for the undo stack: the castling rights in bits 0-3,
+    the en passant square + 1 in bits 4-10 (0 for none), the code of the captured piece in bits 11-14,
+    the repetition window in bits 15-34 and the halfmove clock from bit 35 on.
+    '''
+    def packUndoState(self, pieceCaptured: str) -> int:
+        enpassant = self.enpassantLocation
+        enpassantSquare = enpassant[0] * 8 + enpassant[1] + 1 if enpassant else 0
+        return (self.castlingRights | (enpassantSquare << 4) | (self.UNDO_PIECE_CODES[pieceCaptured] << 11)
+                | (self.repetitionPlies << 15) | (self.halfmoveClock << 35))
+    
+    '''
+    The castling rights as a CastleRights, changing it does not change the position.
+    '''
+    @property
+    def currentCastlingRights(self) -> CastleRights:
+        return CastleRights.fromPacked(self.castlingRights)
     
     
     '''
@@ -264,63 +709,336 @@ class GameState():
             return self.squareAttacked(self.blackKingLocation[0], self.blackKingLocation[1])
             
     '''
-    Checks all of the opponents moves to see if the square is attacked
+    Checks if the square is attacked by the opponent of the side to move.
     '''    
     def squareAttacked(self, row, col) -> bool:
-        self.whiteToMove = not self.whiteToMove
-        
-        opponentMoves = self.getAllMoves()
+        return self.squareAttackedBy(row, col, not self.whiteToMove)
+    
+    '''
+    Checks if the square is attacked by the given side by looking outward from the square:
+    knight jumps, pawn diagonals, the king ring and slider rays until they are blocked.
+    No moves are generated.
+    '''
+    def squareAttackedBy(self, row: int, col: int, byWhite: bool) -> bool:
+        board = self.board
+        color = 'w' if byWhite else 'b'
+        
+        # white pawns capture towards row 0, so an attacking white pawn sits one row below the square
+        pawnRow = row + 1 if byWhite else row - 1
+        if 0 <= pawnRow < 8:
+            pawn = color + 'P'
+            if col > 0 and board[pawnRow][col-1] == pawn:
+                return True
+            if col < 7 and board[pawnRow][col+1] == pawn:
+                return True
         
-        for move in opponentMoves:
-            if move.toRow == row and move.toCol == col:
-                self.whiteToMove = not self.whiteToMove
+        knight = color + 'N'
+        for r, c in self.KNIGHT_DIRECTIONS:
+            toRow = row + r
+            toCol = col + c
+            if 0 <= toRow < 8 and 0 <= toCol < 8 and board[toRow][toCol] == knight:
                 return True
             
-        self.whiteToMove = not self.whiteToMove
+        king = color + 'K'
+        for r, c in self.KING_DIRECTIONS:
+            toRow = row + r
+            toCol = col + c
+            if 0 <= toRow < 8 and 0 <= toCol < 8 and board[toRow][toCol] == king:
+                return True
+            
+        queen = color + 'Q'
+        if self.sliderAttacks(row, col, self.BISHOP_DIRECTIONS, color + 'B', queen):
+            return True
+        if self.sliderAttacks(row, col, self.ROOK_DIRECTIONS, color + 'R', queen):
+            return True
+        
+        return False
+    
+    '''
+    Walks each ray outward from the square and checks if the first piece hit is one of the given sliders.
+    '''
+    def sliderAttacks(self, row: int, col: int, directions: tuple, slider: str, queen: str) -> bool:
+        board = self.board
+        for r, c in directions:
+            toRow = row + r
+            toCol = col + c
+            while 0 <= toRow < 8 and 0 <= toCol < 8:
+                piece = board[toRow][toCol]
+                if piece != '--':
+                    if piece == slider or piece == queen:
+                        return True
+                    break
+                toRow += r
+                toCol += c
         return False
     
+    '''
+    Gets every square attacked by the given side as a bitmask, where bit row*8+col is set
+    if that square is attacked. Lets castling and check detection share one scan of the board.
+    Sliders see through the piece on ignoreSquare, which is used to remove the defending king.
+    '''
+    def getAttackedSquares(self, byWhite: bool, ignoreSquare: int = -1) -> int:
+        if ignoreSquare != -1:
+            row, col = divmod(ignoreSquare, 8)
+            piece = self.board[row][col]
+            self.board[row][col] = '--'
+            attacked = self.getAttackedSquares(byWhite)
+            self.board[row][col] = piece
+            return attacked
+        
+        board = self.board
+        color = 'w' if byWhite else 'b'
+        pawnStep = -1 if byWhite else 1
+        attacked = 0
+        
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece[0] != color:
+                    continue
+                
+                pieceType = piece[1]
+                if pieceType == 'P':
+                    toRow = row + pawnStep
+                    if 0 <= toRow < 8:
+                        if col > 0:
+                            attacked |= 1 << (toRow * 8 + col - 1)
+                        if col < 7:
+                            attacked |= 1 << (toRow * 8 + col + 1)
+                    continue
+                
+                if pieceType == 'N' or pieceType == 'K':
+                    directions = self.KNIGHT_DIRECTIONS if pieceType == 'N' else self.KING_DIRECTIONS
+                    for r, c in directions:
+                        toRow = row + r
+                        toCol = col + c
+                        if 0 <= toRow < 8 and 0 <= toCol < 8:
+                            attacked |= 1 << (toRow * 8 + toCol)
+                    continue
+                
+                if pieceType == 'B':
+                    directions = self.BISHOP_DIRECTIONS
+                elif pieceType == 'R':
+                    directions = self.ROOK_DIRECTIONS
+                else:
+                    directions = self.KING_DIRECTIONS
+                    
+                for r, c in directions:
+                    toRow = row + r
+                    toCol = col + c
+                    while 0 <= toRow < 8 and 0 <= toCol < 8:
+                        attacked |= 1 << (toRow * 8 + toCol)
+                        if board[toRow][toCol] != '--':
+                            break
+                        toRow += r
+                        toCol += c
+                        
+        return attacked
+    
     
     '''
-    Gets all of the valid moves including checks, pins
+    Gets all of the valid moves including checks, pins.
+    The checkers and pinned pieces are found once for the position, then each pseudo-legal move is kept
+    or dropped with a few mask tests instead of making the move and looking for a check:
+        - In double check only king moves are generated
+        - In single check other pieces must capture the checker or block the checking ray
+        - A pinned piece can only move along the ray between the king and the pinning piece
+        - The king cannot move onto a square attacked by the opponent, with the king itself
+          removed from the board so it cannot step back along a checking ray
+        - En passant is made and unmade, since removing both pawns can uncover a check along the rank
     '''
     def getValidMoves(self) -> list[Move]:
-        tmpEnpassantOriginalLocation = self.enpassantLocation
-        tmpCastleRights = self.currentCastlingRights.deep_copy()
-        
         moves = []
         
-        castleMoves = self.getCastleMoves(0,0)
-
-        moves.extend(castleMoves)
+        legalityInfo = self.getLegalityInfo()
+        kingPos, numCheckers, checkMask, pinRays, attackedSquares = legalityInfo
         
-        moves.extend(self.getAllMoves())
-        for i in range(len(moves) - 1, -1, -1):
-            self.move(moves[i])
-            self.whiteToMove = not self.whiteToMove
+        if numCheckers > 1:
+            pseudoMoves = self.getKingMoves(kingPos[0], kingPos[1])
+        else:
+            if not self.inCheck:
+                moves.extend(self.getCastleMoves(kingPos[0], kingPos[1], attackedSquares))
+            pseudoMoves = self.getAllMoves()
             
-            if self.isInCheck():
-                moves.remove(moves[i])
-                
-            self.undoMove()
-            self.whiteToMove = not self.whiteToMove
+        self.addLegalMoves(moves, pseudoMoves, legalityInfo)
         
+        self.checkMate = len(moves) == 0 and self.inCheck
+        self.staleMate = len(moves) == 0 and not self.inCheck
+            
+        return moves
+    
+    '''
+    Finds everything needed to check the legality of pseudo-legal moves in the current position.
+    Returns (king position, number of checkers, check mask, pin rays, attacked squares) and sets inCheck.
+    '''
+    def getLegalityInfo(self) -> tuple:
+        kingPos = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        numCheckers, checkMask, pinRays = self.getPinsAndChecks()
+        self.inCheck = numCheckers > 0
+        
+        # one attack map of the opponent is shared by the castling checks and the king moves
+        attackedSquares = self.getAttackedSquares(not self.whiteToMove, kingPos[0] * 8 + kingPos[1])
         
+        return kingPos, numCheckers, checkMask, pinRays, attackedSquares
+    
+    '''
+    Adds the legal moves out of pseudoMoves to moves, using the info from getLegalityInfo.
+    Castling moves are not checked here, getCastleMoves only generates legal ones.
+    '''
+    def addLegalMoves(self, moves: list[Move], pseudoMoves: list[Move], legalityInfo: tuple) -> None:
+        kingPos, numCheckers, checkMask, pinRays, attackedSquares = legalityInfo
+        kingRow, kingCol = kingPos
         
-        if len(moves) == 0 and self.isInCheck():
-            self.checkMate = True
+        for move in pseudoMoves:
+            toBit = 1 << (move.toRow * 8 + move.toCol)
             
-        if len(moves) == 0:
-            self.staleMate = True
+            if move.fromRow == kingRow and move.fromCol == kingCol:
+                if not attackedSquares & toBit:
+                    moves.append(move)
+                continue
+            
+            if numCheckers > 1:
+                continue
             
-        self.enpassantLocation = tmpEnpassantOriginalLocation
-        self.currentCastlingRights = tmpCastleRights
+            if move.enpassantMove:
+                if self.enpassantIsLegal(move):
+                    moves.append(move)
+                continue
             
+            if numCheckers and not toBit & checkMask:
+                continue
+            
+            fromSquare = move.fromRow * 8 + move.fromCol
+            if fromSquare in pinRays and not toBit & pinRays[fromSquare]:
+                continue
+            
+            moves.append(move)
+    
+    '''
+    Gets the legal captures and promotions, using the info from getLegalityInfo.
+    '''
+    def getLegalNoisyMoves(self, legalityInfo: tuple) -> list[Move]:
+        moves: list[Move] = []
+        self.addLegalMoves(moves, self.getNoisyMoves(), legalityInfo)
+        return moves
+    
+    '''
+    Gets the legal moves that neither capture nor promote, castling is not included.
+    '''
+    def getLegalQuietMoves(self, legalityInfo: tuple) -> list[Move]:
+        moves: list[Move] = []
+        self.addLegalMoves(moves, self.getQuietMoves(), legalityInfo)
         return moves
     
+    '''
+    Gets the pseudo-legal captures and promotions, the moves the search tries before the quiet ones.
+    '''
+    def getNoisyMoves(self) -> list[Move]:
+        return self.getAllMoves(True, False)
+    
+    '''
+    Gets the pseudo-legal moves that neither capture nor promote, castling is not included.
+    '''
+    def getQuietMoves(self) -> list[Move]:
+        return self.getAllMoves(False, True)
+    
+    '''
+    Gets the pseudo-legal move with the given move id, or None if the side to move has no such move.
+    Used to check that a move id from the transposition table or the killer table can be played here.
+    '''
+    def getPseudoMove(self, moveID: int) -> Move:
+        fromSquare = (moveID >> 6) & 63
+        piece = self.board[fromSquare >> 3][fromSquare & 7]
+        if piece == '--' or (piece[0] == 'w') != self.whiteToMove:
+            return None
+        
+        for move in self.getMoves(piece, fromSquare >> 3, fromSquare & 7):
+            if move.moveID == moveID:
+                return move
+        return None
+    
+    '''
+    Checks an en passant capture by making it and looking for a check on the king.
+    '''
+    def enpassantIsLegal(self, move: Move) -> bool:
+        self.move(move)
+        self.whiteToMove = not self.whiteToMove
+        legal = not self.isInCheck()
+        self.whiteToMove = not self.whiteToMove
+        self.undoMove()
+        return legal
+    
+    '''
+    Finds the pieces giving check to the side to move and the pieces pinned to its king.
+    Returns (number of checkers, check mask, pin rays), where the check mask has a bit set for every
+    square that captures the checker or blocks its ray, and pin rays maps the square of each pinned piece
+    to the mask of squares it may still move to.
+    '''
+    def getPinsAndChecks(self) -> tuple[int, int, dict]:
+        board = self.board
+        if self.whiteToMove:
+            kingRow, kingCol = self.whiteKingLocation
+            ownColor, enemyColor = 'w', 'b'
+        else:
+            kingRow, kingCol = self.blackKingLocation
+            ownColor, enemyColor = 'b', 'w'
+            
+        numCheckers = 0
+        checkMask = 0
+        pinRays = {}
+        
+        for r, c in self.KING_DIRECTIONS:
+            diagonal = r != 0 and c != 0
+            ray = 0
+            pinnedSquare = -1
+            toRow = kingRow + r
+            toCol = kingCol + c
+            while 0 <= toRow < 8 and 0 <= toCol < 8:
+                ray |= 1 << (toRow * 8 + toCol)
+                piece = board[toRow][toCol]
+                toRow += r
+                toCol += c
+                if piece == '--':
+                    continue
+                
+                if piece[0] == ownColor:
+                    if pinnedSquare != -1:
+                        break
+                    pinnedSquare = (toRow - r) * 8 + (toCol - c)
+                    continue
+                
+                pieceType = piece[1]
+                if pieceType == 'Q' or (diagonal and pieceType == 'B') or (not diagonal and pieceType == 'R'):
+                    if pinnedSquare == -1:
+                        numCheckers += 1
+                        checkMask |= ray
+                    else:
+                        pinRays[pinnedSquare] = ray
+                break
+            
+        knight = enemyColor + 'N'
+        for r, c in self.KNIGHT_DIRECTIONS:
+            toRow = kingRow + r
+            toCol = kingCol + c
+            if 0 <= toRow < 8 and 0 <= toCol < 8 and board[toRow][toCol] == knight:
+                numCheckers += 1
+                checkMask |= 1 << (toRow * 8 + toCol)
+                
+        pawn = enemyColor + 'P'
+        pawnRow = kingRow - 1 if ownColor == 'w' else kingRow + 1
+        if 0 <= pawnRow < 8:
+            for toCol in (kingCol - 1, kingCol + 1):
+                if 0 <= toCol < 8 and board[pawnRow][toCol] == pawn:
+                    numCheckers += 1
+                    checkMask |= 1 << (pawnRow * 8 + toCol)
+                    
+        return numCheckers, checkMask, pinRays
+    
     '''
     Gets all the possible moves without considering checks.
+    With noisy or quiet False the captures and promotions, or the other moves, are not generated.
     '''
-    def getAllMoves(self) -> list[Move]:
+    def getAllMoves(self, noisy: bool = True, quiet: bool = True) -> list[Move]:
         move_list: list[Move] = []
         
         for row in range(len(self.board)):
@@ -333,31 +1051,31 @@ class GameState():
                 if GameState.pieceIsWhite(piece):
                     if self.whiteToMove == True:
 
-                        move_list.extend(self.getMoves(piece, row, col))
+                        move_list.extend(self.getMoves(piece, row, col, noisy, quiet))
                     
                 elif not GameState.pieceIsWhite(piece):
                     if self.whiteToMove == False:
                         
-                        move_list.extend(self.getMoves(piece, row, col))
+                        move_list.extend(self.getMoves(piece, row, col, noisy, quiet))
         
 
         return move_list
       
         
-    def getMoves(self, piece, row: int, col: int) -> list[Move]:
+    def getMoves(self, piece, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         piece_type = GameState.getPieceType(piece)
         if piece_type == 'P':
-            return self.getPawnMoves(row, col)
+            return self.getPawnMoves(row, col, noisy, quiet)
         elif piece_type == 'B':
-            return self.getBishopMoves(row, col)
+            return self.getBishopMoves(row, col, noisy, quiet)
         elif piece_type == 'N':
-            return self.getKnightMoves(row, col)
+            return self.getKnightMoves(row, col, noisy, quiet)
         elif piece_type == 'R':
-            return self.getRookMoves(row, col)
+            return self.getRookMoves(row, col, noisy, quiet)
         elif piece_type == 'Q':
-            return self.getQueenMoves(row, col)
+            return self.getQueenMoves(row, col, noisy, quiet)
         elif piece_type == 'K':
-            return self.getKingMoves(row, col)
+            return self.getKingMoves(row, col, noisy, quiet)
         
         return []
         
@@ -369,69 +1087,83 @@ class GameState():
         - Capture an opposing piece diagonally
         - En-passant move
         - Pawn Promotion, currently defaults to a queen
+    Captures and promotions are only generated with noisy, the other moves only with quiet.
     '''
-    def getPawnMoves(self, row: int, col: int) -> list[Move]:
+    def getPawnMoves(self, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         moves: list[Move] = []
         
         if self.whiteToMove == True:
-            if not self.hasPiece(row-1, col) and self.isInBoard(row-1, col):
-                moves.append(Move((row, col), (row-1, col), self.board))
+            # a push onto the last rank promotes
+            if (noisy if row-1 == 0 else quiet) and not self.hasPiece(row-1, col) and self.isInBoard(row-1, col):
+                self.addPawnMove(moves, (row, col), (row-1, col))
             
             
-            if self.pawnOnStartingSquare(row, col) and not self.hasPiece(row-2, col):
+            if quiet and self.pawnOnStartingSquare(row, col) and not self.hasPiece(row-1, col) and not self.hasPiece(row-2, col):
                 fromSquare = (row, col)
                 toSquare = (row-2, col)
                 moves.append(Move(fromSquare, toSquare, self.board))
             
-            # capture diagonally to the left 
-            if self.hasPiece(row-1, col-1) and self.isInBoard(row-1, col-1):
-                if self.board[row-1][col-1][0] == 'b':
-                    moves.append(Move((row, col), (row-1, col-1), self.board))
-                
-            elif (row-1, col-1) == self.enpassantLocation:
-                moves.append(Move((row, col), (row-1, col-1), self.board, enpassantMove=True))
-                    
+            if noisy:
+                # capture diagonally to the left 
+                if self.hasPiece(row-1, col-1) and self.isInBoard(row-1, col-1):
+                    if self.board[row-1][col-1][0] == 'b':
+                        self.addPawnMove(moves, (row, col), (row-1, col-1))
                     
-            # capture diagonally to the right
-            if self.hasPiece(row-1, col+1) and self.isInBoard(row-1, col+1):
-                if self.board[row-1][col+1][0] == 'b':
-                    moves.append(Move((row, col), (row-1, col+1), self.board))
-            elif (row-1, col+1) == self.enpassantLocation:
-                moves.append(Move((row, col), (row-1, col+1), self.board, enpassantMove=True))
+                elif (row-1, col-1) == self.enpassantLocation:
+                    moves.append(Move((row, col), (row-1, col-1), self.board, enpassantMove=True))
+                        
+                        
+                # capture diagonally to the right
+                if self.hasPiece(row-1, col+1) and self.isInBoard(row-1, col+1):
+                    if self.board[row-1][col+1][0] == 'b':
+                        self.addPawnMove(moves, (row, col), (row-1, col+1))
+                elif (row-1, col+1) == self.enpassantLocation:
+                    moves.append(Move((row, col), (row-1, col+1), self.board, enpassantMove=True))
                 
                 
         if self.whiteToMove == False:
-            if not self.hasPiece(row+1, col) and self.isInBoard(row+1, col):
-                moves.append(Move((row, col), (row+1, col), self.board))
+            if (noisy if row+1 == 7 else quiet) and not self.hasPiece(row+1, col) and self.isInBoard(row+1, col):
+                self.addPawnMove(moves, (row, col), (row+1, col))
             
-            if self.pawnOnStartingSquare(row, col) and not self.hasPiece(row+2, col):
+            if quiet and self.pawnOnStartingSquare(row, col) and not self.hasPiece(row+1, col) and not self.hasPiece(row+2, col):
                 fromSquare = (row, col)
                 toSquare = (row+2, col)
                 moves.append(Move(fromSquare, toSquare, self.board))
-                
-            # capture diagonally to the left 
-            if self.hasPiece(row+1, col-1) and self.isInBoard(row+1, col-1):
-                if self.board[row+1][col-1][0] == 'w':
-                    moves.append(Move((row, col), (row+1, col-1), self.board))
-            elif (row+1, col-1) == self.enpassantLocation:
-                moves.append(Move((row, col), (row+1, col-1), self.board, enpassantMove=True))
-                    
-            # capture diagonally to the right
-            if self.hasPiece(row+1, col+1) and self.isInBoard(row+1, col+1):
-                if self.board[row+1][col+1][0] == 'w':
-                    moves.append(Move((row, col), (row+1, col+1), self.board))
-            elif (row+1, col+1) == self.enpassantLocation:
-                moves.append(Move((row, col), (row+1, col+1), self.board, enpassantMove=True))
+            
+            if noisy:
+                # capture diagonally to the left 
+                if self.hasPiece(row+1, col-1) and self.isInBoard(row+1, col-1):
+                    if self.board[row+1][col-1][0] == 'w':
+                        self.addPawnMove(moves, (row, col), (row+1, col-1))
+                elif (row+1, col-1) == self.enpassantLocation:
+                    moves.append(Move((row, col), (row+1, col-1), self.board, enpassantMove=True))
+                        
+                # capture diagonally to the right
+                if self.hasPiece(row+1, col+1) and self.isInBoard(row+1, col+1):
+                    if self.board[row+1][col+1][0] == 'w':
+                        self.addPawnMove(moves, (row, col), (row+1, col+1))
+                elif (row+1, col+1) == self.enpassantLocation:
+                    moves.append(Move((row, col), (row+1, col+1), self.board, enpassantMove=True))
         
         return moves
     
+    '''
+    Adds a pawn move, or one move per promotion piece if the pawn reaches the last rank.
+    '''
+    def addPawnMove(self, moves: list[Move], fromSquare: tuple[int, int], toSquare: tuple[int, int]) -> None:
+        if toSquare[0] == 0 or toSquare[0] == 7:
+            for piece in Move.PROMOTION_PIECES:
+                moves.append(Move(fromSquare, toSquare, self.board, promotionPiece=piece))
+        else:
+            moves.append(Move(fromSquare, toSquare, self.board))
+    
     '''
     Gets the legal Bishop moves given a row and col position
     A legal move for a bishop includes:
         - Moving diagonally in each direction until blocked by a friendly piece
         - Capturing an enemy piece at the end of a diagonal if one exists
     '''
-    def getBishopMoves(self, row: int, col: int) -> list[Move]:
+    def getBishopMoves(self, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         moves: list[Move] = []
         
         # directions of the diagonals, 
@@ -451,18 +1183,21 @@ class GameState():
                         if self.whiteToMove:
                             break
                         else: 
-                            moves.append(Move((row, col), (toRow, toCol), self.board))
+                            if noisy:
+                                moves.append(Move((row, col), (toRow, toCol), self.board))
                             break
  
                     else:
                         if self.whiteToMove:
-                            moves.append(Move((row, col), (toRow, toCol), self.board))
+                            if noisy:
+                                moves.append(Move((row, col), (toRow, toCol), self.board))
                             break
                         else:
                             break
                         
                 # no piece blocking our bishop
-                moves.append(Move((row, col), (toRow, toCol), self.board))
+                if quiet:
+                    moves.append(Move((row, col), (toRow, toCol), self.board))
                             
         
         return moves    
@@ -472,7 +1207,7 @@ class GameState():
     A legal move for a knight includes:
         - Moving in an 'L' Shape in 8 different directions
     '''
-    def getKnightMoves(self, row: int, col: int) -> list[Move]:
+    def getKnightMoves(self, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         moves: list[Move] = []
         
         directions = ((-2,1),(-1,2),(1,2),(2,1),(2,-1),(1,-2),(-1,-2),(-2,-1))
@@ -485,6 +1220,9 @@ class GameState():
                 continue
             
             if self.hasPiece(toRow, toCol):
+                if not noisy:
+                    continue
+                
                 if self.board[toRow][toCol][0] == 'w':
                     if not self.whiteToMove:
                         moves.append(Move((row, col), (toRow, toCol), self.board))
@@ -496,7 +1234,8 @@ class GameState():
                 continue
             
             # no piece
-            moves.append(Move((row, col), (toRow, toCol), self.board))
+            if quiet:
+                moves.append(Move((row, col), (toRow, toCol), self.board))
                     
         return moves      
     
@@ -507,7 +1246,7 @@ class GameState():
         - Moving horizontally along the same row until blocked by a piece
         - Moving vertically along the same column until blocked by a piece 
     '''
-    def getRookMoves(self, row: int, col: int) -> list[Move]:
+    def getRookMoves(self, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         moves: list[Move] = []
         
         
@@ -523,6 +1262,8 @@ class GameState():
                 
                 if self.hasPiece(toRow, toCol):
                     pieceColor = self.board[toRow][toCol][0]
+                    if not noisy:
+                        break
                     if self.whiteToMove:
                         if pieceColor != 'w':
                             moves.append(Move((row, col), (toRow, toCol), self.board))
@@ -532,18 +1273,19 @@ class GameState():
                     break
                 
                 # no piece
-                moves.append(Move((row, col), (toRow, toCol), self.board))
+                if quiet:
+                    moves.append(Move((row, col), (toRow, toCol), self.board))
 
         return moves      
     
     '''
     A combination of the rooks and bishop moves.
     '''
-    def getQueenMoves(self, row: int, col: int) -> list[Move]:
+    def getQueenMoves(self, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         moves: list[Move] = []
         
-        moves.extend(self.getBishopMoves(row, col))
-        moves.extend(self.getRookMoves(row, col))
+        moves.extend(self.getBishopMoves(row, col, noisy, quiet))
+        moves.extend(self.getRookMoves(row, col, noisy, quiet))
         
         return moves 
     
@@ -552,7 +1294,7 @@ class GameState():
     A legal move for a king includes:
         - Moving one space in any direction
     '''
-    def getKingMoves(self, row: int, col: int) -> list[Move]:
+    def getKingMoves(self, row: int, col: int, noisy: bool = True, quiet: bool = True) -> list[Move]:
         moves: list[Move] = []
         
         directions = (-1, 0, 1)
@@ -567,6 +1309,8 @@ class GameState():
                 
                 if self.hasPiece(toRow, toCol):
                     pieceColor = self.board[toRow][toCol][0]
+                    if not noisy:
+                        continue
                     if self.whiteToMove:
                         if pieceColor == 'b':
                             moves.append(Move((row, col), (toRow, toCol), self.board))
@@ -576,7 +1320,8 @@ class GameState():
                     continue
                 
                 # no piece 
-                moves.append(Move((row, col), (toRow, toCol), self.board))
+                if quiet:
+                    moves.append(Move((row, col), (toRow, toCol), self.board))
                 
 
         return moves      
@@ -591,10 +1336,15 @@ class GameState():
         - The king cannot castle towards the side that a rook has moved.
         - The king cannot castle through other pieces
         - The king cannot castle into check (logic handled in getValidMoves)
+    attackedSquares is the opponent's attack map from getAttackedSquares, computed here if not given.
     '''    
-    def getCastleMoves(self, row, col) -> list[Move]:
+    def getCastleMoves(self, row, col, attackedSquares: int = None) -> list[Move]:
         moves = []
-        if self.isInCheck():
+        if attackedSquares is None:
+            attackedSquares = self.getAttackedSquares(not self.whiteToMove)
+            
+        kingPos = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        if attackedSquares & (1 << (kingPos[0] * 8 + kingPos[1])):
             return moves
         
         if not self.kingOnStartingSquare():
@@ -602,19 +1352,19 @@ class GameState():
         
         if self.whiteToMove:
             
-            if self.currentCastlingRights.wKingSide:
-                moves.extend(self.getKingSideCastleMoves())
+            if self.castlingRights & self.WHITE_KING_SIDE:
+                moves.extend(self.getKingSideCastleMoves(attackedSquares))
             
-            if self.currentCastlingRights.wQueenSide:
-                moves.extend(self.getQueenSideCastleMoves())
+            if self.castlingRights & self.WHITE_QUEEN_SIDE:
+                moves.extend(self.getQueenSideCastleMoves(attackedSquares))
             
         
         if not self.whiteToMove:
-            if self.currentCastlingRights.bKingSide:
-                moves.extend(self.getKingSideCastleMoves())
+            if self.castlingRights & self.BLACK_KING_SIDE:
+                moves.extend(self.getKingSideCastleMoves(attackedSquares))
             
-            if self.currentCastlingRights.bQueenSide:
-                moves.extend(self.getQueenSideCastleMoves())
+            if self.castlingRights & self.BLACK_QUEEN_SIDE:
+                moves.extend(self.getQueenSideCastleMoves(attackedSquares))
 
         return moves
     
@@ -623,7 +1373,7 @@ class GameState():
     Checks for pieces in the way
     Checks for squares being targeting 
     '''
-    def getKingSideCastleMoves(self) -> list[Move]:
+    def getKingSideCastleMoves(self, attackedSquares: int) -> list[Move]:
         kingPos = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
         
         moves = []
@@ -633,7 +1383,8 @@ class GameState():
             return moves 
         
         # check for if the squares inbetween the king and king-side rook are being targeted
-        if self.squareAttacked(kingPos[0], kingPos[1]+1) or self.squareAttacked(kingPos[0], kingPos[1]+2):
+        kingSquare = kingPos[0] * 8 + kingPos[1]
+        if attackedSquares & ((1 << (kingSquare + 1)) | (1 << (kingSquare + 2))):
             return moves 
             
         
@@ -648,7 +1399,7 @@ class GameState():
     Checks for pieces in the way
     Checks for squares being targeting 
     '''  
-    def getQueenSideCastleMoves(self) -> list[Move]:
+    def getQueenSideCastleMoves(self, attackedSquares: int) -> list[Move]:
         kingPos = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
         
         moves = []
@@ -658,7 +1409,8 @@ class GameState():
             return moves 
         
         # check for if the squares inbetween the king and king-side rook are being targeted
-        if self.squareAttacked(kingPos[0], kingPos[1]-1) or self.squareAttacked(kingPos[0], kingPos[1]-2) or self.hasPiece(kingPos[0], kingPos[1]-3):
+        kingSquare = kingPos[0] * 8 + kingPos[1]
+        if attackedSquares & ((1 << (kingSquare - 1)) | (1 << (kingSquare - 2))):
             return moves 
             
         
@@ -710,6 +1462,58 @@ class GameState():
         if self.board[row][col] == "--":
             return False
         return True
+    
+    '''
+    Counts the pieces on the board, kings included.
+    '''
+    def countPieces(self) -> int:
+        return sum(1 for row in self.board for piece in row if piece != '--')
+    
+    '''
+    Checks if the side has a knight, bishop, rook or queen. Without one, zugzwang is likely and passing the turn
+    is not a safe guess at the side's worst case.
+    '''
+    def hasNonPawnMaterial(self, white: bool) -> bool:
+        color = 'w' if white else 'b'
+        return any(piece[0] == color and piece[1] in 'NBRQ' for row in self.board for piece in row)
+    
+    '''
+    Counts how often the current position has been reached, this time included, stopping once it reaches stopAt.
+    The keys before every move are on the undo stack. Only positions with the same side to move since the last
+    capture or pawn move are compared, every earlier one has other material or pawns, so this reads at most
+    repetitionPlies / 2 keys and none at all in the first plies after an irreversible move.
+    The window also restarts at a null move, a position the search reached by passing is not repeated.
+    '''
+    def repetitionCount(self, stopAt: int = 3) -> int:
+        undoStack = self.undoStack
+        key = self.zobristKey
+        plies = len(self.moveLog)
+        count = 1
+        # the position 2 plies back can not be the same one, a move was made and taken back by both sides at the least
+        for ply in range(plies - 4, max(plies - self.repetitionPlies, 0) - 1, -2):
+            if undoStack[2 * ply + 1] == key:
+                count += 1
+                if count >= stopAt:
+                    break
+        return count
+    
+    '''
+    Checks if the current position was reached before, the search scores this as a draw.
+    '''
+    def isRepetition(self) -> bool:
+        return self.repetitionPlies >= 4 and self.repetitionCount(2) >= 2
+    
+    def isThreefoldRepetition(self) -> bool:
+        return self.repetitionPlies >= 8 and self.repetitionCount(3) >= 3
+    
+    '''
+    Checks if 50 moves by each side were made without a capture or pawn move.
+    A checkmate on the move that completes them still wins.
+    '''
+    def isFiftyMoveDraw(self) -> bool:
+        if self.halfmoveClock < 100:
+            return False
+        return not self.isInCheck() or len(self.getValidMoves()) > 0
        
     '''
     Checks if the given row and col cooresponds to a square on the board
@@ -728,4 +1532,630 @@ class GameState():
     
     @staticmethod
     def getPieceType(piece: str) -> str:
-        return piece[1]
\ No newline at end of file
+        return piece[1]    
+    
+"""
+A GameState that keeps the position as twelve bitboards, one per piece type and color,
+an occupancy mask for each side and a flat list of the piece on each of the 64 squares.
+
+move and undoMove only update those, the 8x8 board array is a view that is built from the squares
+when something reads it, ex. the user interface after a move. Move generation and attack detection
+are done on the bitboards using the precomputed tables in Bitboard.py, and the legal moves are
+generated directly, with checks and pins applied to the target masks.
+"""
+class BitboardGameState(GameState):
+    PIECES = ('wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+    
+    # moves are never changed once made, so the generator hands out one shared Move for each
+    # piece, captured piece and move id instead of allocating a new one at every node
+    MOVE_CACHE = {piece: {captured: {} for captured in GameState.UNDO_PIECES} for piece in PIECES}
+    
+    def __init__(self, backend: str = 'bitboard', fen: str = None):
+        super().__init__(backend, fen)
+    
+    '''
+    The 8x8 board array, built from squares the first time it is read after a move.
+    Changing it does not change the position, assigning a new one sets up the bitboards from it.
+    '''
+    @property
+    def board(self) -> list[list[str]]:
+        if self.boardView is None:
+            squares = self.squares
+            self.boardView = [squares[square:square + 8] for square in range(0, 64, 8)]
+        return self.boardView
+    
+    @board.setter
+    def board(self, board: list[list[str]]) -> None:
+        self.squares = [piece for row in board for piece in row]
+        self.boardView = None
+        self.initBitboards()
+    
+    '''
+    Builds the bitboards from the squares.
+    '''
+    def initBitboards(self) -> None:
+        self.bitboards = {piece: 0 for piece in self.PIECES}
+        self.whiteOccupancy = 0
+        self.blackOccupancy = 0
+        
+        for square, piece in enumerate(self.squares):
+            if piece == '--':
+                continue
+            bit = 1 << square
+            self.bitboards[piece] |= bit
+            if piece[0] == 'w':
+                self.whiteOccupancy |= bit
+            else:
+                self.blackOccupancy |= bit
+    
+    '''
+    Makes a move and flips the turn, updating the bitboards, squares, Zobrist key and evaluation
+    in one pass over the pieces the move touches.
+    '''
+    def move(self, move: Move) -> None:
+        squares = self.squares
+        bitboards = self.bitboards
+        pieceKeys = Zobrist.PIECE_KEYS
+        fromSquare = move.fromRow * 8 + move.fromCol
+        toSquare = move.toRow * 8 + move.toCol
+        pieceMoved = move.pieceMoved
+        pieceCaptured = move.pieceCaptured
+        
+        index = 2 * len(self.moveLog)
+        if index == len(self.undoStack):
+            self.undoStack.extend(self.undoStack)
+        self.undoStack[index] = self.packUndoState(pieceCaptured)
+        self.undoStack[index + 1] = self.zobristKey
+        self.moveLog.append(move)
+        
+        key = self.zobristKey ^ Zobrist.SIDE_KEY ^ self.zobristStateKey(self.castlingRights, self.enpassantLocation)
+        
+        fromBit = 1 << fromSquare
+        toBit = 1 << toSquare
+        bitboards[pieceMoved] ^= fromBit
+        squares[fromSquare] = '--'
+        key ^= pieceKeys[pieceMoved][fromSquare]
+        self.addPieceScore(pieceMoved, fromSquare, -1)
+        
+        if pieceCaptured != '--':
+            capturedSquare = move.fromRow * 8 + move.toCol if move.enpassantMove else toSquare
+            capturedBit = 1 << capturedSquare
+            bitboards[pieceCaptured] ^= capturedBit
+            squares[capturedSquare] = '--'
+            key ^= pieceKeys[pieceCaptured][capturedSquare]
+            self.addPieceScore(pieceCaptured, capturedSquare, -1)
+            if pieceCaptured[0] == 'w':
+                self.whiteOccupancy ^= capturedBit
+            else:
+                self.blackOccupancy ^= capturedBit
+        
+        placed = pieceMoved[0] + move.promotionPiece if move.pawnPromotionMove else pieceMoved
+        bitboards[placed] ^= toBit
+        squares[toSquare] = placed
+        key ^= pieceKeys[placed][toSquare]
+        self.addPieceScore(placed, toSquare, 1)
+        
+        moved = fromBit | toBit
+        if move.castling:
+            rook = pieceMoved[0] + 'R'
+            if move.toCol - move.fromCol == 2:
+                rookFrom, rookTo = fromSquare + 3, fromSquare + 1
+            else:
+                rookFrom, rookTo = fromSquare - 4, fromSquare - 1
+            bitboards[rook] ^= (1 << rookFrom) | (1 << rookTo)
+            squares[rookFrom] = '--'
+            squares[rookTo] = rook
+            key ^= pieceKeys[rook][rookFrom] ^ pieceKeys[rook][rookTo]
+            self.addPieceScore(rook, rookFrom, -1)
+            self.addPieceScore(rook, rookTo, 1)
+            moved |= (1 << rookFrom) | (1 << rookTo)
+        
+        if pieceMoved[0] == 'w':
+            self.whiteOccupancy ^= moved
+        else:
+            self.blackOccupancy ^= moved
+            self.fullmoveNumber += 1
+        
+        if pieceMoved[1] == 'P' or pieceCaptured != '--':
+            self.halfmoveClock = 0
+            self.repetitionPlies = 0
+        else:
+            self.halfmoveClock += 1
+            self.repetitionPlies += 1
+        
+        if pieceMoved == 'wK':
+            self.whiteKingLocation = self.LOCATIONS[toSquare]
+        elif pieceMoved == 'bK':
+            self.blackKingLocation = self.LOCATIONS[toSquare]
+        
+        if pieceMoved[1] == 'P' and abs(fromSquare - toSquare) == 16:
+            self.enpassantLocation = self.LOCATIONS[(fromSquare + toSquare) // 2]
+        else:
+            self.enpassantLocation = ()
+        self.castlingRights &= self.CASTLING_MASKS[fromSquare] & self.CASTLING_MASKS[toSquare]
+        
+        self.zobristKey = key ^ self.zobristStateKey(self.castlingRights, self.enpassantLocation)
+        self.whiteToMove = not self.whiteToMove
+        self.boardView = None
+        
+        if self.debugZobrist:
+            self.checkZobristKey()
+        if self.debugEvaluation:
+            self.checkEvaluation()
+    
+    '''
+    Undoes the most recent move
+    '''
+    def undoMove(self) -> None:
+        if len(self.moveLog) == 0:
+            print("No move to undo")
+            return
+        
+        move: Move = self.moveLog.pop()
+        index = 2 * len(self.moveLog)
+        state = self.undoStack[index]
+        pieceCaptured = self.UNDO_PIECES[(state >> 11) & 15]
+        
+        squares = self.squares
+        bitboards = self.bitboards
+        fromSquare = move.fromRow * 8 + move.fromCol
+        toSquare = move.toRow * 8 + move.toCol
+        pieceMoved = move.pieceMoved
+        
+        fromBit = 1 << fromSquare
+        toBit = 1 << toSquare
+        placed = pieceMoved[0] + move.promotionPiece if move.pawnPromotionMove else pieceMoved
+        bitboards[placed] ^= toBit
+        squares[toSquare] = '--'
+        self.addPieceScore(placed, toSquare, -1)
+        bitboards[pieceMoved] ^= fromBit
+        squares[fromSquare] = pieceMoved
+        self.addPieceScore(pieceMoved, fromSquare, 1)
+        
+        if pieceCaptured != '--':
+            capturedSquare = move.fromRow * 8 + move.toCol if move.enpassantMove else toSquare
+            capturedBit = 1 << capturedSquare
+            bitboards[pieceCaptured] ^= capturedBit
+            squares[capturedSquare] = pieceCaptured
+            self.addPieceScore(pieceCaptured, capturedSquare, 1)
+            if pieceCaptured[0] == 'w':
+                self.whiteOccupancy ^= capturedBit
+            else:
+                self.blackOccupancy ^= capturedBit
+        
+        moved = fromBit | toBit
+        if move.castling:
+            rook = pieceMoved[0] + 'R'
+            if move.toCol - move.fromCol == 2:
+                rookFrom, rookTo = fromSquare + 3, fromSquare + 1
+            else:
+                rookFrom, rookTo = fromSquare - 4, fromSquare - 1
+            bitboards[rook] ^= (1 << rookFrom) | (1 << rookTo)
+            squares[rookTo] = '--'
+            squares[rookFrom] = rook
+            self.addPieceScore(rook, rookTo, -1)
+            self.addPieceScore(rook, rookFrom, 1)
+            moved |= (1 << rookFrom) | (1 << rookTo)
+        
+        if pieceMoved[0] == 'w':
+            self.whiteOccupancy ^= moved
+        else:
+            self.blackOccupancy ^= moved
+            self.fullmoveNumber -= 1
+        
+        if pieceMoved == 'wK':
+            self.whiteKingLocation = self.LOCATIONS[fromSquare]
+        elif pieceMoved == 'bK':
+            self.blackKingLocation = self.LOCATIONS[fromSquare]
+        
+        self.castlingRights = state & 15
+        enpassantSquare = (state >> 4) & 127
+        self.enpassantLocation = self.LOCATIONS[enpassantSquare - 1] if enpassantSquare else ()
+        self.repetitionPlies = (state >> 15) & 0xFFFFF
+        self.halfmoveClock = state >> 35
+        self.zobristKey = self.undoStack[index + 1]
+        self.whiteToMove = not self.whiteToMove
+        self.boardView = None
+        
+        if self.debugZobrist:
+            self.checkZobristKey()
+        if self.debugEvaluation:
+            self.checkEvaluation()
+    
+    def hasPiece(self, row: int, col: int) -> bool:
+        return 0 <= row < 8 and 0 <= col < 8 and self.squares[row * 8 + col] != '--'
+    
+    def countPieces(self) -> int:
+        return Bitboard.popCount(self.whiteOccupancy | self.blackOccupancy)
+    
+    def hasNonPawnMaterial(self, white: bool) -> bool:
+        bitboards = self.bitboards
+        if white:
+            return (bitboards['wN'] | bitboards['wB'] | bitboards['wR'] | bitboards['wQ']) != 0
+        return (bitboards['bN'] | bitboards['bB'] | bitboards['bR'] | bitboards['bQ']) != 0
+    
+    '''
+    Checks if the square is attacked by the given side, by looking outward from the square
+    with each piece's attack pattern.
+    '''
+    def squareAttackedBy(self, row: int, col: int, byWhite: bool) -> bool:
+        square = row * 8 + col
+        bitboards = self.bitboards
+        color = 'w' if byWhite else 'b'
+        
+        if Bitboard.KNIGHT_ATTACKS[square] & bitboards[color + 'N']:
+            return True
+        # a pawn of the attacking side attacks this square if a pawn of the other side on this square would attack it
+        if Bitboard.PAWN_ATTACKS[1 if byWhite else 0][square] & bitboards[color + 'P']:
+            return True
+        if Bitboard.KING_ATTACKS[square] & bitboards[color + 'K']:
+            return True
+        
+        occupancy = self.whiteOccupancy | self.blackOccupancy
+        queens = bitboards[color + 'Q']
+        if Bitboard.BISHOP_TABLES[square][occupancy & Bitboard.BISHOP_MASKS[square]] & (bitboards[color + 'B'] | queens):
+            return True
+        if Bitboard.ROOK_TABLES[square][occupancy & Bitboard.ROOK_MASKS[square]] & (bitboards[color + 'R'] | queens):
+            return True
+        return False
+    
+    '''
+    Gets every square attacked by the given side as a bitmask.
+    Sliders see through the piece on ignoreSquare.
+    '''
+    def getAttackedSquares(self, byWhite: bool, ignoreSquare: int = -1) -> int:
+        bitboards = self.bitboards
+        color = 'w' if byWhite else 'b'
+        occupancy = self.whiteOccupancy | self.blackOccupancy
+        if ignoreSquare != -1:
+            occupancy &= ~(1 << ignoreSquare)
+        attacked = 0
+        
+        pawns = bitboards[color + 'P']
+        if byWhite:
+            attacked |= ((pawns & ~Bitboard.COL_MASKS[0]) >> 9) | ((pawns & ~Bitboard.COL_MASKS[7]) >> 7)
+        else:
+            attacked |= ((pawns & ~Bitboard.COL_MASKS[0]) << 7) | ((pawns & ~Bitboard.COL_MASKS[7]) << 9)
+        
+        knightAttacks = Bitboard.KNIGHT_ATTACKS
+        for square in Bitboard.iterateBits(bitboards[color + 'N']):
+            attacked |= knightAttacks[square]
+        for square in Bitboard.iterateBits(bitboards[color + 'K']):
+            attacked |= Bitboard.KING_ATTACKS[square]
+        
+        queens = bitboards[color + 'Q']
+        bishopTables, bishopMasks = Bitboard.BISHOP_TABLES, Bitboard.BISHOP_MASKS
+        for square in Bitboard.iterateBits(bitboards[color + 'B'] | queens):
+            attacked |= bishopTables[square][occupancy & bishopMasks[square]]
+        rookTables, rookMasks = Bitboard.ROOK_TABLES, Bitboard.ROOK_MASKS
+        for square in Bitboard.iterateBits(bitboards[color + 'R'] | queens):
+            attacked |= rookTables[square][occupancy & rookMasks[square]]
+        
+        return attacked & Bitboard.FULL_BOARD
+    
+    '''
+    Gets the legal moves, generated straight from the bitboards (see generateMoves).
+    '''
+    def getValidMoves(self) -> list[Move]:
+        legalityInfo = self.getLegalityInfo()
+        kingPos = legalityInfo[0]
+        
+        moves = []
+        if not self.inCheck:
+            moves.extend(self.getCastleMoves(kingPos[0], kingPos[1], legalityInfo[4]))
+        self.generateMoves(moves, True, True, legalityInfo)
+        
+        self.checkMate = len(moves) == 0 and self.inCheck
+        self.staleMate = len(moves) == 0 and not self.inCheck
+        
+        return moves
+    
+    '''
+    Gets all the possible moves without considering checks, generated from the bitboards.
+    '''
+    def getAllMoves(self, noisy: bool = True, quiet: bool = True) -> list[Move]:
+        moves: list[Move] = []
+        self.generateMoves(moves, noisy, quiet)
+        return moves
+    
+    '''
+    Gets the pseudo-legal captures and promotions by only generating moves onto enemy pieces.
+    '''
+    def getNoisyMoves(self) -> list[Move]:
+        return self.getAllMoves(True, False)
+    
+    '''
+    Gets the pseudo-legal moves that neither capture nor promote by only generating moves onto empty squares.
+    '''
+    def getQuietMoves(self) -> list[Move]:
+        return self.getAllMoves(False, True)
+    
+    def getLegalNoisyMoves(self, legalityInfo: tuple) -> list[Move]:
+        moves: list[Move] = []
+        self.generateMoves(moves, True, False, legalityInfo)
+        return moves
+    
+    def getLegalQuietMoves(self, legalityInfo: tuple) -> list[Move]:
+        moves: list[Move] = []
+        self.generateMoves(moves, False, True, legalityInfo)
+        return moves
+    
+    '''
+    Gets the pseudo-legal move with the given move id, or None if the side to move has no such move.
+    Only the piece on the move's from square is generated.
+    '''
+    def getPseudoMove(self, moveID: int) -> Move:
+        fromSquare = (moveID >> 6) & 63
+        piece = self.squares[fromSquare]
+        if piece == '--' or (piece[0] == 'w') != self.whiteToMove:
+            return None
+        
+        moves: list[Move] = []
+        self.generateMoves(moves, True, True, fromMask=1 << fromSquare)
+        for move in moves:
+            if move.moveID == moveID:
+                return move
+        return None
+    
+    '''
+    Adds the captures and promotions, the quiet moves, or both to moves, castling is not included.
+    With legalityInfo from getLegalityInfo only legal moves are added: the king's targets leave out the
+    attacked squares, in check the other pieces' targets are limited to the check mask, and a pinned piece's
+    to its pin ray. Only en passant is checked by making the move. Without it the moves are pseudo-legal.
+    fromMask limits the pieces that are moved.
+    '''
+    def generateMoves(self, moves: list[Move], noisy: bool, quiet: bool, legalityInfo: tuple = None,
+                      fromMask: int = Bitboard.FULL_BOARD) -> None:
+        bitboards = self.bitboards
+        
+        if self.whiteToMove:
+            color = 'w'
+            own = self.whiteOccupancy
+            enemy = self.blackOccupancy
+        else:
+            color = 'b'
+            own = self.blackOccupancy
+            enemy = self.whiteOccupancy
+        occupancy = own | enemy
+        
+        targets = 0
+        if noisy:
+            targets |= enemy
+        if quiet:
+            targets |= ~occupancy & Bitboard.FULL_BOARD
+        
+        kingTargets = targets
+        # the squares the other pieces may move to: all of them, or the check mask in check
+        legalMask = Bitboard.FULL_BOARD
+        pinRays = {}
+        if legalityInfo is not None:
+            kingPos, numCheckers, checkMask, pinRays, attackedSquares = legalityInfo
+            kingTargets &= ~attackedSquares
+            if numCheckers > 1:
+                legalMask = 0
+            elif numCheckers:
+                legalMask = checkMask
+        
+        king = color + 'K'
+        for square in Bitboard.iterateBits(bitboards[king] & fromMask):
+            self.addMovesTo(moves, square, king, Bitboard.KING_ATTACKS[square] & kingTargets)
+        if not legalMask:
+            return
+        targets &= legalMask
+        
+        pinned = 0
+        for square in pinRays:
+            pinned |= 1 << square
+        
+        pawns = bitboards[color + 'P'] & fromMask
+        self.addPawnMoves(moves, pawns & ~pinned, legalMask, occupancy, enemy, noisy, quiet, legalityInfo)
+        for square in Bitboard.iterateBits(pawns & pinned):
+            self.addPawnMoves(moves, 1 << square, legalMask & pinRays[square], occupancy, enemy, noisy, quiet, legalityInfo)
+        
+        # a pinned knight can never stay on its pin ray
+        knight = color + 'N'
+        knightAttacks = Bitboard.KNIGHT_ATTACKS
+        for square in Bitboard.iterateBits(bitboards[knight] & fromMask & ~pinned):
+            self.addMovesTo(moves, square, knight, knightAttacks[square] & targets)
+        
+        bishopTables, bishopMasks = Bitboard.BISHOP_TABLES, Bitboard.BISHOP_MASKS
+        rookTables, rookMasks = Bitboard.ROOK_TABLES, Bitboard.ROOK_MASKS
+        for piece in (color + 'B', color + 'R', color + 'Q'):
+            pieceType = piece[1]
+            for square in Bitboard.iterateBits(bitboards[piece] & fromMask):
+                if pieceType == 'B':
+                    attacks = bishopTables[square][occupancy & bishopMasks[square]]
+                elif pieceType == 'R':
+                    attacks = rookTables[square][occupancy & rookMasks[square]]
+                else:
+                    attacks = (bishopTables[square][occupancy & bishopMasks[square]]
+                               | rookTables[square][occupancy & rookMasks[square]])
+                attacks &= targets
+                if pinned & (1 << square):
+                    attacks &= pinRays[square]
+                self.addMovesTo(moves, square, piece, attacks)
+    
+    '''
+    Adds a move of piece from the given square to every square in the targets bitboard.
+    '''
+    def addMovesTo(self, moves: list[Move], fromSquare: int, piece: str, targets: int) -> None:
+        squares = self.squares
+        cache = self.MOVE_CACHE[piece]
+        fromID = fromSquare << 6
+        while targets:
+            lsb = targets & -targets
+            toSquare = lsb.bit_length() - 1
+            pieceCaptured = squares[toSquare]
+            captureCache = cache[pieceCaptured]
+            move = captureCache.get(fromID | toSquare)
+            if move is None:
+                move = captureCache[fromID | toSquare] = Move.fromSquares(fromSquare, toSquare, piece, pieceCaptured)
+            moves.append(move)
+            targets ^= lsb
+    
+    '''
+    Gets the shared move from MOVE_CACHE, creating it the first time. En passant and castling moves
+    are not cached, an en passant capture has the same squares and pieces as a normal capture.
+    '''
+    def cachedMove(self, fromSquare: int, toSquare: int, piece: str, pieceCaptured: str,
+                   promotionPiece: str = None) -> Move:
+        captureCache = self.MOVE_CACHE[piece][pieceCaptured]
+        moveID = (fromSquare << 6) | toSquare
+        if promotionPiece is not None:
+            moveID |= Move.PROMOTION_CODES[promotionPiece] << 12
+        move = captureCache.get(moveID)
+        if move is None:
+            move = captureCache[moveID] = Move.fromSquares(fromSquare, toSquare, piece, pieceCaptured, promotionPiece)
+        return move
+    
+    '''
+    Adds the pawn pushes, captures and en passant captures of the given pawns of the side to move,
+    limited to the squares in legalMask (see generateMoves).
+    Single and double pushes are computed for all the pawns at once by shifting the pawn bitboard.
+    Captures, en passant and pushes onto the last rank are noisy, the other pushes are quiet.
+    '''
+    def addPawnMoves(self, moves: list[Move], pawns: int, legalMask: int, occupancy: int, enemy: int,
+                     noisy: bool = True, quiet: bool = True, legalityInfo: tuple = None) -> None:
+        if not pawns:
+            return
+        squares = self.squares
+        empty = ~occupancy & Bitboard.FULL_BOARD
+        
+        if self.whiteToMove:
+            pawn = 'wP'
+            attackTable = Bitboard.PAWN_ATTACKS[0]
+            singlePushes = (pawns >> 8) & empty
+            doublePushes = ((singlePushes & Bitboard.ROW_MASKS[5]) >> 8) & empty
+            promotionRow = Bitboard.ROW_MASKS[0]
+            pushOffset = 8
+        else:
+            pawn = 'bP'
+            attackTable = Bitboard.PAWN_ATTACKS[1]
+            singlePushes = (pawns << 8) & empty
+            doublePushes = ((singlePushes & Bitboard.ROW_MASKS[2]) << 8) & empty
+            promotionRow = Bitboard.ROW_MASKS[7]
+            pushOffset = -8
+        singlePushes &= legalMask
+        doublePushes &= legalMask
+        
+        if not noisy:
+            singlePushes &= ~promotionRow
+        if not quiet:
+            singlePushes &= promotionRow
+            doublePushes = 0
+        
+        for toSquare in Bitboard.iterateBits(singlePushes):
+            self.addPawnMoveTo(moves, toSquare + pushOffset, toSquare, pawn, '--')
+        
+        for toSquare in Bitboard.iterateBits(doublePushes):
+            moves.append(self.cachedMove(toSquare + 2 * pushOffset, toSquare, pawn, '--'))
+        
+        if not noisy:
+            return
+        
+        captureTargets = enemy & legalMask
+        enpassant = self.enpassantLocation
+        enpassantBit = 1 << (enpassant[0] * 8 + enpassant[1]) if enpassant else 0
+        
+        for fromSquare in Bitboard.iterateBits(pawns):
+            attacks = attackTable[fromSquare]
+            captures = attacks & captureTargets
+            while captures:
+                lsb = captures & -captures
+                toSquare = lsb.bit_length() - 1
+                self.addPawnMoveTo(moves, fromSquare, toSquare, pawn, squares[toSquare])
+                captures ^= lsb
+            if attacks & enpassantBit:
+                move = Move.fromSquares(fromSquare, enpassantBit.bit_length() - 1, pawn, 'bP' if pawn == 'wP' else 'wP',
+                                        enpassantMove=True)
+                # the captured pawn leaves a square no mask covers, so en passant is tried on the board
+                if legalityInfo is None or self.enpassantIsLegal(move):
+                    moves.append(move)
+    
+    '''
+    Adds a pawn move, or one move per promotion piece if the pawn reaches the last rank.
+    '''
+    def addPawnMoveTo(self, moves: list[Move], fromSquare: int, toSquare: int, pawn: str, pieceCaptured: str) -> None:
+        if toSquare < 8 or toSquare >= 56:
+            for piece in Move.PROMOTION_PIECES:
+                moves.append(self.cachedMove(fromSquare, toSquare, pawn, pieceCaptured, piece))
+        else:
+            moves.append(self.cachedMove(fromSquare, toSquare, pawn, pieceCaptured))
+    
+    '''
+    Gets the legal castling moves, with the same rules as GameState.getCastleMoves checked on the bitboards.
+    attackedSquares is the opponent's attack map from getAttackedSquares, computed here if not given.
+    '''
+    def getCastleMoves(self, row, col, attackedSquares: int = None) -> list[Move]:
+        moves = []
+        if self.whiteToMove:
+            king, kingSquare = 'wK', 60
+            kingSide, queenSide = self.WHITE_KING_SIDE, self.WHITE_QUEEN_SIDE
+        else:
+            king, kingSquare = 'bK', 4
+            kingSide, queenSide = self.BLACK_KING_SIDE, self.BLACK_QUEEN_SIDE
+        if not self.castlingRights & (kingSide | queenSide) or self.squares[kingSquare] != king:
+            return moves
+        
+        if attackedSquares is None:
+            attackedSquares = self.getAttackedSquares(not self.whiteToMove)
+        if attackedSquares & (1 << kingSquare):
+            return moves
+        
+        occupancy = self.whiteOccupancy | self.blackOccupancy
+        # the squares the king passes and lands on, which are also the ones that have to be empty king side
+        kingSidePath = 0b11 << (kingSquare + 1)
+        queenSidePath = 0b11 << (kingSquare - 2)
+        if self.castlingRights & kingSide and not (occupancy | attackedSquares) & kingSidePath:
+            moves.append(Move.fromSquares(kingSquare, kingSquare + 2, king, '--', castling=True))
+        if (self.castlingRights & queenSide and not attackedSquares & queenSidePath
+                and not occupancy & (0b111 << (kingSquare - 3))):
+            moves.append(Move.fromSquares(kingSquare, kingSquare - 2, king, '--', castling=True))
+        return moves
+    
+    '''
+    Finds the checkers and pinned pieces with the ray tables instead of walking the board.
+    Returns the same (number of checkers, check mask, pin rays) as GameState.getPinsAndChecks.
+    '''
+    def getPinsAndChecks(self) -> tuple[int, int, dict]:
+        bitboards = self.bitboards
+        if self.whiteToMove:
+            kingRow, kingCol = self.whiteKingLocation
+            own = self.whiteOccupancy
+            enemyColor = 'b'
+        else:
+            kingRow, kingCol = self.blackKingLocation
+            own = self.blackOccupancy
+            enemyColor = 'w'
+        kingSquare = kingRow * 8 + kingCol
+        occupancy = self.whiteOccupancy | self.blackOccupancy
+        
+        numCheckers = 0
+        checkMask = 0
+        pinRays = {}
+        
+        knights = Bitboard.KNIGHT_ATTACKS[kingSquare] & bitboards[enemyColor + 'N']
+        pawns = Bitboard.PAWN_ATTACKS[0 if enemyColor == 'b' else 1][kingSquare] & bitboards[enemyColor + 'P']
+        for square in Bitboard.iterateBits(knights | pawns):
+            numCheckers += 1
+            checkMask |= 1 << square
+            
+        queens = bitboards[enemyColor + 'Q']
+        diagonalSliders = bitboards[enemyColor + 'B'] | queens
+        straightSliders = bitboards[enemyColor + 'R'] | queens
+        
+        for direction in range(8):
+            kingRay = Bitboard.RAYS[direction][kingSquare]
+            sliders = kingRay & (diagonalSliders if direction >= Bitboard.NORTH_EAST else straightSliders)
+            
+            for slider in Bitboard.iterateBits(sliders):
+                # the squares between the king and the slider, plus the slider itself
+                ray = kingRay ^ Bitboard.RAYS[direction][slider]
+                blockers = ray & occupancy & ~(1 << slider)
+                if not blockers:
+                    numCheckers += 1
+                    checkMask |= ray
+                elif blockers & (blockers - 1) == 0 and blockers & own:
+                    pinRays[blockers.bit_length() - 1] = ray
+                    
+        return numCheckers, checkMask, pinRays
@@ -0,0 +1,141 @@
+'''
+Material and piece-square values used for the incrementally updated evaluation in GameState.
+
+Scores are in centipawns. Each piece has a middlegame and an endgame piece-square table, written
+from white's point of view in the same layout as the board array (row 0 is the 8th rank).
+Black uses the tables mirrored vertically. The two scores are blended by the game phase,
+which is counted down from MAX_PHASE as the pieces come off the board.
+
+Tables are based on the simplified evaluation function by Tomasz Michniewski,
+https://www.chessprogramming.org/Simplified_Evaluation_Function
+'''
+
+PIECE_VALUE = {
+    'K' : 0,
+    'Q' : 900,
+    'R' : 500,
+    'B' : 330,
+    'N' : 320,
+    'P' : 100
+}
+
+# centipawns per square a piece attacks that is not taken by its own side,
+# only used by the batch evaluation in BatchEvaluation.py
+MOBILITY_WEIGHT = {'N': 4, 'B': 5, 'R': 2, 'Q': 1}
+
+# how much each piece counts towards the middlegame, all pieces on the board gives MAX_PHASE
+PHASE_WEIGHT = {'K': 0, 'Q': 4, 'R': 2, 'B': 1, 'N': 1, 'P': 0}
+MAX_PHASE = 24
+
+PAWN_MG = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+     5,  5, 10, 25, 25, 10,  5,  5,
+     0,  0,  0, 20, 20,  0,  0,  0,
+     5, -5,-10,  0,  0,-10, -5,  5,
+     5, 10, 10,-20,-20, 10, 10,  5,
+     0,  0,  0,  0,  0,  0,  0,  0,
+]
+
+PAWN_EG = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+     5,  5,  5,  5,  5,  5,  5,  5,
+     0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,
+]
+
+KNIGHT = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50,
+]
+
+BISHOP = [
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10, 10, 10, 10, 10, 10, 10,-10,
+    -10,  5,  0,  0,  0,  0,  5,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20,
+]
+
+ROOK = [
+      0,  0,  0,  0,  0,  0,  0,  0,
+      5, 10, 10, 10, 10, 10, 10,  5,
+     -5,  0,  0,  0,  0,  0,  0, -5,
+     -5,  0,  0,  0,  0,  0,  0, -5,
+     -5,  0,  0,  0,  0,  0,  0, -5,
+     -5,  0,  0,  0,  0,  0,  0, -5,
+     -5,  0,  0,  0,  0,  0,  0, -5,
+      0,  0,  0,  5,  5,  0,  0,  0,
+]
+
+QUEEN = [
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+     -5,  0,  5,  5,  5,  5,  0, -5,
+      0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20,
+]
+
+KING_MG = [
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+     20, 20,  0,  0,  0,  0, 20, 20,
+     20, 30, 10,  0,  0, 10, 30, 20,
+]
+
+KING_EG = [
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50,
+]
+
+PIECE_SQUARE_MG = {'P': PAWN_MG, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING_MG}
+PIECE_SQUARE_EG = {'P': PAWN_EG, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING_EG}
+
+
+def _colorTables(tables: dict) -> dict:
+    colorTables = {}
+    for pieceType, table in tables.items():
+        colorTables['w' + pieceType] = list(table)
+        colorTables['b' + pieceType] = [table[(7 - square // 8) * 8 + square % 8] for square in range(64)]
+    return colorTables
+
+
+# piece-square values indexed by the full piece string and square = row*8 + col, ex. MG_TABLES['bN'][square]
+MG_TABLES = _colorTables(PIECE_SQUARE_MG)
+EG_TABLES = _colorTables(PIECE_SQUARE_EG)
+
+
+'''
+Blends a middlegame and an endgame score by the game phase.
+'''
+def taper(mgScore: int, egScore: int, phase: int) -> int:
+    if phase > MAX_PHASE:
+        phase = MAX_PHASE
+    return (mgScore * phase + egScore * (MAX_PHASE - phase)) // MAX_PHASE
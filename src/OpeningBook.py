@@ -0,0 +1,197 @@
+'''
+Opening book the ChessBot plays from before it searches.
+
+The book is a binary file of 16 byte entries sorted by position key, in the same layout as a Polyglot book:
+    key     8 bytes  Zobrist key of the position (GameState.zobristKey)
+    move    2 bytes  move id of the book move (Move.moveID)
+    weight  2 bytes  how often the move is played, moves are picked with this probability
+    learn   4 bytes  unused, always 0
+The keys are this engine's Zobrist keys, not Polyglot's, so a book has to be rebuilt if Zobrist.SEED changes.
+
+The file is memory mapped and searched with a binary search, so a lookup only touches the pages it reads.
+
+Build a book from a PGN file or a file with one game per line, in coordinate (e2e4) or SAN (e4, Nf3) moves:
+    python OpeningBook.py <games file> <book file> [max ply]
+'''
+
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+from Engine import GameState, Move
+
+
+ENTRY = struct.Struct('>QHHI')
+ENTRY_SIZE = ENTRY.size
+KEY = struct.Struct('>Q')
+
+# number of half moves of each game that go into the book
+BOOK_PLY = 16
+
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY_SIZE != 0:
+            self.file.close()
+            raise ValueError(f"{path} is not an opening book, its size is not a multiple of {ENTRY_SIZE} bytes")
+        
+        self.numEntries = size // ENTRY_SIZE
+        # an empty file can not be mapped
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        
+    '''
+    Gets the book moves of a position key as a list of (move id, weight), in the order they are stored.
+    '''
+    def probe(self, key: int) -> list[tuple[int, int]]:
+        bookMap = self.map
+        low = 0
+        high = self.numEntries
+        
+        # first entry with a key >= the key
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(bookMap, middle * ENTRY_SIZE)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+                
+        moves = []
+        for index in range(low, self.numEntries):
+            entryKey, moveID, weight, learn = ENTRY.unpack_from(bookMap, index * ENTRY_SIZE)
+            if entryKey != key:
+                break
+            moves.append((moveID, weight))
+        return moves
+    
+    '''
+    Picks a book move for the position out of valid_moves, with the probability of its weight,
+    or the heaviest one if randomize is False. Returns None if the position is not in the book.
+    '''
+    def getMove(self, gameState: GameState, valid_moves: list[Move], randomize: bool = True) -> Move:
+        legalMoves = {move.moveID: move for move in valid_moves}
+        candidates = [(legalMoves[moveID], weight) for moveID, weight in self.probe(gameState.zobristKey)
+                      if moveID in legalMoves and weight > 0]
+        if not candidates:
+            return None
+        
+        if not randomize:
+            return max(candidates, key=lambda candidate: candidate[1])[0]
+        return random.choices([move for move, weight in candidates], weights=[weight for move, weight in candidates])[0]
+    
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+
+'''
+Finds the move written in coordinate notation (e2e4, e7e8q) or SAN (e4, Nxf3, O-O, e8=Q+) among valid_moves.
+Returns None if no move, or more than one, matches.
+'''
+def parseMove(text: str, valid_moves: list[Move]) -> Move:
+    for move in valid_moves:
+        if str(move) == text:
+            return move
+        
+    san = text.rstrip('+#!?')
+    if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        kingSide = len(san) == 3
+        for move in valid_moves:
+            if move.castling and (move.toCol > move.fromCol) == kingSide:
+                return move
+        return None
+    
+    match = re.fullmatch(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])=?([NBRQ])?', san)
+    if match is None:
+        return None
+    pieceType, fromFile, fromRank, toSquare, promotionPiece = match.groups()
+    pieceType = pieceType or 'P'
+    toCol = Move.CONV_FILES_TO_COLS[toSquare[0]]
+    toRow = Move.CONV_RANK_TO_ROWS[toSquare[1]]
+    
+    candidates = []
+    for move in valid_moves:
+        if move.pieceMoved[1] != pieceType or move.toRow != toRow or move.toCol != toCol or move.castling:
+            continue
+        if fromFile is not None and move.fromCol != Move.CONV_FILES_TO_COLS[fromFile]:
+            continue
+        if fromRank is not None and move.fromRow != Move.CONV_RANK_TO_ROWS[fromRank]:
+            continue
+        if move.pawnPromotionMove and move.promotionPiece != (promotionPiece or 'Q'):
+            continue
+        candidates.append(move)
+        
+    return candidates[0] if len(candidates) == 1 else None
+
+
+'''
+Reads the games of a PGN file, or of a file with one game per line, as lists of move strings.
+Tags, comments, variations, move numbers, annotations and results are dropped.
+'''
+def readGames(path: str) -> list[list[str]]:
+    with open(path) as gamesFile:
+        text = gamesFile.read()
+        
+    if path.lower().endswith('.pgn') or re.search(r'^\s*\[\w+ ', text, re.MULTILINE):
+        # a game's moves start after its tags, so the tag blocks split the file into games
+        text = re.sub(r'\{[^}]*\}|;[^\n]*', ' ', text)
+        while re.search(r'\([^()]*\)', text):
+            text = re.sub(r'\([^()]*\)', ' ', text)
+        games = re.split(r'(?:^\s*\[[^\]]*\]\s*$\n?)+', text, flags=re.MULTILINE)
+    else:
+        games = text.splitlines()
+        
+    gameMoves = []
+    for game in games:
+        moves = []
+        for token in game.split():
+            token = re.sub(r'^\d+\.+', '', token)
+            if not token or token.startswith('$') or token in ('1-0', '0-1', '1/2-1/2', '*'):
+                continue
+            moves.append(token)
+        if moves:
+            gameMoves.append(moves)
+    return gameMoves
+
+
+'''
+Writes a book of the first maxPly half moves of every game, each move weighted by how many games played it.
+A game stops going into the book at its first move that can not be read.
+Returns the number of entries written.
+'''
+def buildBook(games: list[list[str]], path: str, maxPly: int = BOOK_PLY) -> int:
+    counts = {}
+    
+    for gameNumber, moves in enumerate(games, 1):
+        gameState = GameState(backend='bitboard')
+        for text in moves[:maxPly]:
+            move = parseMove(text, gameState.getValidMoves())
+            if move is None:
+                print(f"game {gameNumber}: skipping the rest of the game at '{text}'")
+                break
+            entry = (gameState.zobristKey, move.moveID)
+            counts[entry] = counts.get(entry, 0) + 1
+            gameState.move(move)
+    
+    # sorted by key, the most played move of a position first
+    entries = sorted(counts.items(), key=lambda item: (item[0][0], -item[1]))
+    with open(path, 'wb') as bookFile:
+        for (key, moveID), count in entries:
+            bookFile.write(ENTRY.pack(key, moveID, min(count, MAX_WEIGHT), 0))
+            
+    return len(entries)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python OpeningBook.py <games file> <book file> [max ply]")
+        sys.exit(1)
+        
+    numEntries = buildBook(readGames(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else BOOK_PLY)
+    print(f"wrote {numEntries} entries to {sys.argv[2]}")
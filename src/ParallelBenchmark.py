@@ -0,0 +1,62 @@
+'''
+Scaling report for the parallel search, ChessBot.parallelSearch.
+
+Every position is searched to a fixed depth with 1, 2, 4 and 8 workers. The report shows the time to reach
+the depth, the speedup over one worker, and the total nodes and nodes per second of all workers.
+Lazy SMP searches some nodes twice, so the speedup is smaller than the growth in nodes per second.
+Run from the src directory:
+    python ParallelBenchmark.py [depth]
+'''
+
+import sys
+import time
+from ChessAI import ChessBot
+from Engine import GameState
+from Perft import REFERENCE_POSITIONS
+
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+# middlegame positions, the endgame ones finish too quickly to show any scaling
+BENCHMARK_POSITIONS = ("start", "kiwipete", "position4", "position6")
+
+BENCHMARK_DEPTH = 4
+
+
+'''
+Searches every benchmark position with each worker count and prints one line per run and a summary per worker count.
+Returns a dict of worker count to (total seconds, total nodes).
+'''
+def scalingReport(depth: int = BENCHMARK_DEPTH, workerCounts: tuple = WORKER_COUNTS) -> dict:
+    totals = {}
+    
+    for numWorkers in workerCounts:
+        totalTime = 0.0
+        totalNodes = 0
+        
+        for name in BENCHMARK_POSITIONS:
+            gameState = GameState.fromFEN(REFERENCE_POSITIONS[name][0], 'bitboard')
+            valid_moves = gameState.getValidMoves()
+            
+            start = time.perf_counter()
+            bestMove, completedDepth, nodes = ChessBot.parallelSearch(gameState, valid_moves, numWorkers, maxDepth=depth)
+            elapsed = time.perf_counter() - start
+            
+            totalTime += elapsed
+            totalNodes += nodes
+            print(f"{numWorkers} workers {name}: {bestMove} at depth {completedDepth}, {elapsed:.2f}s, {nodes} nodes")
+            
+        totals[numWorkers] = (totalTime, totalNodes)
+        
+    print()
+    baseTime = totals[workerCounts[0]][0]
+    for numWorkers, (totalTime, totalNodes) in totals.items():
+        speedup = baseTime / totalTime if totalTime > 0 else 0.0
+        nps = int(totalNodes / totalTime) if totalTime > 0 else 0
+        print(f"{numWorkers} workers: {totalTime:.2f}s, speedup {speedup:.2f}, {totalNodes} nodes, {nps} nodes/s")
+        
+    return totals
+
+
+if __name__ == "__main__":
+    scalingReport(int(sys.argv[1]) if len(sys.argv) > 1 else BENCHMARK_DEPTH)
@@ -0,0 +1,144 @@
+'''
+Perft: counts the leaf nodes of the legal move tree to a fixed depth.
+
+The counts are compared against known reference counts to check the move generator, including
+castling, en passant and promotions, and the time taken gives the move generator's nodes per second.
+Run from the src directory:
+    python Perft.py                      runs the reference suite on both GameState backends
+    python Perft.py divide <depth> [fen] prints the node count under each root move
+    python Perft.py bench [depth]        compares the nodes per second of the two backends
+'''
+
+import sys
+import time
+from Engine import GameState
+
+
+# reference positions and their node counts for depth 1, 2, 3...
+# from https://www.chessprogramming.org/Perft_Results
+REFERENCE_POSITIONS = {
+    "start": (GameState.STARTING_FEN,
+              [20, 400, 8902, 197281, 4865609]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603]),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  [14, 191, 2812, 43238, 674624]),
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  [6, 264, 9467, 422333]),
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  [44, 1486, 62379, 2103487]),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  [46, 2079, 89890, 3894594]),
+}
+
+# depth each reference position is searched to by runSuite
+SUITE_DEPTH = 3
+
+# times benchmark repeats the suite, the fastest round counts
+BENCH_ROUNDS = 3
+
+
+'''
+Counts the leaf nodes of the legal move tree to the given depth.
+'''
+def perft(gameState: GameState, depth: int) -> int:
+    moves = gameState.getValidMoves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        gameState.move(move)
+        nodes += perft(gameState, depth - 1)
+        gameState.undoMove()
+    return nodes
+
+
+'''
+Counts the leaf nodes under each root move, to find which move a wrong count comes from.
+Returns a dict of move notation to node count.
+'''
+def divide(gameState: GameState, depth: int) -> dict:
+    counts = {}
+    for move in gameState.getValidMoves():
+        gameState.move(move)
+        counts[str(move)] = perft(gameState, depth - 1)
+        gameState.undoMove()
+    return counts
+
+
+'''
+Runs perft on every reference position and prints the count, whether it matches and the nodes per second.
+Returns True if every count matched.
+'''
+def runSuite(backend: str = 'mailbox', maxDepth: int = SUITE_DEPTH) -> bool:
+    allPassed = True
+    totalNodes = 0
+    totalTime = 0.0
+
+    for name, (fen, expectedCounts) in REFERENCE_POSITIONS.items():
+        gameState = GameState.fromFEN(fen, backend)
+        for depth in range(1, min(maxDepth, len(expectedCounts)) + 1):
+            start = time.perf_counter()
+            nodes = perft(gameState, depth)
+            elapsed = time.perf_counter() - start
+
+            totalNodes += nodes
+            totalTime += elapsed
+            passed = nodes == expectedCounts[depth - 1]
+            allPassed = allPassed and passed
+
+            nps = int(nodes / elapsed) if elapsed > 0 else 0
+            result = "ok" if passed else "FAILED, expected " + str(expectedCounts[depth - 1])
+            print(f"{backend} {name} depth {depth}: {nodes} nodes, {nps} nodes/s, {result}")
+
+    if totalTime > 0:
+        print(f"{backend}: {totalNodes} nodes in {totalTime:.2f}s, {int(totalNodes / totalTime)} nodes/s")
+    return allPassed
+
+
+'''
+Times perft over every reference position on each backend, keeping the fastest of BENCH_ROUNDS rounds,
+and prints the nodes per second of each backend and how much faster the bitboard backend is.
+Returns the nodes per second of each backend.
+'''
+def benchmark(depth: int = SUITE_DEPTH, rounds: int = BENCH_ROUNDS) -> dict:
+    results = {}
+    for backend in ('mailbox', 'bitboard'):
+        bestTime = None
+        for _ in range(rounds):
+            nodes = 0
+            start = time.perf_counter()
+            for fen, expectedCounts in REFERENCE_POSITIONS.values():
+                nodes += perft(GameState.fromFEN(fen, backend), min(depth, len(expectedCounts)))
+            elapsed = time.perf_counter() - start
+            bestTime = elapsed if bestTime is None else min(bestTime, elapsed)
+        results[backend] = int(nodes / bestTime)
+        print(f"{backend}: {nodes} nodes in {bestTime:.2f}s, {results[backend]} nodes/s")
+
+    print(f"bitboard is {results['bitboard'] / results['mailbox']:.2f}x as fast as mailbox")
+    return results
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "divide":
+        depth = int(sys.argv[2])
+        fen = " ".join(sys.argv[3:]) if len(sys.argv) > 3 else GameState.STARTING_FEN
+        counts = divide(GameState.fromFEN(fen, 'bitboard'), depth)
+        for move, nodes in counts.items():
+            print(f"{move}: {nodes}")
+        print(f"total: {sum(counts.values())}")
+        return
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else SUITE_DEPTH)
+        return
+
+    passed = True
+    for backend in ('mailbox', 'bitboard'):
+        passed = runSuite(backend) and passed
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+'''
+Telemetry of one ChessBot search: nodes, quiescence nodes, beta cutoffs, transposition table use and the
+time and node count of every iteration.
+
+Pass a SearchStats to ChessBot.iterativeDeepening to fill it. Without one the search only keeps the counters it
+needs anyway, the extra counting happens behind a single check of ChessBot.stats at quiescence nodes and cutoffs.
+With a logStream every finished iteration and the finished search are also written to it as one JSON object per line.
+'''
+
+import json
+
+
+class SearchStats:
+    def __init__(self, logStream=None):
+        self.logStream = logStream
+
+        self.nodes = 0
+        self.quiescenceNodes = 0
+        self.betaCutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.tableProbes = 0
+        self.tableHits = 0
+        self.tablebaseHits = 0
+        self.drawCutoffs = 0
+        
+        # what the selective search pruned, see ChessBot.getNegaMaxAlphaBeta
+        self.nullMoveCutoffs = 0
+        self.lateMoveReductions = 0
+        self.lateMoveResearches = 0
+        self.futilityPrunes = 0
+        self.razorCutoffs = 0
+        
+        self.seconds = 0.0
+        self.depth = 0
+        self.score = 0
+        self.bestMove = None
+
+        # one dict per completed iteration: depth, score, best move, nodes and seconds
+        self.iterations = []
+
+    '''
+    Fraction of beta cutoffs caused by the first move searched, how often the move ordering got it right.
+    '''
+    def firstMoveCutoffRate(self) -> float:
+        return self.firstMoveCutoffs / self.betaCutoffs if self.betaCutoffs else 0.0
+
+    def tableHitRate(self) -> float:
+        return self.tableHits / self.tableProbes if self.tableProbes else 0.0
+
+    def nodesPerSecond(self) -> int:
+        return int(self.nodes / self.seconds) if self.seconds > 0 else 0
+
+    '''
+    Records a completed iteration, nodes and seconds are the ones spent on this iteration alone.
+    '''
+    def addIteration(self, depth: int, score: int, bestMove, nodes: int, seconds: float) -> None:
+        iteration = {
+            "depth": depth,
+            "score": score,
+            "move": str(bestMove),
+            "nodes": nodes,
+            "seconds": round(seconds, 6),
+            "nps": int(nodes / seconds) if seconds > 0 else 0
+        }
+        self.iterations.append(iteration)
+        self.depth = depth
+        self.score = score
+        self.bestMove = bestMove
+        self.log("iteration", iteration)
+
+    '''
+    Records the totals of the finished search.
+    '''
+    def finish(self, bestMove, nodes: int, seconds: float, tableProbes: int, tableHits: int) -> None:
+        self.bestMove = bestMove
+        self.nodes = nodes
+        self.seconds = seconds
+        self.tableProbes = tableProbes
+        self.tableHits = tableHits
+        self.log("search", self.toDict())
+
+    def log(self, event: str, fields: dict) -> None:
+        if self.logStream is not None:
+            self.logStream.write(json.dumps(dict(event=event, **fields)) + "\n")
+            self.logStream.flush()
+
+    '''
+    The totals as a dict of plain values, so they can be sent to another process or logged.
+    '''
+    def toDict(self) -> dict:
+        return {
+            "move": str(self.bestMove),
+            "depth": self.depth,
+            "score": self.score,
+            "nodes": self.nodes,
+            "quiescenceNodes": self.quiescenceNodes,
+            "betaCutoffs": self.betaCutoffs,
+            "firstMoveCutoffRate": round(self.firstMoveCutoffRate(), 4),
+            "tableProbes": self.tableProbes,
+            "tableHits": self.tableHits,
+            "tableHitRate": round(self.tableHitRate(), 4),
+            "tablebaseHits": self.tablebaseHits,
+            "drawCutoffs": self.drawCutoffs,
+            "nullMoveCutoffs": self.nullMoveCutoffs,
+            "lateMoveReductions": self.lateMoveReductions,
+            "lateMoveResearches": self.lateMoveResearches,
+            "futilityPrunes": self.futilityPrunes,
+            "razorCutoffs": self.razorCutoffs,
+            "seconds": round(self.seconds, 6),
+            "nps": self.nodesPerSecond(),
+            "iterations": self.iterations
+        }
+
+    def __str__(self) -> str:
+        return formatStats(self.toDict())
+
+
+'''
+One line summary of the dict from SearchStats.toDict.
+'''
+def formatStats(stats: dict) -> str:
+    iterationTimes = ", ".join(f"{iteration['depth']}: {iteration['seconds']:.2f}s" for iteration in stats["iterations"])
+    return (f"{stats['move']} depth {stats['depth']} score {stats['score']}, {stats['nodes']} nodes "
+            f"({stats['quiescenceNodes']} quiescence) in {stats['seconds']:.2f}s, {stats['nps']} nodes/s, "
+            f"{stats['betaCutoffs']} cutoffs ({stats['firstMoveCutoffRate']:.1%} on the first move), "
+            f"table {stats['tableHits']}/{stats['tableProbes']} hits, {stats['nullMoveCutoffs']} null move cutoffs, "
+            f"{stats['lateMoveReductions']} reductions ({stats['lateMoveResearches']} searched again), "
+            f"{stats['futilityPrunes']} futile moves, {stats['razorCutoffs']} razored, iterations [{iterationTimes}]")
@@ -0,0 +1,291 @@
+'''
+A long-lived search process for the chess bot.
+
+The worker is started once and keeps its own GameState, which is kept in step with the game by sending it
+each move as a move id instead of pickling the whole GameState for every search. Since the process lives
+for the whole game, the ChessBot transposition table, killer moves and history stay warm between moves.
+
+Pondering: after the bot moved, the worker plays the reply it expects and keeps searching the position after it
+while the opponent thinks, with no time limit. If the opponent plays that move (a ponder hit) the running search
+gets its time limit from that moment on and its result is used. Otherwise the ponder search is stopped and the
+expected reply taken back, the transposition table keeps what the ponder search found.
+
+Messages sent to the worker over the pipe:
+    ('move', moveID)                                    plays a move
+    ('undo',)                                           takes back the last move
+    ('new', fen)                                        starts a new game from a FEN string, or the starting
+                                                        position if fen is None, and clears the search tables
+    ('search', searchId, timeLimit, nodeLimit, maxDepth, numWorkers)
+    ('ponder', searchId, ponderMoveID, timeLimit, nodeLimit, maxDepth)
+                                                        plays the expected reply and searches until stopped or
+                                                        until ponderHitId reaches searchId, then for timeLimit more
+    ('fen',)                                            answered with ('fen', fen) of the worker's position
+    ('quit',)
+The worker answers a search with ('bestmove', searchId, moveID, stats, ponderMoveID), moveID is NO_MOVE if there are
+no legal moves, stats is the SearchStats.toDict of the search, or None if the worker does not collect stats, and
+ponderMoveID is the reply the search expects to the move, or NO_MOVE if it has none.
+'''
+
+import time
+from multiprocessing import Process, Pipe, Value
+from Engine import GameState, Move
+from ChessAI import ChessBot
+from OpeningBook import OpeningBook
+from Tablebase import Tablebases
+from SearchStats import SearchStats
+from TranspositionTable import NO_MOVE
+
+
+'''
+Used as ChessBot.stopEvent in the worker, it is set once the client stopped the running search or a later one.
+The client only ever raises the stopped search id, so a stop can not be undone by starting the next search
+before the worker saw it.
+While pondering it also watches ponderHitId, the search is given its deadline once the ponder search was hit.
+'''
+class StopSignal:
+    def __init__(self, stoppedSearchId, ponderHitId):
+        self.stoppedSearchId = stoppedSearchId
+        self.ponderHitId = ponderHitId
+        self.searchId = 0
+        self.pondering = False
+        self.ponderTimeLimit = None
+        
+    def is_set(self) -> bool:
+        if self.pondering and self.ponderHitId.value >= self.searchId:
+            self.pondering = False
+            if self.ponderTimeLimit is not None:
+                ChessBot.deadline = time.perf_counter() + self.ponderTimeLimit
+        return self.stoppedSearchId.value >= self.searchId
+
+
+'''
+Main loop of the worker process, runs until it gets 'quit' or the other end of the pipe is closed.
+Searches play from the opening book at bookPath first, if one is given, and from the tablebases in
+tablebasePath once few enough pieces are left.
+With collectStats every search is sent back with its SearchStats, with statsLog they are also appended to that file as JSON lines.
+'''
+def runSearchWorker(connection, stoppedSearchId, ponderHitId, backend: str, bookPath: str, tablebasePath: str = None, collectStats: bool = False, statsLog: str = None) -> None:
+    gameState = GameState(backend=backend)
+    if bookPath is not None:
+        ChessBot.openingBook = OpeningBook(bookPath)
+    if tablebasePath is not None:
+        ChessBot.tablebases = Tablebases(tablebasePath)
+    logStream = open(statsLog, 'a') if statsLog is not None else None
+    stopSignal = StopSignal(stoppedSearchId, ponderHitId)
+    ChessBot.stopEvent = stopSignal
+    
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        
+        command = message[0]
+        if command == 'move':
+            playMove(gameState, message[1])
+                
+        elif command == 'undo':
+            gameState.undoMove()
+            
+        elif command == 'new':
+            gameState = GameState(backend=backend, fen=message[1])
+            ChessBot.transpositionTable.clear()
+            
+        elif command == 'fen':
+            connection.send(('fen', gameState.toFEN()))
+            
+        elif command == 'search' or command == 'ponder':
+            if command == 'search':
+                searchId, timeLimit, nodeLimit, maxDepth, numWorkers = message[1:]
+                stopSignal.pondering = False
+            else:
+                # the ponder search runs in this process so a ponder hit can reach its deadline
+                searchId, ponderMoveID, ponderTimeLimit, nodeLimit, maxDepth = message[1:]
+                playMove(gameState, ponderMoveID)
+                stopSignal.pondering = True
+                stopSignal.ponderTimeLimit = ponderTimeLimit
+                timeLimit = None
+                numWorkers = 1
+                maxDepth = ChessBot.searchDepth(maxDepth, ponderTimeLimit, nodeLimit)
+            stopSignal.searchId = searchId
+            valid_moves = gameState.getValidMoves()
+            
+            bestMove = None
+            if valid_moves:
+                bestMove = ChessBot.getBookMove(gameState, valid_moves)
+                if bestMove is not None:
+                    print(f"book move: {bestMove}")
+                else:
+                    bestMove = ChessBot.getTablebaseMove(gameState, valid_moves)
+                    if bestMove is not None:
+                        print(f"tablebase move: {bestMove}")
+            
+            # the parallel search runs in other processes and is not measured
+            stats = None
+            if bestMove is None and len(valid_moves) > 0:
+                if numWorkers > 1:
+                    bestMove = ChessBot.parallelSearch(gameState, valid_moves, numWorkers, timeLimit, nodeLimit, maxDepth)[0]
+                else:
+                    maxDepth = ChessBot.searchDepth(maxDepth, timeLimit, nodeLimit)
+                    stats = SearchStats(logStream) if collectStats or logStream is not None else None
+                    bestMove = ChessBot.iterativeDeepening(gameState, valid_moves, maxDepth, timeLimit, nodeLimit, stats=stats)
+                
+            ponderMove = ChessBot.getPonderMove(gameState, bestMove) if bestMove is not None else None
+            connection.send(('bestmove', searchId, bestMove.moveID if bestMove is not None else NO_MOVE,
+                             stats.toDict() if stats is not None else None,
+                             ponderMove.moveID if ponderMove is not None else NO_MOVE))
+            
+        elif command == 'quit':
+            break
+        
+    connection.close()
+    if ChessBot.openingBook is not None:
+        ChessBot.openingBook.close()
+    if logStream is not None:
+        logStream.close()
+
+
+'''
+Plays the move with the given id in the worker's position.
+'''
+def playMove(gameState: GameState, moveID: int) -> None:
+    for move in gameState.getValidMoves():
+        if move.moveID == moveID:
+            gameState.move(move)
+            return
+    print(f"search worker: move {moveID} is not legal in its position")
+
+
+class SearchWorker:
+    def __init__(self, backend: str = 'bitboard', bookPath: str = None, tablebasePath: str = None, collectStats: bool = False, statsLog: str = None):
+        self.connection, workerConnection = Pipe()
+        self.stoppedSearchId = Value('i', 0)
+        self.ponderHitId = Value('i', 0)
+        self.process = Process(target=runSearchWorker, args=(workerConnection, self.stoppedSearchId, self.ponderHitId, backend, bookPath, tablebasePath, collectStats, statsLog))
+        self.process.start()
+        workerConnection.close()
+        
+        # only the answer to the latest search is used, answers to stopped searches are dropped
+        self.searchId = 0
+        self.searching = False
+        self.result = None
+        
+        # SearchStats.toDict of the last search getBestMove returned, None if the worker does not collect stats
+        self.stats = None
+        self.resultStats = None
+        
+        # the reply the last search expects, and the move the running ponder search assumed was played
+        self.expectedReply = NO_MOVE
+        self.resultReply = NO_MOVE
+        self.ponderMove = None
+    
+    '''
+    Plays a move in the worker's position, call it for every move made in the game.
+    If the worker is pondering on this move the ponder search becomes the search for the bot's move,
+    poll and getBestMove give its result. Any other move stops the ponder search.
+    '''
+    def pushMove(self, move: Move) -> None:
+        if self.ponderMove is not None and move.moveID == self.ponderMove:
+            self.ponderMove = None
+            self.ponderHitId.value = self.searchId
+            return
+        self.stop()
+        self.connection.send(('move', move.moveID))
+        
+    '''
+    Takes back the last move in the worker's position, a running search is stopped first.
+    '''
+    def undoMove(self) -> None:
+        self.stop()
+        self.connection.send(('undo',))
+        
+    '''
+    Starts a new game in the worker, from the position of a FEN string if one is given.
+    '''
+    def newGame(self, fen: str = None) -> None:
+        self.stop()
+        self.connection.send(('new', fen))
+    
+    '''
+    Starts a search of the worker's position, use poll and getBestMove to get the result.
+    '''
+    def startSearch(self, timeLimit: float = None, nodeLimit: int = None, maxDepth: int = None, numWorkers: int = 1) -> None:
+        self.searchId += 1
+        self.searching = True
+        self.result = None
+        self.connection.send(('search', self.searchId, timeLimit, nodeLimit, maxDepth, numWorkers))
+        
+    '''
+    Starts pondering on the reply the last search expects, call it after the bot's move was pushed.
+    The limits apply from the ponder hit on. Returns False if the search did not expect a reply.
+    '''
+    def startPonder(self, timeLimit: float = None, nodeLimit: int = None, maxDepth: int = None) -> bool:
+        if self.expectedReply == NO_MOVE:
+            return False
+        self.searchId += 1
+        self.searching = True
+        self.result = None
+        self.ponderMove = self.expectedReply
+        self.expectedReply = NO_MOVE
+        self.connection.send(('ponder', self.searchId, self.ponderMove, timeLimit, nodeLimit, maxDepth))
+        return True
+        
+    '''
+    Stops the running search, its answer is dropped. A ponder search also takes back the reply it assumed.
+    '''
+    def stop(self) -> None:
+        if self.searching:
+            self.stoppedSearchId.value = self.searchId
+            self.searching = False
+            self.result = None
+        if self.ponderMove is not None:
+            self.ponderMove = None
+            self.connection.send(('undo',))
+        
+    '''
+    Returns True once the answer to the running search has arrived, without blocking.
+    A ponder search only counts once the opponent played the move it was pondering on.
+    '''
+    def poll(self) -> bool:
+        while self.result is None and self.connection.poll():
+            reply, searchId, moveID, stats, expectedReply = self.connection.recv()
+            if self.searching and searchId == self.searchId:
+                self.result = moveID
+                self.resultStats = stats
+                self.resultReply = expectedReply
+        return self.result is not None and self.ponderMove is None
+    
+    '''
+    Returns the move out of valid_moves that the finished search picked, or None if it found no legal move.
+    '''
+    def getBestMove(self, valid_moves: list[Move]) -> Move:
+        moveID = self.result
+        self.result = None
+        self.stats = self.resultStats
+        self.expectedReply = self.resultReply
+        self.searching = False
+        for move in valid_moves:
+            if move.moveID == moveID:
+                return move
+        return None
+    
+    '''
+    Gets the FEN string of the worker's position, to check it still follows the game.
+    A running search is stopped first and its answer dropped.
+    '''
+    def getFEN(self) -> str:
+        self.stop()
+        self.connection.send(('fen',))
+        while True:
+            reply = self.connection.recv()
+            if reply[0] == 'fen':
+                return reply[1]
+        
+    def close(self) -> None:
+        self.stop()
+        try:
+            self.connection.send(('quit',))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join()
+        self.connection.close()
@@ -0,0 +1,637 @@
+'''
+Endgame tablebases for positions with a few pieces, generated locally by retrograde analysis.
+
+Every table holds one material set, ex. KQvKR is white king and queen against black king and rook.
+For each position of the table it stores one byte:
+    0           draw (or no forced result)
+    1 to 254    distance to mate + 1, in plies. An odd distance is a win for the side to move,
+                an even distance a loss, 0 plies means the side to move is checkmated
+    255         not a position, ex. two pieces on one square or the side not to move in check
+Castling and en passant are not part of the tables, positions where they are possible are not probed.
+
+Positions are indexed by the placement of the two kings, reduced by the symmetries of the board
+(all 8 without pawns, only the left-right mirror with pawns), then the square of every other piece.
+Each position has a single index, the smallest one over its symmetric copies and over the orders
+of identical pieces, the other indexes are stored as 255.
+
+Tables are generated from the mates backwards, one ply of distance at a time. Captures and promotions
+leave the table and are scored from the smaller tables, so those are generated first. Independent tables
+are generated in parallel, one process each.
+
+Generate the tables into a directory:
+    python Tablebase.py [max pieces] [directory] [processes]    every table with up to max pieces (default 3)
+    python Tablebase.py KQvK KRvK ... [directory]                the given tables and the ones they need
+'''
+
+import mmap
+import os
+import struct
+import sys
+from multiprocessing import Pool, cpu_count
+import Bitboard
+
+
+DRAW = 0
+INVALID = 255
+
+MAGIC = b'CTB1'
+HEADER = struct.Struct('<4sI8x')
+
+TABLEBASE_DIRECTORY = "tablebases"
+
+PIECE_ORDER = 'QRBNP'
+PIECE_STRENGTH = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+PROMOTION_PIECES = ('Q', 'R', 'B', 'N')
+
+
+def _symmetries() -> list[list[int]]:
+    tables = []
+    for transpose in (False, True):
+        for flipRow in (False, True):
+            for flipCol in (False, True):
+                table = []
+                for square in range(64):
+                    row, col = divmod(square, 8)
+                    if transpose:
+                        row, col = col, row
+                    if flipRow:
+                        row = 7 - row
+                    if flipCol:
+                        col = 7 - col
+                    table.append(row * 8 + col)
+                tables.append(table)
+    return tables
+
+
+# SYMMETRIES[0] is the identity and SYMMETRIES[1] the left-right mirror, the only ones kept with pawns on the board
+SYMMETRIES = _symmetries()
+
+
+def _kingPairs(hasPawns: bool) -> tuple:
+    # the white king is kept in the a1-d1-d4 triangle without pawns, or on files a-d with pawns.
+    # Without pawns a white king on the a1-h8 diagonal also keeps the black king on or below that diagonal
+    def canonical(whiteKing: int, blackKing: int) -> bool:
+        row, col = divmod(whiteKing, 8)
+        if hasPawns:
+            return col <= 3
+        rank = 7 - row
+        if col > 3 or rank > col:
+            return False
+        if rank == col:
+            blackRow, blackCol = divmod(blackKing, 8)
+            return 7 - blackRow <= blackCol
+        return True
+
+    pairIndex = [-1] * 4096
+    pairs = []
+    for whiteKing in range(64):
+        for blackKing in range(64):
+            if whiteKing == blackKing or Bitboard.KING_ATTACKS[whiteKing] >> blackKing & 1:
+                continue
+            if canonical(whiteKing, blackKing):
+                pairIndex[whiteKing * 64 + blackKing] = len(pairs)
+                pairs.append((whiteKing, blackKing))
+
+    symmetries = SYMMETRIES[:2] if hasPawns else SYMMETRIES
+    pairSymmetries = []
+    for whiteKing in range(64):
+        for blackKing in range(64):
+            pairSymmetries.append([table for table in symmetries if pairIndex[table[whiteKing] * 64 + table[blackKing]] >= 0])
+
+    return pairIndex, pairs, pairSymmetries
+
+
+PAWNLESS_KINGS = _kingPairs(False)
+PAWN_KINGS = _kingPairs(True)
+
+
+'''
+Splits the white and black pieces of a material set, ex. 'KQvKR' -> ('KQ', 'KR').
+'''
+def splitMaterial(material: str) -> tuple[str, str]:
+    white, black = material.split('v')
+    return white, black
+
+
+def sideStrength(side: str) -> tuple:
+    return (len(side), sum(PIECE_STRENGTH[piece] for piece in side), side)
+
+
+'''
+Gets the material set of a list of pieces, ex. ['wK', 'bK', 'wQ'] -> 'KQvK', with the pieces in table order.
+'''
+def materialOf(pieces: list[str]) -> str:
+    white = 'K' + ''.join(sorted((piece[1] for piece in pieces if piece[0] == 'w' and piece[1] != 'K'), key=PIECE_ORDER.index))
+    black = 'K' + ''.join(sorted((piece[1] for piece in pieces if piece[0] == 'b' and piece[1] != 'K'), key=PIECE_ORDER.index))
+    return white + 'v' + black
+
+
+'''
+Returns True if the material set is stored as it is, False if it is stored with the colors swapped.
+'''
+def isCanonical(material: str) -> bool:
+    white, black = splitMaterial(material)
+    return sideStrength(white) >= sideStrength(black)
+
+
+def canonicalMaterial(material: str) -> str:
+    if isCanonical(material):
+        return material
+    white, black = splitMaterial(material)
+    return black + 'v' + white
+
+
+'''
+Gets the tables a table needs, the ones reached by a capture or a promotion, not including bare kings.
+'''
+def childMaterials(material: str) -> set[str]:
+    white, black = splitMaterial(material)
+    children = set()
+    for side, other, isWhite in ((white, black, True), (black, white, False)):
+        for i in range(1, len(side)):
+            reduced = side[:i] + side[i + 1:]
+            children.add(reduced + 'v' + other if isWhite else other + 'v' + reduced)
+            if side[i] == 'P':
+                for promotion in PROMOTION_PIECES:
+                    promoted = 'K' + ''.join(sorted(reduced[1:] + promotion, key=PIECE_ORDER.index))
+                    children.add(promoted + 'v' + other if isWhite else other + 'v' + promoted)
+    return {canonicalMaterial(child) for child in children if child != 'KvK'}
+
+
+'''
+Index layout of one material set.
+'''
+class Table:
+    def __init__(self, material: str):
+        white, black = splitMaterial(material)
+        self.material = material
+        self.pieces = ['wK', 'bK'] + ['w' + piece for piece in white[1:]] + ['b' + piece for piece in black[1:]]
+        self.numPieces = len(self.pieces)
+        self.hasPawns = 'P' in material
+        self.pairIndex, self.pairs, self.pairSymmetries = PAWN_KINGS if self.hasPawns else PAWNLESS_KINGS
+        self.size = len(self.pairs) * 64 ** (self.numPieces - 2) * 2
+
+        # runs of identical pieces, their squares are sorted so a position has one index
+        self.groups = []
+        start = 2
+        for end in range(3, self.numPieces + 1):
+            if end == self.numPieces or self.pieces[end] != self.pieces[start]:
+                if end - start > 1:
+                    self.groups.append((start, end))
+                start = end
+
+    '''
+    Gets the index of a position given the square of each piece in table order, or -1 if the kings touch.
+    '''
+    def index(self, squares: list[int], whiteToMove: bool) -> int:
+        best = -1
+        for table in self.pairSymmetries[squares[0] * 64 + squares[1]]:
+            mapped = [table[square] for square in squares]
+            for start, end in self.groups:
+                mapped[start:end] = sorted(mapped[start:end])
+            index = self.pairIndex[mapped[0] * 64 + mapped[1]]
+            for square in mapped[2:]:
+                index = index * 64 + square
+            index = index * 2 + (0 if whiteToMove else 1)
+            if best < 0 or index < best:
+                best = index
+        return best
+
+    '''
+    Gets (squares, whiteToMove) of an index.
+    '''
+    def decode(self, index: int) -> tuple[list[int], bool]:
+        whiteToMove = index & 1 == 0
+        index >>= 1
+        squares = []
+        for i in range(self.numPieces - 2):
+            index, square = divmod(index, 64)
+            squares.append(square)
+        squares.reverse()
+        return list(self.pairs[index]) + squares, whiteToMove
+
+
+'''
+Probes the generated tables, each table file is memory mapped the first time it is needed.
+'''
+class Tablebases:
+    def __init__(self, directory: str = TABLEBASE_DIRECTORY):
+        self.directory = directory
+        self.tables = {}
+
+        # largest number of pieces of any table in the directory
+        self.maxPieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith('.tb'):
+                    self.maxPieces = max(self.maxPieces, len(name) - 4)
+
+    '''
+    Gets (Table, values) of a canonical material set, or None if its file does not exist.
+    '''
+    def getTable(self, material: str):
+        if material not in self.tables:
+            path = os.path.join(self.directory, material + '.tb')
+            if not os.path.exists(path):
+                self.tables[material] = None
+            else:
+                with open(path, 'rb') as tableFile:
+                    values = mmap.mmap(tableFile.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, size = HEADER.unpack_from(values, 0)
+                table = Table(material)
+                if magic != MAGIC or size != table.size:
+                    raise ValueError(path + " is not a " + material + " table")
+                self.tables[material] = (table, values)
+        return self.tables[material]
+
+    def close(self) -> None:
+        for entry in self.tables.values():
+            if entry is not None:
+                entry[1].close()
+        self.tables = {}
+
+    '''
+    Gets the stored byte of a position given as a list of (piece, square), from the side to move's point of view.
+    Returns None if the table is missing.
+    '''
+    def probePieces(self, pieces: list[tuple[str, int]], whiteToMove: bool) -> int:
+        material = materialOf([piece for piece, square in pieces])
+        if material == 'KvK':
+            return DRAW
+
+        if not isCanonical(material):
+            pieces = [(('b' if piece[0] == 'w' else 'w') + piece[1], square ^ 56) for piece, square in pieces]
+            whiteToMove = not whiteToMove
+            material = canonicalMaterial(material)
+
+        entry = self.getTable(material)
+        if entry is None:
+            return None
+        table, values = entry
+
+        # pieces into table order, kings first, then white and black by PIECE_ORDER
+        order = {piece: i for i, piece in reversed(list(enumerate(table.pieces)))}
+        squares = [0] * table.numPieces
+        used = [False] * table.numPieces
+        for piece, square in pieces:
+            slot = order[piece]
+            while used[slot]:
+                slot += 1
+            used[slot] = True
+            squares[slot] = square
+
+        index = table.index(squares, whiteToMove)
+        if index < 0:
+            return INVALID
+        return values[HEADER.size + index]
+
+    '''
+    Probes a GameState. Returns (result, plies to mate) from the side to move's point of view, result is
+    1 for a win, 0 for a draw and -1 for a loss, or None if the position is not covered by the tables.
+    '''
+    def probe(self, gameState) -> tuple[int, int]:
+        if gameState.countPieces() > max(self.maxPieces, 2):
+            return None
+        if gameState.castlingRights != 0 or gameState.enpassantLocation:
+            return None
+
+        pieces = []
+        for row in range(8):
+            for col in range(8):
+                piece = gameState.board[row][col]
+                if piece != '--':
+                    pieces.append((piece, row * 8 + col))
+
+        value = self.probePieces(pieces, gameState.whiteToMove)
+        if value is None or value == INVALID:
+            return None
+        if value == DRAW:
+            return 0, 0
+        plies = value - 1
+        return (1 if plies % 2 == 1 else -1), plies
+
+
+'''
+Generates the values of one table, the tables its captures and promotions lead to must be in tablebases.
+'''
+class TableGenerator(Table):
+    def __init__(self, material: str, tablebases: Tablebases):
+        super().__init__(material)
+        self.tablebases = tablebases
+        self.values = bytearray(self.size)
+
+    def attacks(self, piece: str, square: int, occupancy: int) -> int:
+        pieceType = piece[1]
+        if pieceType == 'K':
+            return Bitboard.KING_ATTACKS[square]
+        if pieceType == 'N':
+            return Bitboard.KNIGHT_ATTACKS[square]
+        if pieceType == 'B':
+            return Bitboard.bishopAttacks(square, occupancy)
+        if pieceType == 'R':
+            return Bitboard.rookAttacks(square, occupancy)
+        if pieceType == 'Q':
+            return Bitboard.queenAttacks(square, occupancy)
+        return Bitboard.PAWN_ATTACKS[0 if piece[0] == 'w' else 1][square]
+
+    def isAttacked(self, squares: list[int], target: int, byColor: str, occupancy: int) -> bool:
+        for piece, square in zip(self.pieces, squares):
+            if square >= 0 and piece[0] == byColor and self.attacks(piece, square, occupancy) >> target & 1:
+                return True
+        return False
+
+    '''
+    Returns True if the squares are a position, no two pieces share a square, no pawn is on the first
+    or last rank, the side not to move is not in check and the index is the position's own index.
+    '''
+    def isValid(self, index: int, squares: list[int], whiteToMove: bool) -> bool:
+        occupancy = 0
+        for piece, square in zip(self.pieces, squares):
+            bit = 1 << square
+            if occupancy & bit:
+                return False
+            if piece[1] == 'P' and (square < 8 or square >= 56):
+                return False
+            occupancy |= bit
+
+        waiting = 1 if whiteToMove else 0
+        if self.isAttacked(squares, squares[waiting], 'w' if whiteToMove else 'b', occupancy):
+            return False
+        return self.index(squares, whiteToMove) == index
+
+    '''
+    Yields (squares after the move, captured piece slot or -1, promotion piece or None) for every legal move.
+    '''
+    def legalMoves(self, squares: list[int], whiteToMove: bool):
+        color, enemy = ('w', 'b') if whiteToMove else ('b', 'w')
+        occupancy = 0
+        own = 0
+        slots = {}
+        for slot, (piece, square) in enumerate(zip(self.pieces, squares)):
+            occupancy |= 1 << square
+            slots[square] = slot
+            if piece[0] == color:
+                own |= 1 << square
+        king = 0 if whiteToMove else 1
+
+        for slot, piece in enumerate(self.pieces):
+            if piece[0] != color:
+                continue
+            fromSquare = squares[slot]
+
+            if piece[1] == 'P':
+                step = -8 if whiteToMove else 8
+                targets = Bitboard.PAWN_ATTACKS[0 if whiteToMove else 1][fromSquare] & occupancy & ~own
+                if not occupancy >> (fromSquare + step) & 1:
+                    targets |= 1 << (fromSquare + step)
+                    startRow = 6 if whiteToMove else 1
+                    if fromSquare >> 3 == startRow and not occupancy >> (fromSquare + 2 * step) & 1:
+                        targets |= 1 << (fromSquare + 2 * step)
+            else:
+                targets = self.attacks(piece, fromSquare, occupancy) & ~own
+
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                toSquare = bit.bit_length() - 1
+
+                captured = slots.get(toSquare, -1)
+                newSquares = squares[:]
+                newSquares[slot] = toSquare
+                if captured >= 0:
+                    newSquares[captured] = -1
+                newOccupancy = (occupancy ^ (1 << fromSquare)) | bit
+                if self.isAttacked(newSquares, newSquares[king], enemy, newOccupancy):
+                    continue
+
+                if piece[1] == 'P' and (toSquare < 8 or toSquare >= 56):
+                    for promotion in PROMOTION_PIECES:
+                        yield newSquares, captured, promotion
+                else:
+                    yield newSquares, captured, None
+
+    '''
+    Gets the stored byte of the position a capture or promotion leads to, from the mover's point of view.
+    '''
+    def exitValue(self, squares: list[int], moved: int, promotion: str, whiteToMove: bool) -> int:
+        pieces = []
+        for slot, (piece, square) in enumerate(zip(self.pieces, squares)):
+            if square < 0:
+                continue
+            if slot == moved and promotion is not None:
+                piece = piece[0] + promotion
+            pieces.append((piece, square))
+
+        value = self.tablebases.probePieces(pieces, not whiteToMove)
+        if value is None:
+            raise RuntimeError("Generating " + self.material + " needs the " + materialOf([piece for piece, square in pieces]) + " table")
+        if value == DRAW or value == INVALID:
+            return DRAW
+        # a loss for the opponent is a win one ply further away for the mover and the other way around
+        return value + 1
+
+    '''
+    Gets the indexes of the positions one move before a position, moves that capture or promote are
+    not included since they come from other tables.
+    '''
+    def predecessors(self, squares: list[int], whiteToMove: bool) -> list[int]:
+        mover = 'b' if whiteToMove else 'w'
+        occupancy = 0
+        for square in squares:
+            occupancy |= 1 << square
+        empty = ~occupancy & Bitboard.FULL_BOARD
+
+        indexes = []
+        for slot, piece in enumerate(self.pieces):
+            if piece[0] != mover:
+                continue
+            toSquare = squares[slot]
+
+            if piece[1] == 'P':
+                origins = 0
+                step = 8 if mover == 'w' else -8
+                fromSquare = toSquare + step
+                if 8 <= fromSquare < 56 and empty >> fromSquare & 1:
+                    origins |= 1 << fromSquare
+                    doubleRow = 4 if mover == 'w' else 3
+                    if toSquare >> 3 == doubleRow and empty >> (fromSquare + step) & 1:
+                        origins |= 1 << (fromSquare + step)
+            else:
+                origins = self.attacks(piece, toSquare, occupancy) & empty
+
+            while origins:
+                bit = origins & -origins
+                origins ^= bit
+                newSquares = squares[:]
+                newSquares[slot] = bit.bit_length() - 1
+                index = self.index(newSquares, mover == 'w')
+                if index >= 0 and self.values[index] != INVALID:
+                    indexes.append(index)
+        return indexes
+
+    '''
+    Returns True if every move of the position leads to a win for the opponent in at most plies - 1 plies.
+    '''
+    def isLoss(self, index: int, plies: int) -> bool:
+        squares, whiteToMove = self.decode(index)
+        values = self.values
+        for newSquares, captured, promotion in self.legalMoves(squares, whiteToMove):
+            if captured >= 0 or promotion is not None:
+                value = self.exitValue(newSquares, self.movedSlot(squares, newSquares), promotion, whiteToMove)
+                # the mover's value, a loss has an even distance
+                if value == DRAW or (value - 1) % 2 == 1 or value - 1 > plies:
+                    return False
+            else:
+                value = values[self.index(newSquares, not whiteToMove)]
+                if value == DRAW or value == INVALID or (value - 1) % 2 == 0 or value - 1 > plies - 1:
+                    return False
+        return True
+
+    def movedSlot(self, squares: list[int], newSquares: list[int]) -> int:
+        for slot in range(self.numPieces):
+            if newSquares[slot] >= 0 and newSquares[slot] != squares[slot]:
+                return slot
+        return -1
+
+    '''
+    Fills in the values, returns the number of positions that are not draws.
+    '''
+    def generate(self) -> int:
+        values = self.values
+        pending = {}
+        mates = []
+
+        for index in range(self.size):
+            squares, whiteToMove = self.decode(index)
+            if not self.isValid(index, squares, whiteToMove):
+                values[index] = INVALID
+                continue
+
+            numMoves = 0
+            numExits = 0
+            bestWin = None
+            worstLoss = 0
+            exitDraw = False
+            for newSquares, captured, promotion in self.legalMoves(squares, whiteToMove):
+                numMoves += 1
+                if captured < 0 and promotion is None:
+                    continue
+                numExits += 1
+                value = self.exitValue(newSquares, self.movedSlot(squares, newSquares), promotion, whiteToMove)
+                if value == DRAW:
+                    exitDraw = True
+                elif (value - 1) % 2 == 1:
+                    bestWin = value - 1 if bestWin is None else min(bestWin, value - 1)
+                else:
+                    worstLoss = max(worstLoss, value - 1)
+
+            if numMoves == 0:
+                king = 0 if whiteToMove else 1
+                occupancy = sum(1 << square for square in squares)
+                if self.isAttacked(squares, squares[king], 'b' if whiteToMove else 'w', occupancy):
+                    values[index] = 1
+                    mates.append(index)
+                continue
+
+            # captures and promotions that win, or that are all lost, decide the position at their distance
+            # unless a move inside the table does better first
+            if bestWin is not None:
+                pending.setdefault(bestWin, []).append(index)
+            elif numExits and not exitDraw:
+                pending.setdefault(worstLoss, []).append(index)
+
+        resolved = mates
+        plies = 0
+        numDecided = len(mates)
+        while resolved or any(level > plies for level in pending):
+            plies += 1
+            candidates = set(pending.pop(plies, []))
+            for index in resolved:
+                squares, whiteToMove = self.decode(index)
+                candidates.update(self.predecessors(squares, whiteToMove))
+
+            resolved = []
+            for index in candidates:
+                if values[index] != DRAW:
+                    continue
+                if plies % 2 == 1 or self.isLoss(index, plies):
+                    values[index] = plies + 1
+                    resolved.append(index)
+            numDecided += len(resolved)
+
+            if plies + 1 >= INVALID:
+                break
+
+        return numDecided
+
+    def write(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.material + '.tb')
+        with open(path + '.tmp', 'wb') as tableFile:
+            tableFile.write(HEADER.pack(MAGIC, self.size))
+            tableFile.write(self.values)
+        os.replace(path + '.tmp', path)
+
+
+'''
+Generates and writes one table, the tables it needs must already be in the directory.
+'''
+def generateTable(material: str, directory: str = TABLEBASE_DIRECTORY) -> tuple[str, int, int]:
+    generator = TableGenerator(material, Tablebases(directory))
+    numDecided = generator.generate()
+    generator.write(directory)
+    return material, generator.size, numDecided
+
+
+'''
+Gets every canonical material set with up to maxPieces pieces, kings included.
+'''
+def allMaterials(maxPieces: int) -> list[str]:
+    def sides(count: int) -> list[str]:
+        if count == 0:
+            return ['K']
+        shorter = sides(count - 1)
+        return sorted({'K' + ''.join(sorted(side[1:] + piece, key=PIECE_ORDER.index)) for side in shorter for piece in PIECE_ORDER})
+
+    materials = set()
+    for numPieces in range(3, maxPieces + 1):
+        for whiteCount in range(1, numPieces - 1):
+            for white in sides(whiteCount):
+                for black in sides(numPieces - 2 - whiteCount):
+                    materials.add(canonicalMaterial(white + 'v' + black))
+    return sorted(materials, key=lambda material: (len(material), material))
+
+
+'''
+Generates the tables and the tables they need, skipping those already in the directory.
+Tables whose smaller tables are all done are generated at the same time, one per process.
+'''
+def generateTables(materials: list[str], directory: str = TABLEBASE_DIRECTORY, processes: int = None) -> None:
+    needed = set()
+    stack = [canonicalMaterial(material) for material in materials]
+    while stack:
+        material = stack.pop()
+        if material not in needed:
+            needed.add(material)
+            stack.extend(childMaterials(material))
+
+    done = {material for material in needed if os.path.exists(os.path.join(directory, material + '.tb'))}
+    with Pool(processes or cpu_count()) as pool:
+        while len(done) < len(needed):
+            ready = sorted(material for material in needed - done if childMaterials(material) <= done)
+            for material, size, numDecided in pool.starmap(generateTable, [(material, directory) for material in ready]):
+                print(f"{material}: {size} positions, {numDecided} decisive")
+                done.add(material)
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    if arguments and 'v' in arguments[0]:
+        materials = [argument for argument in arguments if 'v' in argument]
+        others = [argument for argument in arguments if 'v' not in argument]
+        generateTables(materials, others[0] if others else TABLEBASE_DIRECTORY)
+    else:
+        maxPieces = int(arguments[0]) if len(arguments) > 0 else 3
+        directory = arguments[1] if len(arguments) > 1 else TABLEBASE_DIRECTORY
+        processes = int(arguments[2]) if len(arguments) > 2 else None
+        generateTables(allMaterials(maxPieces), directory, processes)
@@ -0,0 +1,360 @@
+'''
+Self-play match runner: plays two ChessBot configurations against each other over a process pool to tell
+whether a change makes the bot stronger or only slower.
+
+Every opening position is played twice with the colours swapped. Each move is limited by the players'
+depth, node or time limits, the results are written as PGN and the match stops as soon as the sequential
+probability ratio test (SPRT) accepts one of its hypotheses, the Elo estimate is known to within the
+requested margin, or the game limit is reached.
+
+A player is written as name:key=value,key=value with the keys
+    search      negamax (default), minimax, greedy or random
+    depth       plies to search, for negamax without limits MAX_DEPTH
+    nodes       node limit per move
+    time        seconds per move
+    ordering    1 or 0, ChessBot.useMoveOrdering
+    nullmove    1 or 0, ChessBot.useNullMove
+    lmr         1 or 0, ChessBot.useLateMoveReductions
+    futility    1 or 0, ChessBot.useFutilityPruning
+    razor       1 or 0, ChessBot.useRazoring
+ex. python Tournament.py ../openings.txt --a new:depth=3 --b old:depth=3,ordering=0 --games 2000 --pgn match.pgn
+
+Openings are read one per line, either a FEN or a line of moves from the starting position.
+'''
+
+import argparse
+import math
+import sys
+from multiprocessing import Pool, cpu_count
+from queue import Queue
+from ChessAI import ChessBot, MAX_PLY, TT_SIZE_MB
+from Engine import GameState, Move
+from OpeningBook import parseMove
+from TranspositionTable import TranspositionTable, NO_MOVE
+
+
+# games that get this long are adjudicated as draws
+MAX_GAME_PLIES = 400
+
+PLAYER_DEFAULTS = {'search': 'negamax', 'depth': None, 'nodes': None, 'time': None, 'ordering': True,
+                   'nullmove': True, 'lmr': True, 'futility': True, 'razor': True}
+
+# games kept running per process, so a process never waits for the next game to be handed out
+GAMES_IN_FLIGHT = 2
+
+
+'''
+Reads a player from name:key=value,key=value, see the module docstring for the keys.
+'''
+def parsePlayer(text: str) -> dict:
+    name, _, settings = text.partition(':')
+    player = dict(PLAYER_DEFAULTS, name=name)
+    for setting in filter(None, settings.split(',')):
+        key, _, value = setting.partition('=')
+        if key not in PLAYER_DEFAULTS:
+            raise ValueError(f"unknown player setting {key}")
+        if key == 'search':
+            player[key] = value
+        elif key == 'time':
+            player[key] = float(value)
+        elif key in ('ordering', 'nullmove', 'lmr', 'futility', 'razor'):
+            player[key] = value not in ('0', 'false', 'False')
+        else:
+            player[key] = int(value)
+    return player
+
+
+'''
+Reads the opening positions of a file as FEN strings, a line is either a FEN or moves from the starting position.
+'''
+def readOpenings(path: str) -> list[str]:
+    openings = []
+    with open(path) as openingsFile:
+        for line in openingsFile:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '/' in line:
+                openings.append(GameState.fromFEN(line).toFEN())
+                continue
+
+            gameState = GameState()
+            for text in line.split():
+                text = text.split('.')[-1]
+                if not text:
+                    continue
+                move = parseMove(text, gameState.getValidMoves())
+                if move is None:
+                    raise ValueError(f"{text} is not a legal move in opening {line}")
+                gameState.move(move)
+            openings.append(gameState.toFEN())
+    return openings
+
+
+'''
+Standard algebraic notation of a legal move, ex. Nbd7, exd5, e8=Q+, O-O.
+'''
+def toSAN(gameState: GameState, move: Move, valid_moves: list[Move]) -> str:
+    if move.castling:
+        san = 'O-O' if move.toCol > move.fromCol else 'O-O-O'
+    else:
+        pieceType = move.pieceMoved[1]
+        capture = move.pieceCaptured != '--' or move.enpassantMove
+        target = move.convertToRankFile(move.toRow, move.toCol)
+        if pieceType == 'P':
+            san = (Move.CONV_COLS_TO_FILES[move.fromCol] + 'x' if capture else '') + target
+            if move.pawnPromotionMove:
+                san += '=' + move.promotionPiece
+        else:
+            others = [other for other in valid_moves if other.pieceMoved == move.pieceMoved and other.toRow == move.toRow
+                      and other.toCol == move.toCol and (other.fromRow, other.fromCol) != (move.fromRow, move.fromCol)]
+            disambiguation = ''
+            if others:
+                if all(other.fromCol != move.fromCol for other in others):
+                    disambiguation = Move.CONV_COLS_TO_FILES[move.fromCol]
+                elif all(other.fromRow != move.fromRow for other in others):
+                    disambiguation = Move.CONV_ROWS_TO_RANK[move.fromRow]
+                else:
+                    disambiguation = move.convertToRankFile(move.fromRow, move.fromCol)
+            san = pieceType + disambiguation + ('x' if capture else '') + target
+
+    gameState.move(move)
+    replies = gameState.getValidMoves()
+    if gameState.inCheck:
+        san += '#' if len(replies) == 0 else '+'
+    gameState.undoMove()
+    return san
+
+
+'''
+Returns True if neither side has the material left to mate, bare kings or a single minor piece.
+'''
+def insufficientMaterial(gameState: GameState) -> bool:
+    pieces = [piece[1] for row in gameState.board for piece in row if piece != '--' and piece[1] != 'K']
+    return len(pieces) == 0 or (len(pieces) == 1 and pieces[0] in ('B', 'N'))
+
+
+'''
+Gets (result, reason) if the game is over, None otherwise.
+'''
+def gameResult(gameState: GameState, valid_moves: list[Move], plies: int) -> tuple[str, str]:
+    if len(valid_moves) == 0:
+        if gameState.inCheck:
+            return ('0-1' if gameState.whiteToMove else '1-0'), "checkmate"
+        return '1/2-1/2', "stalemate"
+    if gameState.isFiftyMoveDraw():
+        return '1/2-1/2', "fifty moves"
+    if gameState.isThreefoldRepetition():
+        return '1/2-1/2', "threefold repetition"
+    if insufficientMaterial(gameState):
+        return '1/2-1/2', "insufficient material"
+    if plies >= MAX_GAME_PLIES:
+        return '1/2-1/2', "adjudicated"
+    return None
+
+
+'''
+Picks the player's move, the player's own transposition table, history and killer moves are swapped into ChessBot first.
+'''
+def chooseMove(player: dict, state: dict, gameState: GameState, valid_moves: list[Move]) -> Move:
+    ChessBot.transpositionTable = state['table']
+    ChessBot.historyTable = state['history']
+    ChessBot.killerMoves = state['killers']
+    ChessBot.useMoveOrdering = player['ordering']
+    ChessBot.useNullMove = player['nullmove']
+    ChessBot.useLateMoveReductions = player['lmr']
+    ChessBot.useFutilityPruning = player['futility']
+    ChessBot.useRazoring = player['razor']
+
+    search = player['search']
+    if search == 'random':
+        return ChessBot.getRandomMove(valid_moves)
+    if search == 'greedy':
+        return ChessBot.greedyChoice(gameState, valid_moves)
+    if search == 'minimax':
+        return ChessBot.findMoveMiniMax(gameState, valid_moves, ChessBot.searchDepth(player['depth'], None, None))
+
+    maxDepth = ChessBot.searchDepth(player['depth'], player['time'], player['nodes'])
+    return ChessBot.iterativeDeepening(gameState, valid_moves, maxDepth, player['time'], player['nodes'])
+
+
+'''
+Plays one game in a pool process. Returns a dict with the game number, the players' names, result, reason and PGN.
+'''
+def playGame(gameNumber: int, fen: str, white: dict, black: dict) -> dict:
+    gameState = GameState(backend='bitboard', fen=fen)
+    states = [{'table': TranspositionTable(TT_SIZE_MB), 'history': [[0] * 4096, [0] * 4096],
+               'killers': [[NO_MOVE, NO_MOVE] for ply in range(MAX_PLY)]} for player in (white, black)]
+    sanMoves = []
+    firstMoveNumber = gameState.fullmoveNumber
+    blackStarts = not gameState.whiteToMove
+
+    valid_moves = gameState.getValidMoves()
+    while True:
+        result = gameResult(gameState, valid_moves, len(sanMoves))
+        if result is not None:
+            break
+        side = 0 if gameState.whiteToMove else 1
+        move = chooseMove((white, black)[side], states[side], gameState, valid_moves)
+        sanMoves.append(toSAN(gameState, move, valid_moves))
+        gameState.move(move)
+        valid_moves = gameState.getValidMoves()
+
+    result, reason = result
+    tags = [("Event", "ChessBot self-play"), ("Site", "local"), ("Round", str(gameNumber + 1)),
+            ("White", white['name']), ("Black", black['name']), ("Result", result),
+            ("SetUp", "1"), ("FEN", fen), ("PlyCount", str(len(sanMoves))), ("Termination", reason)]
+    moveText = []
+    for ply, san in enumerate(sanMoves):
+        halfmove = ply + (1 if blackStarts else 0)
+        moveNumber = firstMoveNumber + halfmove // 2
+        if halfmove % 2 == 0:
+            moveText.append(f"{moveNumber}.")
+        elif ply == 0:
+            moveText.append(f"{moveNumber}...")
+        moveText.append(san)
+    moveText.append(result)
+    pgn = "\n".join(f'[{tag} "{value}"]' for tag, value in tags) + "\n\n" + " ".join(moveText) + "\n\n"
+
+    return {'round': gameNumber, 'white': white['name'], 'black': black['name'], 'result': result, 'reason': reason, 'pgn': pgn}
+
+
+'''
+Gets (games, mean score, variance of a game's score) of the first player. The variance is taken over the games
+plus one more win and one more loss, so a run of only wins or only losses does not look certain.
+'''
+def scoreStatistics(wins: int, draws: int, losses: int) -> tuple[int, float, float]:
+    games = wins + draws + losses
+    if games == 0:
+        return 0, 0.5, 0.25
+    mean = (wins + draws / 2) / games
+    variance = ((wins + 1) * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + (losses + 1) * mean ** 2) / (games + 2)
+    return games, mean, variance
+
+
+'''
+Log likelihood ratio of the SPRT for elo1 against elo0, from the wins, draws and losses of the first player.
+Uses the normal approximation of the game score, so draws are accounted for without a draw model.
+'''
+def sprt(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    games, mean, variance = scoreStatistics(wins, draws, losses)
+    if games == 0:
+        return 0.0
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return (score1 - score0) * (2 * mean - score0 - score1) * games / (2 * variance)
+
+
+def scoreToElo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+'''
+Elo difference of the first player and the half width of its 95% confidence interval.
+'''
+def eloEstimate(wins: int, draws: int, losses: int) -> tuple[float, float]:
+    games, mean, variance = scoreStatistics(wins, draws, losses)
+    if games == 0:
+        return 0.0, math.inf
+    error = 1.96 * math.sqrt(variance / games)
+    return scoreToElo(mean), (scoreToElo(mean + error) - scoreToElo(mean - error)) / 2
+
+
+'''
+Plays a and b against each other until the SPRT of elo1 against elo0 decides, the 95% confidence interval
+of the Elo difference is within margin (if given), or maxGames were played. Games are appended to pgnPath.
+Returns the summary dict: wins, draws and losses of a, games, elo, margin, llr and the reason it stopped.
+'''
+def runMatch(openings: list[str], a: dict, b: dict, maxGames: int = 1000, processes: int = None, elo0: float = 0.0, elo1: float = 10.0,
+             alpha: float = 0.05, beta: float = 0.05, margin: float = None, pgnPath: str = None, output=sys.stdout) -> dict:
+    lowerBound = math.log(beta / (1 - alpha))
+    upperBound = math.log((1 - beta) / alpha)
+    processes = processes or cpu_count()
+
+    wins = draws = losses = 0
+    llr = 0.0
+    elo, eloMargin = 0.0, math.inf
+    stopReason = "game limit"
+    results = Queue()
+    pgnFile = open(pgnPath, 'a') if pgnPath is not None else None
+
+    def startGame(gameNumber: int) -> None:
+        fen = openings[(gameNumber // 2) % len(openings)]
+        white, black = (a, b) if gameNumber % 2 == 0 else (b, a)
+        pool.apply_async(playGame, (gameNumber, fen, white, black), callback=results.put, error_callback=results.put)
+
+    pool = Pool(processes)
+    try:
+        started = 0
+        while started < min(maxGames, processes * GAMES_IN_FLIGHT):
+            startGame(started)
+            started += 1
+
+        for played in range(1, maxGames + 1):
+            game = results.get()
+            if isinstance(game, BaseException):
+                raise game
+            if pgnFile is not None:
+                pgnFile.write(game['pgn'])
+
+            if game['result'] == '1/2-1/2':
+                draws += 1
+            elif (game['result'] == '1-0') == (game['white'] == a['name']):
+                wins += 1
+            else:
+                losses += 1
+
+            llr = sprt(wins, draws, losses, elo0, elo1)
+            elo, eloMargin = eloEstimate(wins, draws, losses)
+            output.write(f"game {played}: {game['white']} - {game['black']} {game['result']} ({game['reason']}), "
+                         f"{a['name']} +{wins} ={draws} -{losses}, elo {elo:.1f} +/- {eloMargin:.1f}, llr {llr:.2f} [{lowerBound:.2f}, {upperBound:.2f}]\n")
+
+            if llr >= upperBound:
+                stopReason = f"H1 accepted, {a['name']} is at least {elo1} elo stronger"
+                break
+            if llr <= lowerBound:
+                stopReason = f"H0 accepted, {a['name']} is not {elo1} elo stronger"
+                break
+            if margin is not None and eloMargin <= margin:
+                stopReason = f"elo known to +/- {margin}"
+                break
+
+            if started < maxGames:
+                startGame(started)
+                started += 1
+    finally:
+        pool.terminate()
+        pool.join()
+        if pgnFile is not None:
+            pgnFile.close()
+
+    output.write(f"{stopReason}\n")
+    return {'wins': wins, 'draws': draws, 'losses': losses, 'games': wins + draws + losses,
+            'elo': elo, 'margin': eloMargin, 'llr': llr, 'stopReason': stopReason}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays two ChessBot configurations against each other.")
+    parser.add_argument("openings", help="file of opening positions, a FEN or moves from the start on every line")
+    parser.add_argument("--a", required=True, help="the player under test, name:key=value,...")
+    parser.add_argument("--b", required=True, help="the player it is compared with")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--margin", type=float, default=None, help="stop once the elo is known to within this")
+    parser.add_argument("--pgn", default=None, help="file the games are appended to")
+    args = parser.parse_args()
+
+    a, b = parsePlayer(args.a), parsePlayer(args.b)
+    if a['name'] == b['name']:
+        parser.error("the players need different names")
+    runMatch(readOpenings(args.openings), a, b, args.games, args.processes, args.elo0, args.elo1,
+             args.alpha, args.beta, args.margin, args.pgn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+'''
+A fixed size transposition table for the ChessBot search.
+
+Entries are packed into two arrays of unsigned 64 bit ints, one for the Zobrist keys and one for the data,
+so the table costs exactly 16 bytes per entry no matter how full it is.
+The table is split into buckets of two entries:
+    - slot 0 is depth-preferred, it is only replaced by a deeper search or an entry from an older search
+    - slot 1 is always-replace, it takes every entry that slot 0 rejects
+
+A table can also live in shared memory so several search processes can use it at once (see ChessBot.parallelSearch).
+There are no locks, the key slot stores the Zobrist key XOR the data word instead, so an entry that was
+half written by another process when it was read no longer matches its key and is treated as a miss.
+'''
+
+from array import array
+from multiprocessing import shared_memory
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+NO_MOVE = 0xFFFF
+
+BYTES_PER_ENTRY = 16
+ENTRIES_PER_BUCKET = 2
+
+# layout of the data word
+SCORE_BITS = 24
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+MOVE_SHIFT = SCORE_BITS
+DEPTH_SHIFT = MOVE_SHIFT + 16
+FLAG_SHIFT = DEPTH_SHIFT + 8
+AGE_SHIFT = FLAG_SHIFT + 2
+
+
+'''
+Packs a move into 16 bits, the move id already fits so NO_MOVE is the only value it can not take.
+'''
+def encodeMove(move) -> int:
+    if move is None:
+        return NO_MOVE
+    return move.moveID
+
+
+class TranspositionTable:
+    '''
+    With shared set the entries are kept in a new block of shared memory, other processes attach to it by
+    passing its name as sharedName. The process that created the block has to unlink it once every process closed it.
+    '''
+    def __init__(self, sizeMB: float, shared: bool = False, sharedName: str = None):
+        self.numBuckets = max(1, int(sizeMB * 1024 * 1024) // (BYTES_PER_ENTRY * ENTRIES_PER_BUCKET))
+        size = self.numBuckets * ENTRIES_PER_BUCKET
+        self.sizeMB = sizeMB
+        
+        if shared or sharedName is not None:
+            if sharedName is None:
+                self.sharedMemory = shared_memory.SharedMemory(create=True, size=16 * size)
+            else:
+                self.sharedMemory = shared_memory.SharedMemory(name=sharedName)
+            self.keys = self.sharedMemory.buf[:8 * size].cast('Q')
+            self.data = self.sharedMemory.buf[8 * size:16 * size].cast('Q')
+        else:
+            self.sharedMemory = None
+            self.keys = array('Q', bytes(8 * size))
+            self.data = array('Q', bytes(8 * size))
+
+        # incremented for every new search, entries from older searches are replaced first
+        self.age = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    '''
+    Name other processes attach to the shared table with, None if the table is not shared.
+    '''
+    def sharedName(self) -> str:
+        return self.sharedMemory.name if self.sharedMemory is not None else None
+
+    '''
+    Starts a new search, older entries become candidates for replacement.
+    '''
+    def newSearch(self) -> None:
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self) -> None:
+        size = len(self.keys)
+        if self.sharedMemory is not None:
+            self.sharedMemory.buf[:16 * size] = bytes(16 * size)
+        else:
+            self.keys = array('Q', bytes(8 * size))
+            self.data = array('Q', bytes(8 * size))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    '''
+    Detaches this process from a shared table, unlink also frees the shared memory and should
+    only be used by the process that created it.
+    '''
+    def close(self, unlink: bool = False) -> None:
+        if self.sharedMemory is None:
+            return
+        self.keys.release()
+        self.data.release()
+        self.sharedMemory.close()
+        if unlink:
+            self.sharedMemory.unlink()
+        self.sharedMemory = None
+
+    '''
+    Looks up a position key.
+    Returns (depth, score, flag, encoded best move) or None if the position is not stored.
+    '''
+    def probe(self, key: int):
+        self.probes += 1
+        index = (key % self.numBuckets) * ENTRIES_PER_BUCKET
+        keys = self.keys
+
+        for slot in (index, index + 1):
+            data = self.data[slot]
+            if keys[slot] ^ data == key:
+                if data == 0:
+                    continue
+                self.hits += 1
+                return ((data >> DEPTH_SHIFT) & 0xFF, (data & (SCORE_OFFSET * 2 - 1)) - SCORE_OFFSET,
+                        (data >> FLAG_SHIFT) & 0x3, (data >> MOVE_SHIFT) & 0xFFFF)
+        return None
+
+    '''
+    Stores a search result for a position key.
+    '''
+    def store(self, key: int, depth: int, score: int, flag: int, encodedMove: int) -> None:
+        self.stores += 1
+        index = (key % self.numBuckets) * ENTRIES_PER_BUCKET
+        data = ((self.age << AGE_SHIFT) | (flag << FLAG_SHIFT) | (depth << DEPTH_SHIFT)
+                | (encodedMove << MOVE_SHIFT) | (score + SCORE_OFFSET))
+
+        stored = self.data[index]
+        storedDepth = (stored >> DEPTH_SHIFT) & 0xFF
+        storedAge = stored >> AGE_SHIFT
+        samePosition = self.keys[index] ^ stored == key
+
+        if stored == 0 or samePosition or depth >= storedDepth or storedAge != self.age:
+            # keep the best move of the same position if this search did not find one
+            if encodedMove == NO_MOVE and samePosition and stored != 0:
+                data = (data & ~(0xFFFF << MOVE_SHIFT)) | (stored & (0xFFFF << MOVE_SHIFT))
+            self.keys[index] = key ^ data
+            self.data[index] = data
+        else:
+            self.keys[index + 1] = key ^ data
+            self.data[index + 1] = data
+
+    '''
+    Fraction of probes that found their position.
+    '''
+    def hitRate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    '''
+    Fraction of entries written during the current search, estimated from the first thousand entries
+    in the same way as the UCI hashfull value.
+    '''
+    def fillLevel(self) -> float:
+        sample = min(1000, len(self.data))
+        used = 0
+        for slot in range(sample):
+            data = self.data[slot]
+            if data != 0 and (data >> AGE_SHIFT) == self.age:
+                used += 1
+        return used / sample
@@ -0,0 +1,297 @@
+'''
+Headless UCI (Universal Chess Interface) front end, so the engine can be driven over stdin and stdout by a
+GUI, a match manager or a script instead of the pygame UserInterface.
+
+Supported commands:
+    uci, isready, ucinewgame, quit
+    setoption name <Hash | BookFile | TablebasePath> value <value>
+    position [startpos | fen <fen>] [moves <move> ...]
+    go [depth <plies>] [nodes <nodes>] [movetime <ms>] [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>]
+       [movestogo <moves>] [infinite] [ponder]
+    stop, ponderhit
+Every completed iteration is reported with an info line (depth, score, nodes, nps, time, hashfull, pv).
+
+Input is read on its own thread, the search runs on the main thread. stop, ponderhit and quit are acted on
+by the input thread right away through ChessBot.stopEvent, everything else waits for the search to finish.
+
+Run from the src directory:
+    python Uci.py
+'''
+
+import sys
+import threading
+import time
+from queue import Queue
+from Engine import GameState
+from ChessAI import ChessBot, CHECKMATE_VALUE, MAX_ITERATIVE_DEPTH, TABLEBASE_WIN_VALUE, TT_SIZE_MB
+from SearchStats import SearchStats
+from TranspositionTable import TranspositionTable
+from OpeningBook import OpeningBook
+from Tablebase import Tablebases
+
+
+ENGINE_NAME = "Chess-App"
+ENGINE_AUTHOR = "Dbschmidle"
+
+# share of the remaining clock given to a move when the GUI does not send movestogo
+DEFAULT_MOVES_TO_GO = 30
+
+# seconds kept back from every move for the nodes between two clock checks and the GUI's own lag
+MOVE_OVERHEAD = 0.2
+
+
+'''
+ChessBot.stopEvent of the UCI engine, set by the input thread on stop or quit.
+A ponder search has no deadline until ponderhit, then it gets ponderTimeLimit from that moment on.
+'''
+class UciStop:
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.ponderHit = threading.Event()
+        self.pondering = False
+        self.ponderTimeLimit = None
+
+    def is_set(self) -> bool:
+        if self.pondering and self.ponderHit.is_set():
+            self.pondering = False
+            if self.ponderTimeLimit is not None:
+                ChessBot.deadline = time.perf_counter() + self.ponderTimeLimit
+        return self.stopped.is_set()
+
+
+'''
+SearchStats that also sends an info line for every completed iteration.
+'''
+class UciStats(SearchStats):
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.start = time.perf_counter()
+        self.totalNodes = 0
+
+    def addIteration(self, depth: int, score: int, bestMove, nodes: int, seconds: float) -> None:
+        super().addIteration(depth, score, bestMove, nodes, seconds)
+        self.totalNodes += nodes
+        elapsed = time.perf_counter() - self.start
+
+        if abs(score) > TABLEBASE_WIN_VALUE:
+            # mate scores count the plies to the mate, a win in plies plies takes its moves rounded up
+            mateIn = (CHECKMATE_VALUE - abs(score) + 1) // 2
+            scoreText = f"mate {mateIn if score > 0 else -mateIn}"
+        else:
+            scoreText = f"cp {score}"
+
+        hashfull = int(ChessBot.transpositionTable.fillLevel() * 1000)
+        nps = int(self.totalNodes / elapsed) if elapsed > 0 else 0
+        self.engine.send(f"info depth {depth} score {scoreText} nodes {self.totalNodes} nps {nps} "
+                         f"time {int(elapsed * 1000)} hashfull {hashfull} pv {bestMove}")
+
+
+class UciEngine:
+    def __init__(self, backend: str = 'bitboard', output=sys.stdout):
+        self.backend = backend
+        self.gameState = GameState(backend=backend)
+        self.output = output
+        self.outputLock = threading.Lock()
+
+        # lines for the main thread, stop, ponderhit and quit are also handled by the input thread
+        self.commands = Queue()
+        
+        # go commands read and finished, each counter is only written by one thread (see searching)
+        self.searchesStarted = 0
+        self.searchesFinished = 0
+        self.stopSignal = UciStop()
+        ChessBot.stopEvent = self.stopSignal
+
+    '''
+    True from the moment a go line is read until its bestmove was sent.
+    '''
+    @property
+    def searching(self) -> bool:
+        return self.searchesStarted > self.searchesFinished
+    
+    def send(self, text: str) -> None:
+        with self.outputLock:
+            self.output.write(text + "\n")
+            self.output.flush()
+
+    '''
+    Body of the input thread, reads commands until quit or the end of the input.
+    '''
+    def readInput(self, input) -> None:
+        for line in input:
+            line = line.strip()
+            if line == 'stop':
+                self.stopSignal.stopped.set()
+            elif line == 'ponderhit':
+                self.stopSignal.ponderHit.set()
+            elif line == 'isready' and self.searching:
+                self.send("readyok")
+            elif line == 'quit':
+                self.stopSignal.stopped.set()
+                break
+            elif line.split()[:1] == ['go']:
+                # cleared here and not when the search starts, so a stop read before then still counts
+                self.stopSignal.stopped.clear()
+                self.stopSignal.ponderHit.clear()
+                self.searchesStarted += 1
+                self.commands.put(line)
+            elif line:
+                self.commands.put(line)
+        self.commands.put('quit')
+
+    '''
+    Reads and runs commands until quit.
+    '''
+    def run(self, input=sys.stdin) -> None:
+        reader = threading.Thread(target=self.readInput, args=(input,), daemon=True)
+        reader.start()
+        while self.handle(self.commands.get()):
+            pass
+
+    '''
+    Runs one command, returns False on quit.
+    '''
+    def handle(self, line: str) -> bool:
+        words = line.split()
+        command = words[0]
+
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {TT_SIZE_MB} min 1 max 1024")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.setOption(words[1:])
+        elif command == 'ucinewgame':
+            self.gameState = GameState(backend=self.backend)
+            ChessBot.transpositionTable.clear()
+        elif command == 'position':
+            self.setPosition(words[1:])
+        elif command == 'go':
+            try:
+                self.go(words[1:])
+            finally:
+                self.searchesFinished += 1
+        elif command == 'quit':
+            return False
+        else:
+            self.send(f"info string unknown command {line}")
+        return True
+
+    def setOption(self, words: list[str]) -> None:
+        if 'name' not in words:
+            return
+        valueIndex = words.index('value') if 'value' in words else len(words)
+        name = " ".join(words[words.index('name') + 1:valueIndex]).lower()
+        value = " ".join(words[valueIndex + 1:])
+
+        try:
+            if name == 'hash':
+                ChessBot.transpositionTable = TranspositionTable(int(value))
+            elif name == 'bookfile':
+                ChessBot.openingBook = OpeningBook(value) if value and value != '<empty>' else None
+            elif name == 'tablebasepath':
+                ChessBot.tablebases = Tablebases(value) if value and value != '<empty>' else None
+            else:
+                self.send(f"info string unknown option {name}")
+        except (OSError, ValueError) as error:
+            self.send(f"info string could not set {name}: {error}")
+
+    '''
+    position startpos [moves ...] or position fen <fen> [moves ...]
+    '''
+    def setPosition(self, words: list[str]) -> None:
+        movesIndex = words.index('moves') if 'moves' in words else len(words)
+        try:
+            if words and words[0] == 'fen':
+                gameState = GameState(backend=self.backend, fen=" ".join(words[1:movesIndex]))
+            else:
+                gameState = GameState(backend=self.backend)
+        except ValueError as error:
+            self.send(f"info string invalid position: {error}")
+            return
+
+        for text in words[movesIndex + 1:]:
+            move = next((move for move in gameState.getValidMoves() if str(move) == text), None)
+            if move is None:
+                self.send(f"info string illegal move {text}")
+                break
+            gameState.move(move)
+        self.gameState = gameState
+
+    '''
+    Seconds to search for the go parameters, None if the search is not limited by time.
+    '''
+    def timeLimit(self, params: dict) -> float:
+        if 'movetime' in params:
+            return max(0.01, params['movetime'] / 1000 - MOVE_OVERHEAD)
+        whiteToMove = self.gameState.whiteToMove
+        remaining = params.get('wtime' if whiteToMove else 'btime')
+        if remaining is None:
+            return None
+        increment = params.get('winc' if whiteToMove else 'binc', 0)
+        movesToGo = params.get('movestogo', DEFAULT_MOVES_TO_GO)
+
+        limit = remaining / 1000 / max(1, movesToGo) + increment / 1000 * 3 / 4
+        return max(0.01, min(limit, remaining / 1000 / 2) - MOVE_OVERHEAD)
+
+    def go(self, words: list[str]) -> None:
+        params = {}
+        flags = set()
+        for i, word in enumerate(words):
+            if word in ('infinite', 'ponder'):
+                flags.add(word)
+            elif word in ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo') and i + 1 < len(words):
+                try:
+                    params[word] = int(words[i + 1])
+                except ValueError:
+                    self.send(f"info string ignoring invalid {word} {words[i + 1]}")
+
+        timeLimit = self.timeLimit(params)
+        nodeLimit = params.get('nodes')
+        waitForStop = 'infinite' in flags or 'ponder' in flags
+        if waitForStop and 'depth' not in params:
+            maxDepth = MAX_ITERATIVE_DEPTH
+        else:
+            maxDepth = ChessBot.searchDepth(params.get('depth'), timeLimit, nodeLimit)
+
+        stopSignal = self.stopSignal
+        stopSignal.pondering = 'ponder' in flags
+        stopSignal.ponderTimeLimit = timeLimit
+        if stopSignal.pondering:
+            timeLimit = None
+
+        valid_moves = self.gameState.getValidMoves()
+        if len(valid_moves) == 0:
+            self.send("bestmove 0000")
+            return
+
+        bestMove = None
+        if not waitForStop:
+            bestMove = ChessBot.getBookMove(self.gameState, valid_moves)
+            if bestMove is not None:
+                self.send(f"info string book move {bestMove}")
+            else:
+                bestMove = ChessBot.getTablebaseMove(self.gameState, valid_moves)
+                if bestMove is not None:
+                    self.send(f"info string tablebase move {bestMove}")
+        if bestMove is None:
+            bestMove = ChessBot.iterativeDeepening(self.gameState, valid_moves, maxDepth, timeLimit, nodeLimit, stats=UciStats(self))
+
+        # the GUI expects no bestmove for an infinite or ponder search before it sends stop or ponderhit
+        while waitForStop and not stopSignal.stopped.is_set():
+            if 'ponder' in flags and stopSignal.ponderHit.is_set():
+                break
+            stopSignal.stopped.wait(0.01)
+
+        ponderMove = ChessBot.getPonderMove(self.gameState, bestMove)
+        self.send(f"bestmove {bestMove}" + (f" ponder {ponderMove}" if ponderMove is not None else ""))
+
+
+if __name__ == "__main__":
+    UciEngine().run()
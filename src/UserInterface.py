@@ -2,10 +2,11 @@
 This file is responsible for handling user I/O and displaying the current gamestate to the user on the command line
 """
 
+import os
 import pygame as p
 import Engine
-import ChessAI
-from multiprocessing import Process, Queue
+from SearchWorker import SearchWorker
+from SearchStats import formatStats
 
 
 
@@ -16,6 +17,14 @@ MAX_FPS = 15
 IMAGES = {}
 BACKGROUND_COLOR = [p.Color("white"), p.Color("chartreuse4")]
 HIGHLIGHT_COLOR = p.Color("gold")
+ENGINE_BACKEND = 'bitboard' # 'mailbox' or 'bitboard', see Engine.GameState
+BOT_TIME_LIMIT = 2.0 # seconds the chess bot may think per move
+BOT_WORKERS = 1 # search processes, more than 1 uses the parallel search (ChessAI.ChessBot.parallelSearch)
+BOT_PONDER = True # the bot keeps searching on the reply it expects during the player's turn
+OPENING_BOOK = "book.bin" # built from openings.txt with OpeningBook.py, the bot always searches if it is missing
+TABLEBASES = "tablebases" # directory of endgame tables generated with Tablebase.py, not used if it is missing
+BOT_STATS = True # prints what the bot's search did after each of its moves
+BOT_STATS_LOG = None # file the bot's search stats are appended to as JSON lines, None to not write them
 
 PIECE_ABB = {'white_pawn': 'wP', 
              'black_pawn': 'bP', 
@@ -38,7 +47,7 @@ def main():
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     
-    gameState = Engine.GameState()
+    gameState = Engine.GameState(backend=ENGINE_BACKEND)
     
     gameRunning = True
     
@@ -57,6 +66,10 @@ def main():
     
     ChessBotThinking = False
     
+    # the bot searches in a process that is started once and follows the game through pushMove
+    searchWorker = SearchWorker(ENGINE_BACKEND, OPENING_BOOK if os.path.exists(OPENING_BOOK) else None,
+                                TABLEBASES if os.path.isdir(TABLEBASES) else None, BOT_STATS, BOT_STATS_LOG)
+    
     while(gameRunning):
         
         playerTurn = (gameState.whiteToMove and playerOne) or (not gameState.whiteToMove and playerTwo)
@@ -66,6 +79,8 @@ def main():
                 gameRunning = False
             elif (event.type == p.KEYDOWN):
                 if event.key == p.K_z:
+                    searchWorker.undoMove()
+                    ChessBotThinking = False
                     gameState.undoMove()
                     valid_moves = gameState.getValidMoves()
                     continue
@@ -110,6 +125,7 @@ def main():
                                 moveMadeFlag = True
                                     
                                 gameState.move(valid_moves[i])
+                                searchWorker.pushMove(valid_moves[i])
 
                                 print(valid_moves[i].convertToChessNotation())
                                     
@@ -127,22 +143,28 @@ def main():
                                 print(f"{newmove} is not a valid move.")
                                 
                     
-        if not playerTurn:
+        if not playerTurn and len(valid_moves) > 0:
             if not ChessBotThinking:
                 ChessBotThinking = True
                 
-                ret_queue = Queue() # FIFO
-                moveFinder_Proc = Process(target=ChessAI.ChessBot.getNegaMaxMove, args=(gameState, valid_moves, ret_queue))
-                moveFinder_Proc.start()
+                # after a ponder hit the worker is already searching this position
+                if not searchWorker.searching:
+                    searchWorker.startSearch(BOT_TIME_LIMIT, numWorkers=BOT_WORKERS)
                 # chessbot logic
                 
-            if not moveFinder_Proc.is_alive():
+            if searchWorker.poll():
                 print("thread done thinking...")
 
-                chessBotMove = ret_queue.get()
+                chessBotMove = searchWorker.getBestMove(valid_moves)
+                if searchWorker.stats is not None:
+                    print(formatStats(searchWorker.stats))
             
-                gameState.move(chessBotMove)
-                moveMadeFlag = True
+                if chessBotMove is not None:
+                    gameState.move(chessBotMove)
+                    searchWorker.pushMove(chessBotMove)
+                    moveMadeFlag = True
+                    if BOT_PONDER:
+                        searchWorker.startPonder(BOT_TIME_LIMIT)
                 
                 ChessBotThinking = False
                 
@@ -156,6 +178,8 @@ def main():
         drawGameState(screen, gameState, highlighted_square)
         clock.tick(MAX_FPS)
         p.display.flip()
+        
+    searchWorker.close()
                     
     
 '''
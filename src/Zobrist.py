@@ -0,0 +1,27 @@
+'''
+Random keys for Zobrist hashing of a GameState.
+
+A position key is the XOR of one key per (piece, square), one key for the castling rights,
+one key for the en passant file if there is an en passant square, and SIDE_KEY when black is to move.
+The keys come from a fixed seed so the same position hashes to the same key in every process,
+which lets keys be shared between processes and saved to files.
+'''
+
+import random
+
+SEED = 20230117
+
+PIECES = ('wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK')
+
+_random = random.Random(SEED)
+
+# PIECE_KEYS['wP'][square] where square = row*8 + col
+PIECE_KEYS = {piece: [_random.getrandbits(64) for _ in range(64)] for piece in PIECES}
+
+# indexed by the castling rights packed as wKingSide=1, wQueenSide=2, bKingSide=4, bQueenSide=8
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]
+
+# indexed by the column of the en passant square
+ENPASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]
+
+SIDE_KEY = _random.getrandbits(64)
@@ -1,3 +1,4 @@
 from src.Engine import GameState
 from src.Engine import Move
-from src.ChessAI import ChessBot
\ No newline at end of file
+from src.ChessAI import ChessBot
+from src.Perft import perft
\ No newline at end of file